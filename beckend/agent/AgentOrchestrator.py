@@ -1,15 +1,26 @@
 # FILE: agent/AgentOrchestrator.py (KODE LENGKAP DIPERBARUI)
 
+import asyncio
 from .rag import RAGEngine
-from .llm import get_llm_response
+from .llm import get_llm_response, aget_llm_response, astream_llm_response, get_request_signature
+from .response_cache import response_cache, make_cache_key, ASK_SEMANTIC_CACHE
+from .retriever_service import retrieve_documents, embed_query
+from .generator_service import build_rag_prompt
+from .singleflight import llm_flight
+from .fast_path import try_fast_path
 from .generator_service import generate_answer, generate_detailed_json_answer
+from .metrics import timed, counter
+
+# Jumlah query per rute (fast_path, cache, llm_direct, rag, rag_fallback_llm) untuk /metrics
+ROUTE_TOTAL = counter("route_total", "Jumlah query per rute orchestrator.", ("route",))
 
 class AgentOrchestrator:
     """
     Mengorkestrasi penggunaan RAGEngine dan LLM murni (Gemini).
     """
-    def __init__(self):
-        self.rag_engine = RAGEngine()
+    def __init__(self, rag_engine: RAGEngine | None = None):
+        # Pakai RAGEngine yang sama dengan main.py agar retriever tidak dimuat dua kali
+        self.rag_engine = rag_engine or RAGEngine()
         print("AgentOrchestrator initialized.")
 
     # MENAMBAH PARAMETER force_json
@@ -17,11 +28,18 @@ class AgentOrchestrator:
         """
         Menentukan alur terbaik untuk query: RAG atau LLM murni, dan meneruskan flag JSON.
         """
+        # Lookup properti sederhana dijawab langsung dari database (tanpa LLM)
+        if not force_json:
+            fast_answer = try_fast_path(user_query)
+            if fast_answer is not None:
+                ROUTE_TOTAL.inc(route="fast_path")
+                return fast_answer
         
         # Logika: Jika JSON diminta (dari /generate atau /combine), atau jika query panjang/kompleks.
         # Rute ke LLM Pro dengan JSON forcing.
         if force_json or (len(user_query) >= 150 or user_query.lower().startswith("saya membutuhkan rekomendasi")):
             print(f"Orchestrator: Directing query (Complex/JSON={force_json}) to pure LLM (Gemini Pro).")
+            ROUTE_TOTAL.inc(route="llm_direct")
             return get_llm_response(user_query, force_json=force_json)
             
         # Logika lama: Ask (RAG pipeline)
@@ -32,12 +50,140 @@ class AgentOrchestrator:
             
             if "tidak dapat menemukan jawaban yang relevan" in rag_answer or rag_answer.startswith("Error"):
                  print("Orchestrator: RAG failed, falling back to LLM.")
+                 ROUTE_TOTAL.inc(route="rag_fallback_llm")
                  # Panggil LLM Flash tanpa JSON force (default)
                  return get_llm_response(user_query, force_json=False)
             
+            ROUTE_TOTAL.inc(route="rag")
             return rag_answer
             
         else:
             # Fallback untuk complex query lainnya
             print("Orchestrator: Directing complex query to pure LLM (Gemini).")
-            return get_llm_response(user_query, force_json=False)
\ No newline at end of file
+            return get_llm_response(user_query, force_json=False)
+
+    async def aprocess_query(self, user_query: str, force_json: bool = False, cache_key: str | None = None,
+                             prefix: str = "") -> str:
+        """
+        Versi async dari process_query untuk endpoint FastAPI async.
+        Aturan routing sama persis; bedanya tidak ada thread yang tertahan menunggu Gemini.
+
+        Respons teks sukses disimpan di response_cache. Respons JSON (force_json) TIDAK
+        disimpan di sini: pemanggil menyimpannya setelah lolos validasi skema (parse_llm_json
+        di main.py), agar balasan yang tidak bisa di-parse tidak disajikan ulang selama TTL.
+        cache_key opsional dipakai endpoint yang punya kunci khusus (misalnya /combine yang
+        tidak sensitif urutan); default-nya prompt ternormalisasi (prefix + query) + model +
+        konfigurasi.
+
+        prefix: instruksi/skema yang sama antar panggilan JSON (/generate, /refine), diteruskan
+        ke LLM terpisah agar bisa memakai context cache Gemini.
+        """
+        if prefix and not force_json:
+            # Jalur RAG/fast path membutuhkan query utuh
+            user_query, prefix = prefix + user_query, ""
+
+        # Lookup properti sederhana dijawab langsung dari database (tanpa LLM, < 1 ms)
+        if not force_json:
+            fast_answer = try_fast_path(user_query)
+            if fast_answer is not None:
+                ROUTE_TOTAL.inc(route="fast_path")
+                return fast_answer
+
+        with timed("cache_lookup") as span:
+            if cache_key is None:
+                model, config = get_request_signature(force_json)
+                cache_key = make_cache_key(prefix + user_query, model, config)
+
+            # Pertanyaan /ask yang hampir sama bisa dicocokkan lewat embedding (opsional)
+            use_semantic = ASK_SEMANTIC_CACHE and not force_json
+            cached = response_cache.get(cache_key, record_miss=not use_semantic)
+            query_vector = None
+            if cached is None and use_semantic:
+                query_vector = await asyncio.to_thread(embed_query, user_query)
+                cached = response_cache.get_similar(query_vector)
+            span["hit"] = cached is not None
+        if cached is not None:
+            print("Orchestrator: Response cache hit.")
+            ROUTE_TOTAL.inc(route="cache")
+            return cached
+
+        # Request identik yang datang bersamaan berbagi satu panggilan upstream
+        return await llm_flight.do(cache_key, self._aroute_and_cache, user_query, force_json, cache_key,
+                                   query_vector, prefix)
+
+    async def _aroute_and_cache(self, user_query: str, force_json: bool, cache_key: str, query_vector=None,
+                                prefix: str = "") -> str:
+        answer = await self._aroute_query(user_query, force_json, prefix)
+        if force_json:
+            # Disimpan pemanggil setelah validasi (lihat aprocess_query)
+            return answer
+        response_cache.set(cache_key, answer)
+        if query_vector is not None:
+            response_cache.add_similar(query_vector, cache_key)
+        return answer
+
+    async def _aroute_query(self, user_query: str, force_json: bool, prefix: str = "") -> str:
+        if force_json or (len(user_query) >= 150 or user_query.lower().startswith("saya membutuhkan rekomendasi")):
+            print(f"Orchestrator: Directing query (Complex/JSON={force_json}) to pure LLM (Gemini Pro).")
+            ROUTE_TOTAL.inc(route="llm_direct")
+            return await aget_llm_response(user_query, force_json=force_json, prefix=prefix)
+
+        print("Orchestrator: Directing query to RAG Engine.")
+        rag_answer = await self.rag_engine.aquery(user_query)
+
+        if "tidak dapat menemukan jawaban yang relevan" in rag_answer or rag_answer.startswith("Error"):
+            print("Orchestrator: RAG failed, falling back to LLM.")
+            ROUTE_TOTAL.inc(route="rag_fallback_llm")
+            return await aget_llm_response(user_query, force_json=False)
+
+        ROUTE_TOTAL.inc(route="rag")
+        return rag_answer
+
+    async def astream_query(self, user_query: str):
+        """
+        Versi streaming dari aprocess_query untuk /ask/stream.
+        Menghasilkan tuple (event, data): ("token", teks) atau ("reset", alasan) saat
+        jawaban RAG ternyata tidak relevan dan diganti jawaban LLM fallback.
+        """
+        fast_answer = try_fast_path(user_query)
+        if fast_answer is not None:
+            ROUTE_TOTAL.inc(route="fast_path")
+            yield "token", fast_answer
+            return
+
+        model, config = get_request_signature(force_json=False)
+        cache_key = make_cache_key(user_query, model, config)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            print("Orchestrator: Response cache hit (stream).")
+            ROUTE_TOTAL.inc(route="cache")
+            yield "token", cached
+            return
+
+        if len(user_query) >= 150 or user_query.lower().startswith("saya membutuhkan rekomendasi"):
+            print("Orchestrator: Streaming query to pure LLM (Gemini).")
+            ROUTE_TOTAL.inc(route="llm_direct")
+            prompt = user_query
+        else:
+            print("Orchestrator: Streaming query through RAG Engine.")
+            ROUTE_TOTAL.inc(route="rag")
+            retrieved_docs = await asyncio.to_thread(retrieve_documents, user_query)
+            prompt = build_rag_prompt(user_query, retrieved_docs) if retrieved_docs else user_query
+
+        parts = []
+        async for text in astream_llm_response(prompt, force_json=False):
+            parts.append(text)
+            yield "token", text
+        answer = "".join(parts)
+
+        if prompt is not user_query and "tidak dapat menemukan jawaban yang relevan" in answer:
+            print("Orchestrator: RAG failed, falling back to LLM (stream).")
+            ROUTE_TOTAL.inc(route="rag_fallback_llm")
+            yield "reset", "rag_fallback"
+            parts = []
+            async for text in astream_llm_response(user_query, force_json=False):
+                parts.append(text)
+                yield "token", text
+            answer = "".join(parts)
+
+        response_cache.set(cache_key, answer)
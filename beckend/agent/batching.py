@@ -0,0 +1,54 @@
+# agent/batching.py
+"""
+Utilitas endpoint batch (/combine_batch, /generate_batch).
+
+- iter_bounded(): menjalankan banyak coroutine dengan konkurensi terbatas dan
+  menghasilkan hasilnya begitu selesai (urutan selesai, bukan urutan input).
+- chunked(): membagi item menjadi paket untuk prompt gabungan (beberapa analisis
+  reaksi kecil dalam SATU prompt JSON).
+- ndjson_line(): satu baris NDJSON per hasil item, sehingga klien bisa memproses
+  hasil sebelum seluruh batch selesai.
+"""
+
+import asyncio
+import json
+import os
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Jumlah pasangan /combine per prompt gabungan (1 = tanpa packing)
+COMBINE_PACK_SIZE = int(os.getenv("COMBINE_PACK_SIZE", "5"))
+
+
+def ndjson_line(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+def chunked(items: list, size: int) -> list[list]:
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def iter_bounded(factories: list, concurrency: int = BATCH_CONCURRENCY):
+    """
+    factories: list callable tanpa argumen yang mengembalikan coroutine. Paling banyak
+    `concurrency` coroutine berjalan bersamaan; hasil di-yield sesuai urutan selesai.
+    Coroutine yang melempar exception di-yield sebagai objek exception-nya.
+    Jika konsumen berhenti (klien memutus koneksi), task yang tersisa dibatalkan.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(factory):
+        async with semaphore:
+            try:
+                return await factory()
+            except Exception as e:
+                return e
+
+    tasks = [asyncio.ensure_future(run(factory)) for factory in factories]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
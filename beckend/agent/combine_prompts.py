@@ -0,0 +1,69 @@
+# agent/combine_prompts.py
+"""
+Prompt dan parsing analisis reaksi /combine, dipakai main.py (/combine, /combine_batch)
+dan job offline tools/precompute_reactions.py tanpa meng-import aplikasi FastAPI.
+
+- create_combine_prompt(): satu pasangan, output reaction_summary_template.
+- create_combine_pack_prompt(): beberapa pasangan dalam SATU prompt JSON {"hasil": [...]}.
+- parse_packed_reactions(): elemen valid dari respons prompt gabungan, per id pasangan.
+"""
+
+import json
+from typing import Any, Dict, List
+from pydantic import BaseModel
+from .output_parser import (
+    parse_json_lenient, validate_output, OutputParseError, ReactionSummary, reaction_summary_template
+)
+
+
+class CombineRequest(BaseModel):
+    compound_a: str
+    compound_b: str
+
+
+def create_combine_prompt(compound_a: str, compound_b: str) -> str:
+    return f"""
+        Anda adalah ahli kimia. Analisis interaksi antara senyawa: {compound_a} dan {compound_b}.
+        
+        Tentukan: jenis reaksi, produk utama, persamaan stoikiometri, dan risiko.
+
+        **KELUARAN WAJIB JSON MURNI**
+        Berikan HANYA respons JSON, tidak ada teks pengantar atau penutup.
+        Struktur output JSON harus KETAT sesuai dengan skema:
+        {json.dumps(reaction_summary_template, indent=2)}
+        """
+
+
+def create_combine_pack_prompt(pairs: List[CombineRequest]) -> str:
+    """Beberapa analisis reaksi dalam SATU prompt JSON (dipakai /combine_batch)."""
+    daftar = json.dumps(
+        [{"id": i, "compound_a": pair.compound_a, "compound_b": pair.compound_b} for i, pair in enumerate(pairs)],
+        ensure_ascii=False, indent=2
+    )
+    return f"""
+        Anda adalah ahli kimia. Analisis interaksi untuk SETIAP pasangan senyawa berikut secara terpisah:
+        {daftar}
+        
+        Untuk setiap pasangan tentukan: jenis reaksi, produk utama, persamaan stoikiometri, dan risiko.
+
+        **KELUARAN WAJIB JSON MURNI**
+        Berikan HANYA objek JSON {{"hasil": [...]}} berisi tepat satu elemen per pasangan.
+        Setiap elemen memuat "id" pasangan dan field KETAT sesuai skema:
+        {json.dumps(reaction_summary_template, indent=2)}
+        """
+
+
+def parse_packed_reactions(result_json_str: str, size: int) -> Dict[int, Dict[str, Any]]:
+    """Elemen valid dari respons prompt gabungan, per id pasangan (yang hilang/rusak dilewati)."""
+    try:
+        parsed, _ = parse_json_lenient(result_json_str)
+    except OutputParseError:
+        return {}
+    results = {}
+    for element in parsed.get("hasil", []) if isinstance(parsed, dict) else []:
+        if not isinstance(element, dict) or not isinstance(element.get("id"), int) or not 0 <= element["id"] < size:
+            continue
+        result, invalid = validate_output({key: value for key, value in element.items() if key != "id"}, ReactionSummary)
+        if not invalid:
+            results[element["id"]] = result
+    return results
@@ -0,0 +1,282 @@
+# agent/compound_store.py
+"""
+CompoundStore: dataset senyawa dimuat SEKALI ke memori dan diindeks.
+
+- Indeks O(1): nama_senyawa, rumus_molekul, token sinonim (dipisah '|'),
+  token kategori_aplikasi, dan tingkat_risiko_keselamatan.
+- Penambahan data ditulis ke log append-only (JSON Lines), bukan menulis ulang
+  file JSON 1.9 MB. Log dipadatkan (compaction) ke file utama setiap
+  COMPOUND_LOG_COMPACT_EVERY entri.
+- Antar worker uvicorn: setiap pembacaan mengecek (stat) file utama dan log,
+  lalu memutar ulang entri log baru yang ditulis worker lain.
+- File utama dan shard (data/data_kimia_shard_*.json / .jsonl) dibaca secara
+  streaming lewat data_source, satu senyawa per iterasi.
+"""
+
+import json
+import os
+import threading
+
+from .embedding_service import DATA_FILE_PATH
+from .data_source import COMPOUND_LOG_PATH, DATA_SHARD_GLOB, iter_compounds_from, shard_paths
+from .file_lock import FileLock
+
+COMPOUND_LOG_COMPACT_EVERY = int(os.getenv("COMPOUND_LOG_COMPACT_EVERY", "50"))
+
+# Field yang diindeks sebagai token (dipisah '|')
+_TOKEN_FIELDS = {
+    "sinonim": ("|",),
+    "kategori_aplikasi": ("|", ","),
+}
+
+
+def _normalize(value) -> str:
+    return str(value).strip().lower()
+
+
+def _split_tokens(value, separators) -> list[str]:
+    if not value:
+        return []
+    tokens = [str(value)]
+    for sep in separators:
+        tokens = [part for token in tokens for part in token.split(sep)]
+    return [t for t in (_normalize(token) for token in tokens) if t]
+
+
+def project_fields(record: dict, fields: list[str] | None) -> dict:
+    """Mengambil hanya field tertentu dari satu record (field projection)."""
+    if not fields:
+        return record
+    return {field: record.get(field) for field in fields}
+
+
+class CompoundStore:
+    """Dataset senyawa di memori dengan indeks terstruktur dan log append-only."""
+
+    def __init__(self, data_path: str = DATA_FILE_PATH, log_path: str = COMPOUND_LOG_PATH,
+                 compact_every: int = COMPOUND_LOG_COMPACT_EVERY, shard_glob: str = DATA_SHARD_GLOB):
+        self.data_path = data_path
+        self.log_path = log_path
+        self.shard_glob = shard_glob
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(os.path.join(os.path.dirname(data_path) or ".", ".compound_store.lock"))
+        self._loaded = False
+        self._records: list[dict] = []
+        self._data_signature = None
+        self._main_count = 0  # Jumlah record dari file utama (shard & log menyusul sesudahnya)
+        self._shard_count = 0
+        self._log_offset = 0
+        self._log_entries = 0
+        # Naik setiap kali isi dataset berubah (dipakai cache turunan, mis. indeks properti)
+        self.version = 0
+        self._reset_indexes()
+
+    # --- Pemuatan & sinkronisasi ---
+    def _reset_indexes(self):
+        self._by_name: dict[str, list[int]] = {}
+        self._by_formula: dict[str, list[int]] = {}
+        self._by_synonym: dict[str, list[int]] = {}
+        self._by_category: dict[str, list[int]] = {}
+        self._by_risk: dict[str, list[int]] = {}
+
+    def _index_record(self, position: int, record: dict):
+        if record.get("nama_senyawa"):
+            self._by_name.setdefault(_normalize(record["nama_senyawa"]), []).append(position)
+        if record.get("rumus_molekul"):
+            self._by_formula.setdefault(_normalize(record["rumus_molekul"]), []).append(position)
+        if record.get("tingkat_risiko_keselamatan"):
+            self._by_risk.setdefault(_normalize(record["tingkat_risiko_keselamatan"]), []).append(position)
+        for token in set(_split_tokens(record.get("sinonim"), _TOKEN_FIELDS["sinonim"])):
+            self._by_synonym.setdefault(token, []).append(position)
+        for token in set(_split_tokens(record.get("kategori_aplikasi"), _TOKEN_FIELDS["kategori_aplikasi"])):
+            self._by_category.setdefault(token, []).append(position)
+
+    def _append_record(self, record: dict):
+        self._records.append(record)
+        self._index_record(len(self._records) - 1, record)
+
+    def _file_signature(self, path: str):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _shard_paths(self) -> list[str]:
+        main = os.path.abspath(self.data_path)
+        return [p for p in shard_paths(self.shard_glob) if os.path.abspath(p) != main]
+
+    def _dataset_signature(self):
+        """Signature file utama + semua shard (shard baru/berubah memicu reload)."""
+        return tuple((path, self._file_signature(path)) for path in [self.data_path] + self._shard_paths())
+
+    def _load_all(self):
+        """Memuat ulang file utama + shard + seluruh log dari awal."""
+        # Dikunci agar tidak membaca di tengah compaction worker lain
+        with self._file_lock:
+            self._records = []
+            self._reset_indexes()
+            # Streaming: record langsung diindeks, tanpa list sementara hasil json.load
+            for record in iter_compounds_from(self.data_path):
+                self._append_record(record)
+            self._main_count = len(self._records)
+            for path in self._shard_paths():
+                for record in iter_compounds_from(path):
+                    self._append_record(record)
+            self._shard_count = len(self._records) - self._main_count
+            self._data_signature = self._dataset_signature()
+            self._log_offset = 0
+            self._log_entries = 0
+            self._replay_log()
+        self._loaded = True
+        self.version += 1
+        print(f"CompoundStore: {len(self._records)} senyawa dimuat ke memori.")
+
+    def _replay_log(self) -> int:
+        """Memutar ulang entri log yang belum terbaca (mis. ditulis worker lain)."""
+        if not os.path.exists(self.log_path):
+            return 0
+        applied = 0
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            f.seek(self._log_offset)
+            while True:
+                line = f.readline()
+                if not line or not line.endswith("\n"):
+                    # Baris terakhir belum lengkap (sedang ditulis): baca lagi nanti
+                    break
+                self._log_offset = f.tell()
+                if line.strip():
+                    self._append_record(json.loads(line))
+                    self._log_entries += 1
+                    applied += 1
+        return applied
+
+    def _refresh(self):
+        """Memastikan data di memori sinkron dengan file di disk (murah: hanya stat)."""
+        if not self._loaded or self._dataset_signature() != self._data_signature:
+            self._load_all()
+            return
+        log_signature = self._file_signature(self.log_path)
+        if log_signature is None:
+            if self._log_offset:
+                # Log dipadatkan oleh worker lain tetapi file utama belum terbaca ulang
+                self._load_all()
+            return
+        if log_signature[1] < self._log_offset:
+            self._load_all()
+        elif log_signature[1] > self._log_offset and self._replay_log():
+            self.version += 1
+
+    def load(self):
+        """Memuat dataset (dipanggil saat startup; aman dipanggil berulang)."""
+        with self._lock:
+            self._refresh()
+        return self
+
+    # --- Pembacaan ---
+    def _lookup(self, index: dict, key) -> list[dict]:
+        with self._lock:
+            self._refresh()
+            return [self._records[i] for i in index.get(_normalize(key), [])]
+
+    def all(self) -> list[dict]:
+        with self._lock:
+            self._refresh()
+            return list(self._records)
+
+    def snapshot(self) -> tuple[list[dict], int]:
+        """Daftar record beserta versinya, diambil secara konsisten."""
+        with self._lock:
+            self._refresh()
+            return list(self._records), self.version
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._records)
+
+    def get(self, nama_senyawa: str) -> dict | None:
+        """Lookup O(1) berdasarkan nama_senyawa (case-insensitive)."""
+        matches = self._lookup(self._by_name, nama_senyawa)
+        return matches[0] if matches else None
+
+    def find_by_formula(self, rumus_molekul: str) -> list[dict]:
+        return self._lookup(self._by_formula, rumus_molekul)
+
+    def find_by_synonym(self, sinonim: str) -> list[dict]:
+        return self._lookup(self._by_synonym, sinonim)
+
+    def find_by_category(self, kategori: str) -> list[dict]:
+        return self._lookup(self._by_category, kategori)
+
+    def find_by_risk(self, tingkat_risiko: str) -> list[dict]:
+        return self._lookup(self._by_risk, tingkat_risiko)
+
+    def page(self, offset: int = 0, limit: int = 50, fields: list[str] | None = None,
+             risk: str | None = None, category: str | None = None) -> dict:
+        """Halaman data (opsional difilter risiko/kategori) dengan field projection."""
+        with self._lock:
+            self._refresh()
+            positions = range(len(self._records))
+            if risk:
+                positions = self._by_risk.get(_normalize(risk), [])
+            if category:
+                category_positions = set(self._by_category.get(_normalize(category), []))
+                positions = [i for i in positions if i in category_positions]
+            total = len(positions)
+            selected = [self._records[i] for i in list(positions)[offset:offset + limit]]
+        return {
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "items": [project_fields(record, fields) for record in selected],
+        }
+
+    # --- Penulisan ---
+    def add(self, record: dict) -> dict:
+        """Menambahkan satu senyawa lewat log append-only, lalu compaction bila perlu."""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, self._file_lock:
+            self._refresh()
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._replay_log()
+            self.version += 1
+            if self._log_entries >= self.compact_every:
+                self._compact_locked()
+        return record
+
+    def compact(self):
+        """Memadatkan log ke file JSON utama (penulisan atomik via os.replace)."""
+        with self._lock, self._file_lock:
+            self._refresh()
+            self._compact_locked()
+
+    def _compact_locked(self):
+        if not self._log_entries:
+            return
+        # Hanya file utama + log yang dipadatkan; record dari shard tetap di file shard-nya
+        log_start = self._main_count + self._shard_count
+        compacted = self._records[:self._main_count] + self._records[log_start:]
+        tmp_path = self.data_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(compacted, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.data_path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        print(f"CompoundStore: {self._log_entries} entri log dipadatkan ke {self.data_path}.")
+        if self._shard_count:
+            # Urutan record berubah (entri log kini sebelum shard): bangun ulang posisi indeks
+            self._load_all()
+            return
+        self._main_count = len(self._records)
+        self._data_signature = self._dataset_signature()
+        self._log_offset = 0
+        self._log_entries = 0
+
+
+# Instance proses-wide
+compound_store = CompoundStore()
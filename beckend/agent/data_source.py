@@ -0,0 +1,115 @@
+# agent/data_source.py
+"""
+Sumber data senyawa yang di-stream: satu senyawa dihasilkan per iterasi.
+
+- File .json berisi array top-level diparse secara inkremental (buffer berukuran
+  tetap + JSONDecoder.raw_decode), tanpa json.load seluruh file ke memori.
+- File .jsonl / .ndjson dibaca baris per baris.
+- Dataset boleh dipecah ke beberapa file shard di data/ (DATA_SHARD_GLOB),
+  dibaca berurutan setelah file utama dan sebelum log append-only CompoundStore.
+"""
+
+import glob
+import json
+import os
+from .embedding_service import DATA_FILE_PATH
+
+DATA_SHARD_GLOB = os.getenv("DATA_SHARD_GLOB", "data/data_kimia_shard_*.json*")
+COMPOUND_LOG_PATH = os.getenv("COMPOUND_LOG_PATH", "data/data_kimia_log.jsonl")
+READ_CHUNK_SIZE = 1 << 16  # 64 KB per pembacaan
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+# Karakter yang masih bisa melanjutkan angka JSON
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+def _iter_json_array(path: str, chunk_size: int = READ_CHUNK_SIZE):
+    """Parser inkremental untuk file berisi satu array JSON: menghasilkan elemen satu per satu."""
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+        read_size = chunk_size
+
+        def fill(buffer, pos):
+            data = f.read(read_size)
+            return buffer[pos:] + data, 0, not data
+
+        # Cari '[' pembuka
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                break
+            if eof:
+                return
+            buffer, pos, eof = fill(buffer, pos)
+        if buffer[pos] != "[":
+            raise ValueError(f"{path}: file JSON harus berisi array di top-level.")
+        pos += 1
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE + ",":
+                pos += 1
+            if pos >= len(buffer):
+                if eof:
+                    raise ValueError(f"{path}: array JSON tidak ditutup.")
+                buffer, pos, eof = fill(buffer, pos)
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Elemen belum lengkap di buffer: baca lebih banyak (ukuran baca dilipatgandakan
+                # agar elemen yang sangat besar tidak diparse ulang berkali-kali)
+                buffer, pos, eof = fill(buffer, pos)
+                read_size *= 2
+                continue
+            if not eof and (end == len(buffer) or buffer[end] in _NUMBER_CHARS):
+                # Angka yang terpotong di ujung buffer tetap lolos raw_decode ("[1234567" dibaca
+                # "123", "1.5e" dibaca "1.5"): baca lagi sebelum nilainya diterima
+                buffer, pos, eof = fill(buffer, pos)
+                continue
+            read_size = chunk_size
+            yield item
+            pos = end
+            if pos > chunk_size:
+                buffer, pos = buffer[pos:], 0
+
+
+def _iter_json_lines(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            # Baris terakhir yang belum lengkap (sedang ditulis) dilewati
+            if line.strip() and line.endswith("\n"):
+                yield json.loads(line)
+
+
+def iter_compounds_from(path: str):
+    """Menghasilkan senyawa satu per satu dari satu file (.json array atau .jsonl/.ndjson)."""
+    if path.endswith((".jsonl", ".ndjson")):
+        yield from _iter_json_lines(path)
+    else:
+        yield from _iter_json_array(path)
+
+
+def shard_paths(shard_glob: str = DATA_SHARD_GLOB) -> list[str]:
+    return sorted(glob.glob(shard_glob)) if shard_glob else []
+
+
+def dataset_paths(data_path: str = DATA_FILE_PATH, shard_glob: str = DATA_SHARD_GLOB,
+                  log_path: str | None = COMPOUND_LOG_PATH) -> list[str]:
+    """Urutan file dataset: file utama, shard, lalu log append-only (jika ada)."""
+    paths = [data_path] + [p for p in shard_paths(shard_glob) if os.path.abspath(p) != os.path.abspath(data_path)]
+    if log_path and os.path.exists(log_path):
+        paths.append(log_path)
+    return paths
+
+
+def iter_dataset(data_path: str = DATA_FILE_PATH, shard_glob: str = DATA_SHARD_GLOB,
+                 log_path: str | None = COMPOUND_LOG_PATH):
+    """Stream seluruh dataset (file utama + shard + log) satu senyawa per iterasi."""
+    for path in dataset_paths(data_path, shard_glob, log_path):
+        yield from iter_compounds_from(path)
@@ -0,0 +1,198 @@
+# agent/embedding_pipeline.py
+"""
+Pipeline embedding untuk ingestion: batching, paralel multi-proses, dan cache di disk.
+
+- EmbeddingCache: vektor float32 disimpan append-only di file biner yang dibaca lewat
+  np.memmap, plus indeks (hash konten -> baris). Chunk yang kontennya tidak berubah
+  tidak pernah di-embed ulang, bahkan setelah chroma_db dihapus.
+- CachedEmbeddings: pembungkus LangChain Embeddings yang memakai cache untuk
+  embed_documents (ingestion); embed_query tetap langsung ke model.
+- Jika EMBED_WORKERS > 1, run ingestion membuka SATU ProcessPoolExecutor lewat
+  CachedEmbeddings.parallel() yang dipakai ulang untuk semua batch INGEST_BATCH_SIZE;
+  setiap proses memuat model sekali (initializer) dan pool ditutup di akhir run.
+  Pool baru dibuat saat pertama kali ada teks yang belum ter-cache (run tanpa
+  perubahan tidak memuat model di proses worker).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import multiprocessing
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # >1 = pakai process pool
+# Minimal teks baru per panggilan embed_documents untuk dibagi ke pool. Harus <= INGEST_BATCH_SIZE
+# (embedding_service), karena ingestion memanggil add_documents per batch sebesar itu.
+EMBED_PARALLEL_MIN_TEXTS = int(os.getenv("EMBED_PARALLEL_MIN_TEXTS", "128"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Cache vektor berbasis hash konten: vectors.f32 (memmap) + index.jsonl."""
+
+    def __init__(self, cache_dir: str, model_name: str):
+        # Satu subfolder per model agar vektor dari model berbeda tidak tercampur
+        safe_model = model_name.replace("/", "__")
+        self.dir = os.path.join(cache_dir, safe_model)
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.jsonl")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self.dim = None
+        self._memmap = None
+        self._load()
+
+    def _load(self):
+        os.makedirs(self.dir, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._rows[entry["h"]] = entry["row"]
+        # Buang entri indeks yang vektornya tidak sempat tertulis (mis. proses mati di tengah jalan)
+        if self.dim:
+            stored_rows = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+            self._rows = {h: row for h, row in self._rows.items() if row < stored_rows}
+
+    def _vectors(self):
+        if self._memmap is None and self.dim and self._rows:
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            self._memmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._memmap
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, hashes: list[str]) -> dict[str, np.ndarray]:
+        with self._lock:
+            vectors = self._vectors()
+            return {h: np.array(vectors[self._rows[h]]) for h in hashes if h in self._rows}
+
+    def put_many(self, hashes: list[str], vectors: np.ndarray):
+        """Menambahkan vektor baru (append-only), lalu indeksnya."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            start_row = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+            # Vektor ditulis dulu, baru indeksnya: indeks tidak pernah menunjuk ke data yang belum ada
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                for offset, h in enumerate(hashes):
+                    f.write(json.dumps({"h": h, "row": start_row + offset}) + "\n")
+                    self._rows[h] = start_row + offset
+            self._memmap = None  # memmap dibuka ulang dengan ukuran baru saat dibaca
+
+
+# --- Worker process pool ---
+_worker_model = None
+
+
+def _init_worker(model_name: str):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_batch(texts: list[str]) -> np.ndarray:
+    # Sama seperti HuggingFaceEmbeddings.embed_documents: newline diganti spasi
+    texts = [t.replace("\n", " ") for t in texts]
+    return np.asarray(_worker_model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings LangChain dengan cache hash konten + batching + process pool opsional."""
+
+    def __init__(self, base: Embeddings, model_name: str, cache_dir: str = EMBEDDING_CACHE_DIR,
+                 batch_size: int = EMBED_BATCH_SIZE, workers: int = EMBED_WORKERS):
+        self.base = base
+        self.model_name = model_name
+        self.cache = EmbeddingCache(cache_dir, model_name)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.stats = {"cache_hits": 0, "embedded": 0, "batches": 0, "embed_seconds": 0.0, "pool_starts": 0}
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._parallel_depth = 0
+
+    @contextmanager
+    def parallel(self):
+        """
+        Mengaktifkan process pool untuk blok ini (satu run ingestion). Pool dibuat saat
+        pertama dibutuhkan, dipakai ulang lintas panggilan embed_documents, dan ditutup
+        saat blok terluar selesai.
+        """
+        with self._pool_lock:
+            self._parallel_depth += 1
+        try:
+            yield self
+        finally:
+            with self._pool_lock:
+                self._parallel_depth -= 1
+                pool = self._pool if self._parallel_depth == 0 else None
+                if pool is not None:
+                    self._pool = None
+            if pool is not None:
+                pool.shutdown()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: aman untuk torch (fork setelah model dimuat bisa deadlock)
+                context = multiprocessing.get_context("spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                 initializer=_init_worker, initargs=(self.model_name,))
+                self.stats["pool_starts"] += 1
+            return self._pool
+
+    def _batches(self, texts: list[str]):
+        for start in range(0, len(texts), self.batch_size):
+            yield texts[start:start + self.batch_size]
+
+    def _embed_missing(self, texts: list[str]) -> np.ndarray:
+        batches = list(self._batches(texts))
+        start = time.perf_counter()
+        if self.workers > 1 and self._parallel_depth and len(texts) >= EMBED_PARALLEL_MIN_TEXTS:
+            results = list(self._get_pool().map(_encode_batch, batches))
+        else:
+            results = [np.asarray(self.base.embed_documents(batch), dtype=np.float32) for batch in batches]
+        self.stats["batches"] += len(batches)
+        self.stats["embedded"] += len(texts)
+        self.stats["embed_seconds"] += time.perf_counter() - start
+        return np.concatenate(results) if results else np.empty((0, self.cache.dim or 0), dtype=np.float32)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [content_hash(text) for text in texts]
+        cached = self.cache.get_many(hashes)
+        self.stats["cache_hits"] += len(cached)
+
+        missing = {}
+        for text, h in zip(texts, hashes):
+            if h not in cached and h not in missing:
+                missing[h] = text
+        if missing:
+            vectors = self._embed_missing(list(missing.values()))
+            self.cache.put_many(list(missing.keys()), vectors)
+            cached.update(zip(missing.keys(), vectors))
+        return [cached[h].tolist() for h in hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.base.embed_query(text)
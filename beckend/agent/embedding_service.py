@@ -1,20 +1,23 @@
 # agent/embedding_service.py
 
+import hashlib
 import json
 import os
-import shutil
-# Import utility untuk memfilter metadata kompleks
-from langchain_community.vectorstores.utils import filter_complex_metadata 
-from langchain_core.documents import Document 
-from langchain_text_splitters import RecursiveCharacterTextSplitter 
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+import threading
+import time
+# langchain_community / HuggingFaceEmbeddings / Chroma di-import di dalam fungsi (lazy),
+# agar startup worker tidak membayar biaya import sebelum benar-benar dibutuhkan.
+from .file_lock import FileLock
+from .metrics import timed, observe_stage
 
 # Konfigurasi
 VECTOR_DB_PATH = "chroma_db"
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 # Menggunakan nama file yang Anda konfirmasi
 DATA_FILE_PATH = "data/data_kimia_final_indo.json" 
+# Jumlah chunk per batch saat menulis ke Vector DB (>= EMBED_PARALLEL_MIN_TEXTS agar batch
+# bisa dibagi ke process pool embedding, lihat embedding_pipeline)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
 
 def initialize_embeddings():
     """Menginisialisasi dan mengembalikan HuggingFace Embeddings."""
@@ -22,51 +25,188 @@ def initialize_embeddings():
     from langchain_community.embeddings import HuggingFaceEmbeddings
     return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
 
+# Model embedding dipakai bersama oleh ingestion dan retriever dalam satu proses,
+# supaya MiniLM tidak dimuat ulang di setiap request.
+_shared_embeddings = None
+_embeddings_lock = threading.Lock()
+
+_embeddings_load_ms = None
+
+def get_shared_embeddings():
+    """Mengembalikan instance HuggingFace Embeddings proses-wide (dimuat sekali)."""
+    global _shared_embeddings, _embeddings_load_ms
+    if _shared_embeddings is None:
+        with _embeddings_lock:
+            if _shared_embeddings is None:
+                start = time.perf_counter()
+                _shared_embeddings = initialize_embeddings()
+                _embeddings_load_ms = round((time.perf_counter() - start) * 1000, 2)
+                observe_stage("embedding_load", _embeddings_load_ms, start)
+                print(f"Embeddings: model {EMBEDDING_MODEL} dimuat dalam {_embeddings_load_ms} ms.")
+    return _shared_embeddings
+
+def get_embeddings_load_ms() -> float | None:
+    """Waktu muat model embedding (None jika belum dimuat di proses ini)."""
+    return _embeddings_load_ms
+
+# chromadb menyimpan client per path di cache proses-wide; membuat dua client untuk
+# path yang sama dari dua thread sekaligus (mount startup + job ingestion) bisa balapan.
+_chroma_open_lock = threading.Lock()
+
+def open_vectorstore(embedding_function=None):
+    """Membuka Chroma persisten di VECTOR_DB_PATH (import langchain_community secara lazy)."""
+    from langchain_community.vectorstores import Chroma
+    with _chroma_open_lock:
+        return Chroma(persist_directory=VECTOR_DB_PATH, embedding_function=embedding_function)
+
+# Serialisasi ingestion antar thread DAN antar worker, agar job bersamaan tidak menimpa chroma_db
+_ingestion_lock = FileLock(VECTOR_DB_PATH + ".lock")
+
+def make_chunk_id(compound_name: str, chunk_index: int, content: str) -> str:
+    """
+    ID chunk yang stabil: nama senyawa + urutan chunk + hash konten.
+    Konten yang sama selalu menghasilkan ID yang sama, sehingga hanya chunk
+    baru/berubah yang perlu di-embed ulang.
+    """
+    content_hash = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+    return f"{compound_name}::{chunk_index}::{content_hash}"
+
+# Key konten utama, berurutan dari yang paling mungkin
+CONTENT_KEYS = ("content", "text", "deskripsi")
+_METADATA_TYPES = (str, int, float, bool)
+
+def chunk_metadata(item: dict, content_key: str | None) -> dict:
+    """
+    Metadata ramping untuk Chroma: hanya field primitif, tanpa field konten
+    (sudah ada di page_content). Menggantikan Document(metadata=item) yang
+    menyalin seluruh record lalu dibersihkan filter_complex_metadata.
+    """
+    return {
+        key: value for key, value in item.items()
+        if key != content_key and isinstance(value, _METADATA_TYPES)
+    }
+
+def iter_chunks(records):
+    """
+    Mengubah record (iterable, boleh generator) menjadi pasangan (Document, ID stabil)
+    satu per satu, sehingga memori tidak bergantung pada ukuran dataset.
+    Record duplikat (nama + konten sama) cukup dihasilkan sekali.
+    """
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    seen = set()
+    for item in records:
+        content_key = next((key for key in CONTENT_KEYS if item.get(key)), None)
+        content = item[content_key] if content_key else ""
+        if not content or len(content) <= 50:
+            continue
+        metadata = chunk_metadata(item, content_key)
+        compound_name = str(item.get("nama_senyawa") or item.get("id") or "unknown")
+        # Split Data (Chunking) per dokumen agar urutan chunk per senyawa stabil
+        for chunk_index, text in enumerate(text_splitter.split_text(content)):
+            chunk_id = make_chunk_id(compound_name, chunk_index, text)
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            yield Document(page_content=text, metadata=dict(metadata)), chunk_id
+
+# Embeddings khusus ingestion: cache hash konten di disk + batching/process pool
+_cached_embeddings = None
+
+def get_cached_embeddings():
+    """Mengembalikan CachedEmbeddings proses-wide (membungkus model embedding bersama)."""
+    global _cached_embeddings
+    if _cached_embeddings is None:
+        with _embeddings_lock:
+            if _cached_embeddings is None:
+                from .embedding_pipeline import CachedEmbeddings
+                _cached_embeddings = CachedEmbeddings(get_shared_embeddings(), EMBEDDING_MODEL)
+    return _cached_embeddings
+
 def run_ingestion() -> str:
-    """Melaksanakan seluruh proses Ingestion dan menyimpan ke Vector DB."""
+    """
+    Melaksanakan proses Ingestion secara inkremental ke Vector DB.
+
+    Setiap chunk diberi ID stabil (lihat make_chunk_id). Hanya chunk baru/berubah
+    yang di-embed dan di-upsert; chunk yang sudah tidak ada di dataset dihapus.
+    Index lama tidak dihapus, sehingga query tetap dilayani selama update berjalan.
+    Dataset (file utama + shard + log) di-stream satu senyawa per iterasi; yang
+    disimpan di memori hanya ID chunk dan satu batch Document.
+    """
     try:
         if not os.path.exists(DATA_FILE_PATH):
              return f"Error: File JSON {DATA_FILE_PATH} tidak ditemukan di path."
-             
-        # 1. Load Data (dari JSON)
-        with open(DATA_FILE_PATH, 'r', encoding='utf-8') as f:
-            data_list = json.load(f)
-            
-        documents = []
-        for item in data_list:
-            # Mengambil konten dari key yang paling mungkin
-            content = item.get("content") or item.get("text") or item.get("deskripsi") or ""
-            
-            if content and len(content) > 50: 
-                # Menyimpan dokumen dengan metadata lengkap (item).
-                # Metadata ini akan dibersihkan di langkah berikutnya.
-                documents.append(Document(page_content=content, metadata=item)) 
-        
-        # 2. Cek Kritis: Apakah documents terisi?
-        if not documents:
-            return "Error: Gagal memuat dokumen. Periksa key konten utama di JSON Anda."
-        
-        # 3. Split Data (Chunking)
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        texts = text_splitter.split_documents(documents)
-
-        # 4. FILTER METADATA KOMPLEKS (SOLUSI UNTUK ERROR TERAKHIR)
-        # Menghapus tipe data non-primitif (seperti list atau dict berlapis) dari metadata
-        # agar kompatibel dengan ChromaDB.
-        texts = filter_complex_metadata(texts)
-        
-        # 5. Create Embeddings & Store
-        embeddings = initialize_embeddings()
-        
-        if os.path.exists(VECTOR_DB_PATH):
-            shutil.rmtree(VECTOR_DB_PATH) 
-        
-        Chroma.from_documents(
-            texts,
-            embeddings,
-            persist_directory=VECTOR_DB_PATH
+
+        from .data_source import iter_dataset
+        from .index_manifest import dataset_hash, write_manifest
+
+        with _ingestion_lock, timed("ingest_total") as total_span:
+            # Hash dataset dihitung SEBELUM streaming: jika data berubah di tengah jalan,
+            # manifest tidak cocok lagi dan startup berikutnya membangun ulang.
+            with timed("ingest_hash"):
+                current_hash = dataset_hash()
+
+            # 1. Buka Vector Store yang sudah ada (tanpa rmtree)
+            with timed("ingest_open"):
+                embeddings = get_cached_embeddings()
+                stats_before = dict(embeddings.stats)
+                vectorstore = open_vectorstore(embeddings)
+                existing_ids = set(vectorstore.get(include=[])["ids"])
+
+            # 2. Stream data -> chunk -> embed (via cache) -> simpan, per batch.
+            # Tambah dulu baru hapus, agar tidak ada jeda di mana senyawa hilang dari index
+            # Process pool embedding (EMBED_WORKERS > 1) dibuka sekali untuk seluruh run
+            wanted_ids = set()
+            batch_docs, batch_ids = [], []
+            added = 0
+            with embeddings.parallel():
+                for doc, doc_id in iter_chunks(iter_dataset()):
+                    wanted_ids.add(doc_id)
+                    if doc_id in existing_ids:
+                        continue
+                    batch_docs.append(doc)
+                    batch_ids.append(doc_id)
+                    if len(batch_docs) >= INGEST_BATCH_SIZE:
+                        with timed("ingest_embed_upsert", chunks=len(batch_docs)):
+                            vectorstore.add_documents(batch_docs, ids=batch_ids)
+                        added += len(batch_docs)
+                        batch_docs, batch_ids = [], []
+                if batch_docs:
+                    with timed("ingest_embed_upsert", chunks=len(batch_docs)):
+                        vectorstore.add_documents(batch_docs, ids=batch_ids)
+                    added += len(batch_docs)
+            total_span["chunks"], total_span["added"] = len(wanted_ids), added
+
+            # 3. Cek Kritis: Apakah documents terisi?
+            if not wanted_ids:
+                return "Error: Gagal memuat dokumen. Periksa key konten utama di JSON Anda."
+
+            # 4. Chunk yang sudah tidak ada di dataset dihapus
+            to_delete = sorted(existing_ids - wanted_ids)
+            if to_delete:
+                with timed("ingest_delete", chunks=len(to_delete)):
+                    vectorstore.delete(ids=to_delete)
+
+            # 5. Backend flat: ekspor snapshot vektor dari Chroma (tanpa embed ulang)
+            from .vector_store import VECTOR_BACKEND, export_flat_index
+            if VECTOR_BACKEND == "flat":
+                with timed("ingest_export"):
+                    export_flat_index(vectorstore)
+
+            # 6. Manifest: startup berikutnya bisa langsung me-mount index tanpa cek ulang
+            with timed("ingest_manifest"):
+                write_manifest(current_hash, len(wanted_ids))
+
+        unchanged = len(wanted_ids) - added
+        embedded = embeddings.stats["embedded"] - stats_before["embedded"]
+        cache_hits = embeddings.stats["cache_hits"] - stats_before["cache_hits"]
+        return (
+            f"Ingestion berhasil! {len(wanted_ids)} chunks tersinkron "
+            f"({added} baru/berubah, {len(to_delete)} dihapus, {unchanged} tidak berubah; "
+            f"{embedded} vektor dihitung, {cache_hits} dari cache embedding)."
         )
-        return f"Ingestion berhasil! {len(texts)} chunks dari {len(documents)} dokumen telah disimpan ke Vector DB."
 
     except Exception as e:
-        return f"Error saat menjalankan ingestion: {e}"
\ No newline at end of file
+        return f"Error saat menjalankan ingestion: {e}"
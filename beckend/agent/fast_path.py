@@ -0,0 +1,207 @@
+# agent/fast_path.py
+"""
+Fast path deterministik untuk pertanyaan lookup properti sederhana.
+
+Contoh: "berapa titik didih metana?", "rumus molekul CID-297", "densitas benzena".
+Intent properti dideteksi dengan pola kata kunci, senyawanya di-resolve lewat
+CompoundStore (nama, sinonim, rumus) atau identifier persis di indeks leksikal,
+lalu jawaban disusun dari field terstruktur dengan template -- tanpa retrieval
+vektor dan tanpa panggilan LLM (di bawah 1 ms).
+
+Pertanyaan yang butuh penalaran ("mengapa", "bandingkan", ...), senyawa yang tidak
+ter-resolve secara unik, atau nilai field yang kosong tetap lewat jalur biasa.
+"""
+
+import os
+import re
+import threading
+import time
+from .compound_store import compound_store
+from .metrics import observe_stage
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") == "1"
+
+# (pola, field). Urutan penting: frasa spesifik dulu, frasa yang cocok dihapus dari query
+PROPERTY_PATTERNS = [
+    (r"titik\s+didih|boiling\s+point|bp", "titik_didih_celsius"),
+    (r"titik\s+(?:leleh|lebur)|melting\s+point|mp", "titik_leleh_celsius"),
+    (r"densitas|massa\s+jenis|kerapatan|density", "densitas_gcm3"),
+    (r"(?:berat|massa|bobot)\s+(?:molekul|molar|rumus)|molecular\s+weight|molar\s+mass|mr", "berat_molekul"),
+    (r"rumus(?:\s+(?:molekul|kimia|senyawa))?|molecular\s+formula|formula", "rumus_molekul"),
+    (r"pernyataan\s+bahaya|(?:kode|klasifikasi)\s+(?:bahaya|h)|bahaya\s+ghs|ghs", "pernyataan_bahaya_ghs"),
+    (r"(?:tingkat\s+)?risiko(?:\s+keselamatan)?|risk\s+level", "tingkat_risiko_keselamatan"),
+    (r"bahaya(?:\s+keselamatan)?|hazards?", "bahaya_keselamatan"),
+    (r"sinonim|nama\s+lain|synonyms?", "sinonim"),
+    (r"kategori(?:\s+aplikasi)?|kegunaan|aplikasi", "kategori_aplikasi"),
+    (r"ketersediaan(?:\s+bahan\s+baku)?|availability", "ketersediaan_bahan_baku"),
+]
+_PROPERTY_RES = [(re.compile(rf"\b(?:{pattern})\b"), field) for pattern, field in PROPERTY_PATTERNS]
+
+# Pertanyaan dengan kata-kata ini butuh penjelasan/penalaran: bukan lookup
+_REASONING_RE = re.compile(
+    r"\b(?:mengapa|kenapa|bagaimana|jelaskan|bandingkan|perbandingan|dibandingkan|reaksi|"
+    r"campur|mencampur|rekomendasi|sarankan|why|how|compare|versus|vs)\b"
+)
+
+_STOPWORDS = {
+    "berapa", "berapakah", "brp", "apa", "apakah", "sebutkan", "tolong", "beri", "berikan", "tahu",
+    "dari", "untuk", "pada", "milik", "senyawa", "zat", "bahan", "kimia", "yang", "itu", "ini", "adalah",
+    "nya", "dan", "ya", "dong", "kah", "saya", "ingin", "mau", "cari", "tentang", "data", "nilai",
+    "the", "of", "what", "is", "for", "a", "an", "compound",
+}
+
+# Unit & label jawaban
+FIELD_LABELS = {
+    "titik_didih_celsius": ("Titik didih", " °C"),
+    "titik_leleh_celsius": ("Titik leleh", " °C"),
+    "densitas_gcm3": ("Densitas", " g/cm³"),
+    "berat_molekul": ("Berat molekul", " g/mol"),
+    "rumus_molekul": ("Rumus molekul", ""),
+    "pernyataan_bahaya_ghs": ("Pernyataan bahaya GHS", ""),
+    "tingkat_risiko_keselamatan": ("Tingkat risiko keselamatan", ""),
+    "bahaya_keselamatan": ("Bahaya keselamatan", ""),
+    "sinonim": ("Sinonim", ""),
+    "kategori_aplikasi": ("Kategori aplikasi", ""),
+    "ketersediaan_bahan_baku": ("Ketersediaan bahan baku", ""),
+}
+MAX_LIST_ITEMS = 8
+
+# Penyesuaian ejaan nama IUPAC Indonesia -> Inggris (metana -> methane, etanol -> ethanol)
+_SPELLING_RULES = [
+    (r"^met(?!h)", "meth"), (r"^et(?!h)", "eth"), (r"ana$", "ane"), (r"ena$", "ene"), (r"una$", "une"),
+    (r"ina$", "ine"), (r"ida$", "ide"), (r"at$", "ate"), (r"it$", "ite"), (r"k", "c"), (r"f", "ph"),
+]
+
+
+def detect_fields(query: str) -> tuple[list[str], str]:
+    """Field properti yang ditanyakan + sisa teks query (calon nama senyawa)."""
+    text = query.lower()
+    fields = []
+    for pattern, field in _PROPERTY_RES:
+        if pattern.search(text):
+            if field not in fields:
+                fields.append(field)
+            text = pattern.sub(" ", text)
+    return fields, text
+
+
+def _candidate_name(rest: str) -> str:
+    words = [word.strip("?.!,;:\"'()") for word in rest.split()]
+    return " ".join(word for word in words if word and word not in _STOPWORDS)
+
+
+def _spelling_variants(name: str) -> list[str]:
+    variants = [name]
+    for pattern, replacement in _SPELLING_RULES:
+        variant = re.sub(pattern, replacement, variants[-1])
+        if variant != variants[-1]:
+            variants.append(variant)
+    return variants
+
+
+def _unique(records: list[dict]) -> dict | None:
+    return records[0] if len(records) == 1 else None
+
+
+def resolve_compound(name: str, query: str) -> dict | None:
+    """Resolve nama/sinonim/rumus ke SATU record (None jika tidak ada atau ambigu)."""
+    if name:
+        for variant in _spelling_variants(name):
+            record = (
+                compound_store.get(variant)
+                or _unique(compound_store.find_by_synonym(variant))
+                or _unique(compound_store.find_by_formula(variant))
+            )
+            if record is not None:
+                return record
+    # Identifier unik di tengah kalimat (mis. "CID-297", "CH4", nomor CAS)
+    from .lexical_index import get_lexical_index
+    return _unique(get_lexical_index().exact_match(query, limit=1))
+
+
+def _format_value(field: str, value) -> str:
+    _, unit = FIELD_LABELS[field]
+    if isinstance(value, float):
+        return f"{value:g}{unit}"
+    if isinstance(value, int):
+        return f"{value}{unit}"
+    items = [item.strip().replace("_", " ") for item in str(value).split("|") if item.strip()]
+    if field == "pernyataan_bahaya_ghs":
+        # Entri GHS banyak yang berulang dengan persentase berbeda: ambil kode H unik
+        coded = [item for item in items if re.match(r"(?:EU)?H\d{3}", item)]
+        seen, unique_items = set(), []
+        for item in coded or items:
+            code = item.split(":")[0].split(" (")[0].strip()
+            if code not in seen:
+                seen.add(code)
+                unique_items.append(item)
+        items = unique_items
+    shown = items[:MAX_LIST_ITEMS]
+    suffix = f" (dan {len(items) - len(shown)} lainnya)" if len(items) > len(shown) else ""
+    return ("; ".join(shown) if field == "pernyataan_bahaya_ghs" else ", ".join(shown)) + suffix
+
+
+def _display_name(record: dict) -> str:
+    name = record.get("nama_senyawa") or "Senyawa"
+    synonyms = [s for s in str(record.get("sinonim") or "").split("|") if s.strip()]
+    formula = record.get("rumus_molekul")
+    extras = [s for s in (synonyms[0] if synonyms else None, formula) if s and s.lower() != str(name).lower()]
+    return f"{name} ({', '.join(extras)})" if extras else str(name)
+
+
+def answer_property_question(query: str) -> tuple[str, list[str]] | None:
+    """Jawaban template + field yang dijawab, atau None jika bukan lookup sederhana."""
+    if _REASONING_RE.search(query.lower()):
+        return None
+    fields, rest = detect_fields(query)
+    if not fields:
+        return None
+    record = resolve_compound(_candidate_name(rest), query)
+    if record is None:
+        return None
+    if any(record.get(field) in (None, "", []) for field in fields):
+        # Data kosong: biarkan jalur RAG/LLM yang menjawab
+        return None
+    name = _display_name(record)
+    lines = [f"{FIELD_LABELS[field][0]} {name}: {_format_value(field, record[field])}." for field in fields]
+    return "\n".join(lines) + "\n(Sumber: database senyawa)", fields
+
+
+# --- Telemetri ---
+_stats_lock = threading.Lock()
+_stats = {"queries": 0, "served": 0, "total_us": 0.0, "by_field": {}}
+
+
+def try_fast_path(query: str) -> str | None:
+    """Dipanggil AgentOrchestrator untuk setiap query /ask; mencatat porsi traffic fast path."""
+    if not FAST_PATH_ENABLED:
+        return None
+    start = time.perf_counter()
+    try:
+        result = answer_property_question(query)
+    except Exception as e:
+        print(f"Fast path error: {e}")
+        result = None
+    elapsed_us = (time.perf_counter() - start) * 1e6
+    observe_stage("fast_path", elapsed_us / 1000, start, served=result is not None)
+    with _stats_lock:
+        _stats["queries"] += 1
+        if result is not None:
+            _stats["served"] += 1
+            _stats["total_us"] += elapsed_us
+            for field in result[1]:
+                _stats["by_field"][field] = _stats["by_field"].get(field, 0) + 1
+    if result is None:
+        return None
+    print(f"Orchestrator: Fast path answered in {elapsed_us:.0f} µs (tanpa LLM).")
+    return result[0]
+
+
+def get_fast_path_stats() -> dict:
+    with _stats_lock:
+        stats = {key: (dict(value) if isinstance(value, dict) else value) for key, value in _stats.items()}
+    served = stats.pop("total_us")
+    stats["fraction_served"] = round(stats["served"] / stats["queries"], 4) if stats["queries"] else None
+    stats["avg_latency_us"] = round(served / stats["served"], 1) if stats["served"] else None
+    stats["enabled"] = FAST_PATH_ENABLED
+    return stats
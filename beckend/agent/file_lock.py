@@ -0,0 +1,38 @@
+# agent/file_lock.py
+"""Lock file antar proses (antar worker uvicorn) berbasis flock."""
+
+import threading
+
+try:
+    import fcntl  # Lock antar proses (Linux/macOS, termasuk container Docker)
+except ImportError:  # pragma: no cover - Windows dev tanpa fcntl
+    fcntl = None
+
+
+class FileLock:
+    """
+    Lock eksklusif antar proses berbasis flock; no-op jika fcntl tidak tersedia.
+    Reentrant di dalam satu proses, dan juga mengunci antar thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            self._handle = open(self.path, "a")
+            fcntl.flock(self._handle, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._handle is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+        self._thread_lock.release()
@@ -1,9 +1,21 @@
 # FILE: agent/generator_service.py (KODE LENGKAP DIPERBARUI)
 
-from langchain_core.documents import Document
-from .llm import get_llm_response
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+from .llm import get_llm_response, aget_llm_response
+from .compound_store import compound_store
+from .property_index import prefilter_candidates, CANDIDATE_FIELDS
+from .retriever_service import similarity_search
+from .metrics import timed
 import json # Diperlukan untuk memproses/mengembalikan JSON
 
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
 SYSTEM_PROMPT = (
     "Anda adalah asisten AI yang ahli dalam Kimia. "
     "Gunakan hanya konteks yang diberikan untuk menjawab pertanyaan. "
@@ -11,32 +23,160 @@ SYSTEM_PROMPT = (
     "Pastikan jawaban Anda akurat dan ringkas."
 )
 
+# --- SELEKSI KANDIDAT HYBRID (VEKTOR + FILTER PROPERTI) ---
+# Alih-alih menempelkan seluruh dataset ke prompt, hanya N record terbaik yang dikirim.
+GENERATE_TOP_N = int(os.getenv("GENERATE_TOP_N", "8"))
+GENERATE_TOKEN_BUDGET = int(os.getenv("GENERATE_TOKEN_BUDGET", "1500"))
+CANDIDATE_VECTOR_K = int(os.getenv("CANDIDATE_VECTOR_K", "30"))
+CHARS_PER_TOKEN = 4  # Estimasi kasar jumlah token dari panjang teks
+
+_metrics_lock = threading.Lock()
+_generation_metrics = {
+    "requests": 0,
+    "prompt_tokens_total": 0,
+    "candidates_total": 0,
+    "llm_latency_ms_total": 0.0,
+    "baseline_prompt_tokens": None,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def build_candidate_query(*parts) -> str:
+    """Menggabungkan kriteria pengguna menjadi satu teks query untuk pencarian vektor."""
+    texts = []
+    for part in parts:
+        if isinstance(part, dict):
+            texts.extend(f"{key} {value}" for key, value in part.items())
+        elif part:
+            texts.append(str(part))
+    return " ".join(texts)
+
+
+def select_candidates(query_text: str, properti_target: dict | None = None,
+                      top_n: int = GENERATE_TOP_N) -> list[dict]:
+    """
+    Seleksi kandidat hybrid: kemiripan vektor (index Chroma) + filter properti numerik.
+
+    - Jika filter properti menghasilkan shortlist, shortlist diurutkan ulang
+      berdasarkan peringkat vektor (yang tidak muncul di hasil vektor menyusul).
+    - Jika tidak ada kriteria numerik, dipakai hasil vektor saja.
+    """
+    with timed("property_prefilter"):
+        shortlist = prefilter_candidates(properti_target, limit=None) if properti_target else None
+
+    vector_docs = similarity_search(query_text, k=CANDIDATE_VECTOR_K) if query_text else []
+    vector_rank = {}
+    for doc in vector_docs:
+        name = doc.metadata.get("nama_senyawa")
+        if name and name not in vector_rank:
+            vector_rank[name] = len(vector_rank)
+
+    if shortlist is not None:
+        ordered = sorted(
+            enumerate(shortlist),
+            key=lambda item: (vector_rank.get(item[1].get("nama_senyawa"), len(vector_rank)), item[0])
+        )
+        return [record for _, record in ordered[:top_n]]
+
+    candidates = []
+    for name in vector_rank:
+        record = compound_store.get(name)
+        if record is not None:
+            candidates.append(record)
+        if len(candidates) >= top_n:
+            break
+    return candidates
+
+
+def serialize_candidates(candidates: list[dict], token_budget: int = GENERATE_TOKEN_BUDGET) -> str:
+    """Serialisasi ringkas (satu JSON per baris, field penting saja) dibatasi token budget."""
+    lines, used = [], 0
+    for record in candidates:
+        compact = {field: record.get(field) for field in CANDIDATE_FIELDS if record.get(field) is not None}
+        line = json.dumps(compact, ensure_ascii=False, separators=(",", ":"))
+        cost = estimate_tokens(line) + 1
+        if lines and used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def _baseline_prompt_tokens() -> int:
+    """Perkiraan ukuran prompt jika seluruh dataset ditempel (pendekatan lama)."""
+    records = compound_store.all()
+    return estimate_tokens(json.dumps(records, ensure_ascii=False))
+
+
+def record_generation(prompt: str, candidate_count: int, llm_latency_ms: float):
+    """Mencatat ukuran prompt dan latensi LLM untuk perbandingan sebelum/sesudah."""
+    with _metrics_lock:
+        _generation_metrics["requests"] += 1
+        _generation_metrics["prompt_tokens_total"] += estimate_tokens(prompt)
+        _generation_metrics["candidates_total"] += candidate_count
+        _generation_metrics["llm_latency_ms_total"] += llm_latency_ms
+
+
+def get_generation_stats() -> dict:
+    with _metrics_lock:
+        stats = dict(_generation_metrics)
+    if stats["baseline_prompt_tokens"] is None:
+        try:
+            baseline = _baseline_prompt_tokens()
+        except Exception:
+            baseline = None
+        with _metrics_lock:
+            _generation_metrics["baseline_prompt_tokens"] = baseline
+        stats["baseline_prompt_tokens"] = baseline
+    count = stats["requests"]
+    avg_tokens = stats["prompt_tokens_total"] / count if count else None
+    stats["avg_prompt_tokens"] = round(avg_tokens, 1) if avg_tokens is not None else None
+    stats["avg_candidates"] = round(stats["candidates_total"] / count, 2) if count else None
+    stats["avg_llm_latency_ms"] = round(stats["llm_latency_ms_total"] / count, 2) if count else None
+    if avg_tokens and stats["baseline_prompt_tokens"]:
+        stats["prompt_size_reduction"] = round(1 - avg_tokens / stats["baseline_prompt_tokens"], 4)
+    stats["token_budget"] = GENERATE_TOKEN_BUDGET
+    stats["top_n"] = GENERATE_TOP_N
+    return stats
+
+
 # --- FUNGSI BARU UNTUK GENERASI JSON DETAIL ---
 # Fungsi ini memisahkan tugas pencarian senyawa (RAG) dari tugas penalaran (LLM)
-def generate_detailed_json_answer(user_query: str, compound_name: str, all_raw_data: str) -> str:
+def generate_detailed_json_answer(user_query: str, compound_name: str, candidates: list[dict] | None = None) -> str:
     """
     Mengambil nama senyawa yang direkomendasikan dan memintanya untuk membuat
-    output JSON lengkap berdasarkan data mentah.
+    output JSON lengkap berdasarkan record database yang relevan saja.
+
+    Record lengkap senyawa diambil langsung dari CompoundStore; kandidat lain
+    (hasil select_candidates) dikirim ringkas dalam batas token budget.
     """
-    
-    # 1. TEMUKAN DATA MENTAH DARI DATABASE (SIMULASI)
-    # Karena kita tidak memiliki implementasi database sesungguhnya, 
-    # kita asumsikan all_raw_data adalah JSON string dari seluruh dataset.
-    
-    # (Di aplikasi asli, Anda akan query database Anda di sini)
-    
+    target_record = compound_store.get(compound_name)
+    if candidates is None:
+        candidates = select_candidates(f"{compound_name} {user_query}")
+
+    target_json = json.dumps(target_record, ensure_ascii=False) if target_record else "(tidak ditemukan persis)"
+    candidate_context = serialize_candidates(
+        [c for c in candidates if c is not target_record]
+    )
+
     # Kriteria prompt yang sangat terstruktur
     prompt = f"""
     Senyawa target yang direkomendasikan adalah '{compound_name}'.
     
     Data kriteria pengguna adalah: {user_query}.
     
-    Berikut adalah seluruh dataset kimia Anda:
-    {all_raw_data}
+    Record lengkap senyawa target dari database:
+    {target_json}
+
+    Kandidat lain yang relevan (ringkas):
+    {candidate_context}
     
     **TUGAS:**
-    1. Cari dan ekstrak HANYA objek JSON LENGKAP (termasuk semua field detail, data_unsur_penyusun) 
-       dari dataset di atas untuk senyawa dengan 'nama_senyawa' yang paling mendekati '{compound_name}'.
+    1. Gunakan record lengkap di atas (termasuk semua field detail, data_unsur_penyusun). Jika record
+       target tidak ditemukan, pilih kandidat dengan 'nama_senyawa' yang paling mendekati '{compound_name}'.
     2. Tambahkan DUA field BARU ke objek JSON senyawa tersebut:
        - "skor_kecocokan": (Angka 1-100, nilai kecocokan terhadap kriteria pengguna).
        - "justifikasi_ringkas": (1-2 kalimat ringkas menjelaskan mengapa senyawa ini adalah yang terbaik untuk kriteria pengguna).
@@ -57,24 +197,31 @@ def generate_detailed_json_answer(user_query: str, compound_name: str, all_raw_d
     }}
     """
     
-    # Panggil LLM (Gemini Pro) dengan JSON forcing.
-    # Kita tidak menggunakan force_json=True di sini karena itu akan dilakukan di Orchestrator
-    # Tetapi kita HARUS memastikan LLM dipanggil dalam mode JSON.
-    # Kita akan memodifikasi get_llm_response di llm.py untuk menerima flag force_json.
-
-    # Kita panggil LLM, dan Orchestrator akan menangani JSON forcing
+    # Panggil LLM dengan JSON forcing.
+    start = time.perf_counter()
     answer = get_llm_response(prompt, force_json=True)
+    record_generation(prompt, len(candidates), (time.perf_counter() - start) * 1000)
     return answer
 
 # (Fungsi generate_answer untuk RAG Pipeline tetap sama)
 def generate_answer(user_query: str, retrieved_documents: list[Document]) -> str:
     # ... (kode generator_service.py yang lama untuk RAG Pipeline tetap sama)
     # Ini akan dipanggil dari AgentOrchestrator jika force_json=False (endpoint /ask)
-    context = "\n---\n".join([doc.page_content for doc in retrieved_documents])
-    prompt = (
-        f"{SYSTEM_PROMPT}\n\n"
-        f"KONTEKS:\n{context}\n\n"
-        f"PERTANYAAN PENGGUNA: {user_query}"
-    )
+    prompt = build_rag_prompt(user_query, retrieved_documents)
     answer = get_llm_response(prompt, force_json=False)
-    return answer
\ No newline at end of file
+    return answer
+
+def build_rag_prompt(user_query: str, retrieved_documents: list[Document]) -> str:
+    """Menyusun prompt RAG dari dokumen hasil retrieval."""
+    with timed("prompt_build", kind="rag", documents=len(retrieved_documents)):
+        context = "\n---\n".join([doc.page_content for doc in retrieved_documents])
+        return (
+            f"{SYSTEM_PROMPT}\n\n"
+            f"KONTEKS:\n{context}\n\n"
+            f"PERTANYAAN PENGGUNA: {user_query}"
+        )
+
+async def agenerate_answer(user_query: str, retrieved_documents: list[Document]) -> str:
+    """Versi async dari generate_answer (dipakai endpoint /ask yang async)."""
+    prompt = build_rag_prompt(user_query, retrieved_documents)
+    return await aget_llm_response(prompt, force_json=False)
\ No newline at end of file
@@ -0,0 +1,89 @@
+# agent/index_manifest.py
+"""
+Manifest index vektor, disimpan di samping chroma_db (chroma_db.manifest.json).
+
+Berisi hash dataset (file utama + shard + log) dan nama model embedding saat
+ingestion terakhir berhasil. Saat startup, jika manifest cocok dengan dataset dan
+model sekarang, index yang sudah ada langsung di-mount tanpa ingestion; hanya
+jika tidak cocok (atau belum ada) index dibangun ulang di background.
+"""
+
+import hashlib
+import json
+import os
+import time
+from .embedding_service import EMBEDDING_MODEL, VECTOR_DB_PATH
+from .data_source import dataset_paths
+
+MANIFEST_PATH = os.getenv("INDEX_MANIFEST_PATH", VECTOR_DB_PATH + ".manifest.json")
+MANIFEST_VERSION = 1  # Naikkan jika format chunk/metadata berubah (memaksa rebuild)
+
+MANIFEST_MATCH = "match"
+MANIFEST_MISMATCH = "mismatch"
+MANIFEST_MISSING = "missing"
+
+
+def dataset_hash() -> str:
+    """SHA-256 isi semua file dataset (dibaca per blok 1 MB, memori konstan)."""
+    digest = hashlib.sha256()
+    for path in dataset_paths():
+        if not os.path.exists(path):
+            continue
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest() -> dict | None:
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_manifest(data_hash: str, chunk_count: int):
+    """Ditulis atomik setelah ingestion berhasil."""
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "dataset_hash": data_hash,
+        "embedding_model": EMBEDDING_MODEL,
+        "chunk_count": chunk_count,
+        "created_at": time.time(),
+    }
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def index_generation() -> str:
+    """
+    Stamp versi index (mtime + ukuran file manifest, ditulis ulang setiap ingestion berhasil).
+    Murah (satu stat) dan sama di semua worker, sehingga setiap worker bisa mendeteksi
+    reindex yang dijalankan worker/proses lain.
+    """
+    try:
+        stat = os.stat(MANIFEST_PATH)
+    except FileNotFoundError:
+        return "none"
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def check_manifest() -> dict:
+    """Membandingkan manifest dengan dataset + model sekarang."""
+    start = time.perf_counter()
+    manifest = read_manifest()
+    if manifest is None or not os.path.exists(VECTOR_DB_PATH):
+        status = MANIFEST_MISSING
+    elif (
+        manifest.get("version") == MANIFEST_VERSION
+        and manifest.get("embedding_model") == EMBEDDING_MODEL
+        and manifest.get("dataset_hash") == dataset_hash()
+    ):
+        status = MANIFEST_MATCH
+    else:
+        status = MANIFEST_MISMATCH
+    return {"status": status, "check_ms": round((time.perf_counter() - start) * 1000, 2)}
@@ -0,0 +1,164 @@
+# agent/ingestion_jobs.py
+"""
+Antrian job ingestion di background.
+
+- /save_compound dan /ingest hanya mendaftarkan job lalu langsung mengembalikan job_id.
+- Debounce: selama masih ada job yang menunggu, submit baru digabung ke job tersebut,
+  dan worker menunggu INGEST_DEBOUNCE_SECONDS sejak submit terakhir sebelum mulai.
+  Jadi 20 kali save beruntun hanya memicu satu re-index.
+- Antrian terbatas: paling banyak satu job menunggu + satu job berjalan per worker.
+  Antar worker uvicorn, ingestion tetap diserialisasi oleh lock file chroma_db.
+- Status job disimpan di SQLite (INGEST_JOBS_DB) agar bisa di-poll dari worker mana pun.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+INGEST_DEBOUNCE_SECONDS = float(os.getenv("INGEST_DEBOUNCE_SECONDS", "2"))
+INGEST_JOBS_DB = os.getenv("INGEST_JOBS_DB", "ingestion_jobs.db")
+INGEST_JOBS_KEEP = int(os.getenv("INGEST_JOBS_KEEP", "200"))  # Riwayat job yang disimpan
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCESS = "success"
+STATUS_ERROR = "error"
+
+
+class _JobStore:
+    """Penyimpanan status job di SQLite (dipakai bersama oleh semua worker)."""
+
+    _COLUMNS = ("id", "status", "reason", "requests", "message", "created_at", "started_at", "finished_at")
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingestion_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, reason TEXT, requests INTEGER NOT NULL, "
+            "message TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.commit()
+
+    def save(self, job: dict):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO ingestion_jobs ({', '.join(self._COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self._COLUMNS)})",
+                tuple(job.get(column) for column in self._COLUMNS)
+            )
+            self._conn.execute(
+                "DELETE FROM ingestion_jobs WHERE id IN ("
+                "SELECT id FROM ingestion_jobs ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (INGEST_JOBS_KEEP,)
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(self._COLUMNS, row)) if row else None
+
+
+class IngestionJobQueue:
+    """Worker thread tunggal yang menjalankan job ingestion dengan debounce."""
+
+    def __init__(self, runner, debounce_seconds: float = INGEST_DEBOUNCE_SECONDS, db_path: str = INGEST_JOBS_DB):
+        # runner: callable tanpa argumen yang mengembalikan pesan hasil (awalan "Error" = gagal)
+        self.runner = runner
+        self.debounce_seconds = debounce_seconds
+        self._store = _JobStore(db_path)
+        self._cond = threading.Condition()
+        self._pending = None
+        self._running = None
+        self._last_submit = 0.0
+        self._thread = None
+
+    def submit(self, reason: str = "manual") -> dict:
+        """Mendaftarkan job (atau menggabungkannya ke job yang masih menunggu). Tidak memblokir."""
+        with self._cond:
+            now = time.time()
+            self._last_submit = now
+            if self._pending is not None:
+                self._pending["requests"] += 1
+                self._store.save(self._pending)
+                job = dict(self._pending)
+            else:
+                self._pending = {
+                    "id": uuid.uuid4().hex,
+                    "status": STATUS_QUEUED,
+                    "reason": reason,
+                    "requests": 1,
+                    "message": None,
+                    "created_at": now,
+                    "started_at": None,
+                    "finished_at": None,
+                }
+                self._store.save(self._pending)
+                job = dict(self._pending)
+            self._ensure_worker()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        return self._store.get(job_id)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker_loop, name="ingestion-worker", daemon=True)
+            self._thread.start()
+
+    def _next_job(self) -> dict:
+        with self._cond:
+            while True:
+                if self._pending is None:
+                    self._cond.wait()
+                    continue
+                # Debounce: tunggu sampai tidak ada submit baru selama debounce_seconds
+                remaining = self._last_submit + self.debounce_seconds - time.time()
+                if remaining > 0:
+                    self._cond.wait(timeout=remaining)
+                    continue
+                job, self._pending = self._pending, None
+                self._running = job
+                return job
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            job["status"] = STATUS_RUNNING
+            job["started_at"] = time.time()
+            self._store.save(job)
+            print(f"Ingestion job {job['id']}: mulai ({job['requests']} permintaan digabung).")
+            try:
+                message = self.runner()
+                job["status"] = STATUS_ERROR if str(message).startswith("Error") else STATUS_SUCCESS
+                job["message"] = message
+            except Exception as e:
+                job["status"] = STATUS_ERROR
+                job["message"] = f"Error saat menjalankan ingestion: {e}"
+            job["finished_at"] = time.time()
+            self._store.save(job)
+            with self._cond:
+                self._running = None
+            print(f"Ingestion job {job['id']}: {job['status']}.")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue() -> IngestionJobQueue:
+    """Antrian ingestion proses-wide (runner default: rag.rebuild_index)."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                from .rag import rebuild_index
+                _queue = IngestionJobQueue(runner=rebuild_index)
+    return _queue
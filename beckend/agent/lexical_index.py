@@ -0,0 +1,153 @@
+# agent/lexical_index.py
+"""
+Indeks leksikal (BM25) untuk token kimia yang persis: rumus ("CH4"), ID ("CID-297"),
+kode GHS ("H220"), nomor CAS, dan sinonim ("methane").
+
+- Inverted index di memori atas nama_senyawa, rumus_molekul, sinonim, dan
+  pernyataan_bahaya_ghs (dengan bobot per field, gaya BM25F sederhana).
+- exact_match(): query yang PERSIS berupa identifier (nama, rumus, sinonim), atau
+  berisi token identifier unik (mengandung angka, mis. "CH4", "CID-297", "74-82-8"),
+  langsung diarahkan ke record-nya tanpa pencarian vektor.
+- reciprocal_rank_fusion(): menggabungkan peringkat leksikal dan vektor.
+
+Indeks dibangun ulang otomatis saat isi CompoundStore berubah (compound_store.version).
+"""
+
+import math
+import re
+import threading
+from .compound_store import compound_store
+from .property_index import CANDIDATE_FIELDS
+
+# Bobot field (token di nama/rumus lebih bermakna daripada di teks GHS)
+FIELD_WEIGHTS = {
+    "nama_senyawa": 3.0,
+    "rumus_molekul": 3.0,
+    "sinonim": 1.5,
+    "pernyataan_bahaya_ghs": 0.5,
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60  # Konstanta standar reciprocal-rank fusion
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def tokenize(text) -> list[str]:
+    """Token lowercase; token bertanda hubung ("cid-297") juga dipecah ke bagian-bagiannya."""
+    tokens = []
+    for token in _TOKEN_RE.findall(str(text or "").lower()):
+        tokens.append(token)
+        if "-" in token:
+            tokens.extend(part for part in token.split("-") if part)
+    return tokens
+
+
+def _normalize_identifier(text) -> str:
+    return " ".join(str(text or "").lower().strip(" \t\r\n?.!,;:\"'").split())
+
+
+def _is_identifier_token(token: str) -> bool:
+    # Rumus / ID / CAS selalu mengandung huruf+angka atau angka bertanda hubung
+    return any(c.isdigit() for c in token) and len(token) >= 3
+
+
+class LexicalIndex:
+    """Inverted index BM25 + peta identifier persis -> posisi record."""
+
+    def __init__(self, records: list[dict], version: int = 0):
+        self.records = records
+        self.version = version
+        self.postings: dict[str, list[tuple[int, float]]] = {}
+        self.doc_lengths = [0.0] * len(records)
+        self.identifiers: dict[str, list[int]] = {}
+
+        for position, record in enumerate(records):
+            frequencies: dict[str, float] = {}
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(record.get(field)):
+                    frequencies[token] = frequencies.get(token, 0.0) + weight
+            for token, frequency in frequencies.items():
+                self.postings.setdefault(token, []).append((position, frequency))
+            self.doc_lengths[position] = sum(frequencies.values())
+
+            names = [record.get("nama_senyawa"), record.get("rumus_molekul")]
+            names += str(record.get("sinonim") or "").split("|")
+            for name in names:
+                key = _normalize_identifier(name)
+                if key:
+                    positions = self.identifiers.setdefault(key, [])
+                    if not positions or positions[-1] != position:
+                        positions.append(position)
+
+        self.avg_length = (sum(self.doc_lengths) / len(records)) if records else 0.0
+        size = len(records)
+        self.idf = {
+            token: math.log(1 + (size - len(plist) + 0.5) / (len(plist) + 0.5))
+            for token, plist in self.postings.items()
+        }
+
+    def exact_match(self, query: str, limit: int = 3) -> list[dict]:
+        """Record yang identifier-nya disebut persis di query (kosong jika tidak ada)."""
+        positions = self.identifiers.get(_normalize_identifier(query))
+        if positions and len(positions) <= limit:
+            return [self.records[i] for i in positions]
+        # Token identifier unik di dalam kalimat, mis. "Berapa titik didih CH4?"
+        matched = []
+        for token in dict.fromkeys(_TOKEN_RE.findall(query.lower())):
+            if not _is_identifier_token(token):
+                continue
+            token_positions = self.identifiers.get(token)
+            if token_positions and len(token_positions) == 1 and token_positions[0] not in matched:
+                matched.append(token_positions[0])
+        if matched and len(matched) <= limit:
+            return [self.records[i] for i in matched]
+        return []
+
+    def search(self, query: str, limit: int = 20) -> list[tuple[int, float]]:
+        """Peringkat BM25: list (posisi record, skor) terurut menurun."""
+        scores: dict[int, float] = {}
+        for token in set(tokenize(query)):
+            plist = self.postings.get(token)
+            if not plist:
+                continue
+            idf = self.idf[token]
+            for position, frequency in plist:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[position] / self.avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def search_records(self, query: str, limit: int = 20) -> list[dict]:
+        return [self.records[i] for i, _ in self.search(query, limit)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Indeks leksikal proses-wide, dibangun ulang bila CompoundStore berubah."""
+    global _index
+    records, version = compound_store.snapshot()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = LexicalIndex(records, version)
+        return _index
+
+
+def record_text(record: dict) -> str:
+    """Teks konteks untuk satu record: field ringkas + sinonim + GHS + deskripsi."""
+    fields = CANDIDATE_FIELDS + ("sinonim", "pernyataan_bahaya_ghs", "deskripsi")
+    return "\n".join(f"{field}: {record[field]}" for field in fields if record.get(field) not in (None, ""))
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[str]:
+    """Menggabungkan beberapa peringkat (list kunci) dengan skor sum(1 / (k + rank))."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda key: scores[key], reverse=True)
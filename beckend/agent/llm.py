@@ -1,35 +1,323 @@
 # FILE: agent/llm.py (KODE FINAL OPTIMAL DENGAN RETRY DAN BACKOFF)
 
+from __future__ import annotations
+
+import contextvars
+import hashlib
 import os
-import time  # 🔥 Import baru: Diperlukan untuk penundaan waktu (backoff)
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from google import genai
-from google.genai.errors import APIError
-from google.genai import types 
+from .llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE, PRIORITY_BULK
+from .metrics import timed, counter
+
+# google-genai di-import secara lazy: google.genai.types saja memakan ~0.5 detik saat startup
+if TYPE_CHECKING:
+    from google.genai.errors import APIError
 
 # Memuat variabel dari .env
 load_dotenv()
 
 # Konfigurasi Default
-GEMINI_MODEL_DEFAULT = "gemini-2.5-flash" 
-GEMINI_MODEL_PRO = "gemini-2.5-pro" 
+GEMINI_MODEL_DEFAULT = "gemini-2.5-flash"
+GEMINI_MODEL_PRO = "gemini-2.5-pro"
+
+# Opsional: arahkan klien ke server lain (misalnya stub Gemini lokal untuk pengujian,
+# lihat tools/fake_gemini.py). Kosong = endpoint resmi Google.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
 
 # 🔥 KONFIGURASI RELIABILITY
 MAX_RETRIES = 5  # Maksimal percobaan ulang
 BASE_WAIT_TIME = 2 # Detik awal tunggu (2, 4, 8, 16, 32... detik)
+MAX_WAIT_TIME = 30 # Batas atas satu kali tunggu (detik)
 
+# 🔥 KONFIGURASI SCHEDULER (lihat agent/llm_scheduler.py). 0 = tanpa batas.
+LLM_RPM = float(os.getenv("LLM_RPM", "60"))
+LLM_TPM = float(os.getenv("LLM_TPM", "1000000"))
+LLM_PRO_RPM = float(os.getenv("LLM_PRO_RPM", "10"))
+LLM_PRO_TPM = float(os.getenv("LLM_PRO_TPM", "250000"))
+# Batas tunggu di antrian sebelum request ditolak dengan 429 + Retry-After (detik)
+LLM_MAX_WAIT_INTERACTIVE = float(os.getenv("LLM_MAX_WAIT_INTERACTIVE", "8"))
+LLM_MAX_WAIT_BULK = float(os.getenv("LLM_MAX_WAIT_BULK", "3"))
+LLM_BULK_RESERVE = float(os.getenv("LLM_BULK_RESERVE", "0.2"))  # Porsi bucket yang disisakan untuk /ask
+LLM_MODEL_FALLBACK = os.getenv("LLM_MODEL_FALLBACK", "1") == "1"
+LLM_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "800"))
+CHARS_PER_TOKEN = 4
 
-# Inisialisasi Klien Gemini
-def get_gemini_client():
-    """Menginisialisasi dan mengembalikan klien Google GenAI."""
+# 🔥 CONTEXT CACHING GEMINI (opsional, untuk prefix prompt yang dipakai berulang)
+# Prefix yang sama antar panggilan (instruksi + skema JSON + konteks sesi /refine) disimpan
+# sekali di server Gemini (caches.create); panggilan berikutnya hanya mengirim bagian yang
+# berubah. Gemini menolak cache di bawah jumlah token minimum, jadi prefix yang lebih
+# pendek dari GEMINI_CONTEXT_CACHE_MIN_TOKENS selalu dikirim inline.
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "0") == "1"
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "1800"))  # detik
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "1024"))
+_CONTEXT_CACHE_MAX = 256
+_CONTEXT_CACHE_MARGIN_S = 60  # Cache lokal dianggap habis sedikit sebelum cache di server
+
+SHED_MESSAGE = "API_ERROR_429: Kapasitas LLM sedang penuh. Coba lagi dalam {retry_after} detik."
+_RETRY_AFTER_RE = re.compile(r"Coba lagi dalam (\d+) detik")
+
+llm_scheduler = LLMScheduler(
+    limits={
+        GEMINI_MODEL_DEFAULT: (LLM_RPM, LLM_TPM),
+        GEMINI_MODEL_PRO: (LLM_PRO_RPM, LLM_PRO_TPM),
+    },
+    max_wait={PRIORITY_INTERACTIVE: LLM_MAX_WAIT_INTERACTIVE, PRIORITY_BULK: LLM_MAX_WAIT_BULK},
+    bulk_reserve=LLM_BULK_RESERVE,
+    fallback=LLM_MODEL_FALLBACK,
+)
+
+# Prioritas request yang sedang berjalan; di-set endpoint lewat llm_priority(...)
+_current_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Menandai semua panggilan LLM di dalam blok ini dengan kelas prioritas tertentu."""
+    token = _current_priority.set(priority)
     try:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY tidak ditemukan di environment variables.")
-        return genai.Client(api_key=api_key)
-    except Exception as e:
-        print(f"Error saat inisialisasi Gemini Client: {e}")
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def estimate_request_tokens(prompt: str) -> int:
+    """Estimasi token (prompt + output) yang dipotong dari bucket TPM sebelum panggilan."""
+    return len(prompt) // CHARS_PER_TOKEN + LLM_OUTPUT_TOKEN_ESTIMATE
+
+
+def rate_limit_headers(message: str) -> dict:
+    """Header Retry-After untuk pesan API_ERROR_429 (shed scheduler atau kuota upstream)."""
+    match = _RETRY_AFTER_RE.search(message)
+    return {"Retry-After": match.group(1) if match else "60"}
+
+
+def get_llm_scheduler_stats() -> dict:
+    return llm_scheduler.stats()
+
+
+def _usage_tokens(response) -> int | None:
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage is not None else None
+
+
+# 🔥 METRIK LLM (/metrics)
+LLM_CALLS = counter("llm_calls_total", "Panggilan LLM per model dan hasil (ok, rate_limited, error, shed).",
+                    ("model", "outcome"))
+LLM_RETRIES = counter("llm_retries_total", "Percobaan ulang setelah 429 dari server, per model.", ("model",))
+LLM_TOKENS = counter("llm_tokens_total", "Token LLM dari usage_metadata, per model dan jenis.", ("model", "kind"))
+
+
+def _record_usage(model: str, response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("output", "candidates_token_count"),
+                       ("cached", "cached_content_token_count")):
+        value = getattr(usage, attr, None)
+        if value:
+            LLM_TOKENS.inc(value, model=model, kind=kind)
+
+
+class LLMError(Exception):
+    """Error LLM pada jalur streaming; message memakai awalan yang sama (API_ERROR_429:, API_ERROR:, ...)."""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: int | None = None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# (model, sha256 prefix) -> (nama cachedContents atau None jika gagal dibuat, berlaku sampai)
+_context_caches = OrderedDict()
+_context_cache_lock = threading.Lock()
+_context_cache_stats = {"created": 0, "failed": 0, "used": 0, "invalidated": 0}
+
+
+def _context_cache_key(model: str, prefix: str) -> tuple[str, str]:
+    return model, hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+async def _acontext_cache_name(client, model: str, prefix: str) -> str | None:
+    """Nama cachedContents untuk prefix ini (dibuat sekali per model, dipakai ulang sampai TTL)."""
+    if not GEMINI_CONTEXT_CACHE or len(prefix) // CHARS_PER_TOKEN < GEMINI_CONTEXT_CACHE_MIN_TOKENS:
         return None
+    key = _context_cache_key(model, prefix)
+    now = time.time()
+    with _context_cache_lock:
+        entry = _context_caches.get(key)
+        if entry is not None and entry[1] > now:
+            _context_caches.move_to_end(key)
+            return entry[0]
+
+    from google.genai import types
+    try:
+        with timed("context_cache_create", model=model):
+            cache = await client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(contents=[prefix], ttl=f"{GEMINI_CONTEXT_CACHE_TTL}s")
+            )
+        name = cache.name
+    except Exception as e:
+        # Gagal (mis. prefix terlalu pendek untuk model ini): kirim inline sampai TTL habis
+        print(f"Context cache: gagal membuat cache untuk {model} ({e}); prefix dikirim inline.")
+        name = None
+    with _context_cache_lock:
+        _context_cache_stats["created" if name else "failed"] += 1
+        _context_caches[key] = (name, now + max(GEMINI_CONTEXT_CACHE_TTL - _CONTEXT_CACHE_MARGIN_S, 1))
+        _context_caches.move_to_end(key)
+        while len(_context_caches) > _CONTEXT_CACHE_MAX:
+            _context_caches.popitem(last=False)
+    return name
+
+
+def _invalidate_context_cache(model: str, prefix: str):
+    """Cache di server sudah tidak berlaku (mis. kedaluwarsa lebih awal): buat ulang di panggilan berikutnya."""
+    with _context_cache_lock:
+        if _context_caches.pop(_context_cache_key(model, prefix), None) is not None:
+            _context_cache_stats["invalidated"] += 1
+
+
+async def _aprepare_contents(client, model: str, config, prompt: str, prefix: str):
+    """Isi request: [prompt] + cached_content jika prefix ter-cache, selain itu [prefix + prompt]."""
+    if not prefix:
+        return [prompt], config, None
+    name = await _acontext_cache_name(client, model, prefix)
+    if name is None:
+        return [prefix + prompt], config, None
+    with _context_cache_lock:
+        _context_cache_stats["used"] += 1
+    return [prompt], config.model_copy(update={"cached_content": name}), name
+
+
+def get_context_cache_stats() -> dict:
+    with _context_cache_lock:
+        return {
+            "enabled": GEMINI_CONTEXT_CACHE,
+            "min_tokens": GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+            "ttl_s": GEMINI_CONTEXT_CACHE_TTL,
+            "entries": sum(1 for name, _ in _context_caches.values() if name),
+            **_context_cache_stats,
+        }
+
+
+# Klien Gemini proses-wide: satu instance, koneksi HTTP dipakai ulang (sync & aio)
+_client = None
+_client_lock = threading.Lock()
+
+
+def _api_error():
+    """Kelas APIError google-genai (modul sudah ter-import saat klien dibuat)."""
+    from google.genai.errors import APIError
+    return APIError
+
+
+def _create_gemini_client():
+    """Membuat klien Google GenAI baru dari environment variables."""
+    from google import genai
+    from google.genai import types
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY tidak ditemukan di environment variables.")
+    if GEMINI_BASE_URL:
+        return genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(base_url=GEMINI_BASE_URL)
+        )
+    return genai.Client(api_key=api_key)
+
+
+# Inisialisasi Klien Gemini
+def get_gemini_client():
+    """Mengembalikan klien Google GenAI proses-wide (dibuat sekali, lalu dipakai ulang)."""
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            try:
+                _client = _create_gemini_client()
+            except Exception as e:
+                print(f"Error saat inisialisasi Gemini Client: {e}")
+                return None
+    return _client
+
+
+def _request_params(force_json: bool) -> tuple[str, dict]:
+    """Model dan parameter generasi untuk satu permintaan (tanpa meng-import SDK)."""
+    config_params = {"temperature": 0.2}
+    model_to_use = GEMINI_MODEL_DEFAULT
+
+    if force_json:
+        config_params['response_mime_type'] = "application/json"
+        model_to_use = GEMINI_MODEL_DEFAULT
+
+    return model_to_use, config_params
+
+
+def _build_request(force_json: bool):
+    """Menentukan model dan konfigurasi generasi untuk satu permintaan."""
+    from google.genai import types
+
+    model_to_use, config_params = _request_params(force_json)
+    return model_to_use, types.GenerateContentConfig(**config_params)
+
+
+def get_request_signature(force_json: bool = False) -> tuple[str, dict]:
+    """Model + konfigurasi yang akan dipakai, untuk kunci cache respons."""
+    # Sama dengan GenerateContentConfig(**params).model_dump(exclude_none=True)
+    model_to_use, config_params = _request_params(force_json)
+    return model_to_use, dict(config_params)
+
+
+def _is_rate_limit(error: APIError) -> bool:
+    error_detail = str(error)
+    return error.code == 429 or "429" in error_detail or "RESOURCE_EXHAUSTED" in error_detail
+
+
+def _parse_retry_after(error: APIError) -> float | None:
+    """
+    Membaca petunjuk tunggu dari server: header Retry-After atau
+    RetryInfo.retryDelay (misalnya "33s") di detail error Gemini.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+
+    details = error.details
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details", [])
+    for detail in details if isinstance(details, list) else []:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if delay:
+            match = re.match(r"^\s*([\d.]+)s\s*$", str(delay))
+            if match:
+                return float(match.group(1))
+    return None
+
+
+def _backoff_delay(attempt: int, error: APIError) -> float:
+    """Exponential backoff dengan full jitter, menghormati Retry-After dari server."""
+    retry_after = _parse_retry_after(error)
+    if retry_after is not None:
+        # Tambahkan sedikit jitter agar request yang tertahan tidak bangun bersamaan
+        return min(retry_after, MAX_WAIT_TIME) + random.uniform(0, 1)
+    # Hitung waktu tunggu: 2^0, 2^1, 2^2, dst... lalu diacak (full jitter)
+    return random.uniform(0, min(BASE_WAIT_TIME ** attempt, MAX_WAIT_TIME))
 
 
 # 🔥 Fungsi LLM utama (Dengan Mekanisme Exponential Backoff)
@@ -38,43 +326,192 @@ def get_llm_response(prompt: str, force_json: bool = False) -> str:
     client = get_gemini_client()
     if not client:
         return "Error: LLM client tidak dapat diinisialisasi."
-        
-    config_params = {"temperature": 0.2} 
-    model_to_use = GEMINI_MODEL_DEFAULT
-    
-    if force_json:
-        config_params['response_mime_type'] = "application/json" 
-        model_to_use = GEMINI_MODEL_DEFAULT
-    
+
+    preferred_model, config = _build_request(force_json)
+    tokens = estimate_request_tokens(prompt)
+    priority = _current_priority.get()
+    deadline = llm_scheduler.deadline(priority)
+
     # --- LOGIKA EXPONENTIAL BACKOFF DIMULAI ---
+    # Penundaan terjadi di antrian scheduler (bersama semua request), bukan per request
     for attempt in range(MAX_RETRIES):
+        with timed("llm_queue"):
+            model_to_use, retry_after = llm_scheduler.acquire(tokens, preferred_model, priority, deadline)
+        if model_to_use is None:
+            LLM_CALLS.inc(model=preferred_model, outcome="shed")
+            return SHED_MESSAGE.format(retry_after=retry_after)
         try:
-            response = client.models.generate_content(
-                model=model_to_use,
-                contents=[prompt],
-                config=types.GenerateContentConfig(**config_params)
-            )
-            return response.text 
-            
-        except APIError as e:
-            error_detail = str(e)
+            with timed("llm_call", model=model_to_use, attempt=attempt):
+                response = client.models.generate_content(
+                    model=model_to_use,
+                    contents=[prompt],
+                    config=config
+                )
+            llm_scheduler.settle(model_to_use, tokens, _usage_tokens(response))
+            _record_usage(model_to_use, response)
+            LLM_CALLS.inc(model=model_to_use, outcome="ok")
+            return response.text
 
+        except _api_error() as e:
             # 🔥 Handle 429 / Resource Exhausted
-            if "429" in error_detail or "RESOURCE_EXHAUSTED" in error_detail:
+            if _is_rate_limit(e):
+                wait_time = _backoff_delay(attempt, e)
+                llm_scheduler.penalize(model_to_use, wait_time)
+                LLM_CALLS.inc(model=model_to_use, outcome="rate_limited")
                 if attempt < MAX_RETRIES - 1:
-                    # Hitung waktu tunggu: 2^0, 2^1, 2^2, dst...
-                    wait_time = BASE_WAIT_TIME ** attempt 
-                    print(f"RATE LIMIT HIT (429). Retrying in {wait_time}s (Attempt {attempt + 1}/{MAX_RETRIES}).")
-                    time.sleep(wait_time)
-                    continue # Ulangi loop (coba lagi)
+                    LLM_RETRIES.inc(model=model_to_use)
+                    print(f"RATE LIMIT HIT (429) on {model_to_use}. Model ditahan {wait_time:.1f}s (Attempt {attempt + 1}/{MAX_RETRIES}).")
+                    continue # Ulangi loop (coba lagi lewat scheduler)
                 else:
                     # Gagal setelah semua percobaan
                     return "API_ERROR_429: Kuota terlampaui setelah beberapa kali percobaan. Mohon tunggu 1 menit."
-            
+
             # Handle API Error lainnya (non-429)
-            return f"API_ERROR: {error_detail}" 
-            
+            LLM_CALLS.inc(model=model_to_use, outcome="error")
+            return f"API_ERROR: {e}"
+
         except Exception as e:
             return f"Terjadi kesalahan LLM tak terduga: {e}"
-            
-    return "Error: Gagal memproses permintaan setelah semua percobaan."
\ No newline at end of file
+
+    return "Error: Gagal memproses permintaan setelah semua percobaan."
+
+
+# 🔥 Versi async: tidak memblokir worker FastAPI saat menunggu Gemini atau backoff
+async def aget_llm_response(prompt: str, force_json: bool = False, prefix: str = "",
+                            max_attempts: int = MAX_RETRIES) -> str:
+    """
+    Versi async dari get_llm_response (klien aio bersama, menunggu scheduler secara async).
+    prefix: bagian awal prompt yang sama antar panggilan; dikirim lewat context cache
+    Gemini bila aktif (GEMINI_CONTEXT_CACHE), selain itu digabung di depan prompt.
+    max_attempts: batas panggilan upstream termasuk retry 429 (1 = tanpa retry internal,
+    dipakai job yang menghitung anggaran panggilannya sendiri).
+    """
+    client = get_gemini_client()
+    if not client:
+        return "Error: LLM client tidak dapat diinisialisasi."
+
+    preferred_model, config = _build_request(force_json)
+    tokens = estimate_request_tokens(prefix + prompt)
+    priority = _current_priority.get()
+    deadline = llm_scheduler.deadline(priority)
+
+    for attempt in range(max_attempts):
+        with timed("llm_queue"):
+            model_to_use, retry_after = await llm_scheduler.aacquire(tokens, preferred_model, priority, deadline)
+        if model_to_use is None:
+            LLM_CALLS.inc(model=preferred_model, outcome="shed")
+            return SHED_MESSAGE.format(retry_after=retry_after)
+        cache_name = None
+        try:
+            contents, call_config, cache_name = await _aprepare_contents(client, model_to_use, config, prompt, prefix)
+            with timed("llm_call", model=model_to_use, attempt=attempt, context_cache=bool(cache_name)):
+                response = await client.aio.models.generate_content(
+                    model=model_to_use,
+                    contents=contents,
+                    config=call_config
+                )
+            llm_scheduler.settle(model_to_use, tokens, _usage_tokens(response))
+            _record_usage(model_to_use, response)
+            LLM_CALLS.inc(model=model_to_use, outcome="ok")
+            return response.text
+
+        except _api_error() as e:
+            if _is_rate_limit(e):
+                wait_time = _backoff_delay(attempt, e)
+                llm_scheduler.penalize(model_to_use, wait_time)
+                LLM_CALLS.inc(model=model_to_use, outcome="rate_limited")
+                if attempt < max_attempts - 1:
+                    LLM_RETRIES.inc(model=model_to_use)
+                    print(f"RATE LIMIT HIT (429) on {model_to_use}. Model ditahan {wait_time:.1f}s (Attempt {attempt + 1}/{max_attempts}).")
+                    continue
+                else:
+                    return "API_ERROR_429: Kuota terlampaui setelah beberapa kali percobaan. Mohon tunggu 1 menit."
+
+            LLM_CALLS.inc(model=model_to_use, outcome="error")
+            if cache_name and attempt < max_attempts - 1:
+                # Cache prefix ditolak server: ulangi dengan prefix inline / cache baru
+                _invalidate_context_cache(model_to_use, prefix)
+                continue
+            return f"API_ERROR: {e}"
+
+        except Exception as e:
+            return f"Terjadi kesalahan LLM tak terduga: {e}"
+
+    return "Error: Gagal memproses permintaan setelah semua percobaan."
+
+
+# 🔥 Versi streaming: token dikirim segera setelah tersedia (dipakai endpoint SSE)
+async def astream_llm_response(prompt: str, force_json: bool = False, prefix: str = ""):
+    """
+    Async generator yang menghasilkan potongan teks dari Gemini streaming API.
+    Retry 429 hanya dilakukan sebelum potongan pertama terkirim; error dilempar sebagai LLMError.
+    prefix: sama seperti aget_llm_response (context cache atau inline).
+    """
+    client = get_gemini_client()
+    if not client:
+        raise LLMError("Error: LLM client tidak dapat diinisialisasi.")
+
+    preferred_model, config = _build_request(force_json)
+    tokens = estimate_request_tokens(prefix + prompt)
+    priority = _current_priority.get()
+    deadline = llm_scheduler.deadline(priority)
+
+    for attempt in range(MAX_RETRIES):
+        with timed("llm_queue"):
+            model_to_use, retry_after = await llm_scheduler.aacquire(tokens, preferred_model, priority, deadline)
+        if model_to_use is None:
+            LLM_CALLS.inc(model=preferred_model, outcome="shed")
+            raise LLMError(SHED_MESSAGE.format(retry_after=retry_after), status_code=429, retry_after=retry_after)
+        started = False
+        usage = None
+        last_chunk = None
+        cache_name = None
+        try:
+            contents, call_config, cache_name = await _aprepare_contents(client, model_to_use, config, prompt, prefix)
+            with timed("llm_stream", model=model_to_use, attempt=attempt, context_cache=bool(cache_name)) as span:
+                stream = await client.aio.models.generate_content_stream(
+                    model=model_to_use,
+                    contents=contents,
+                    config=call_config
+                )
+                stream_start = time.perf_counter()
+                async for chunk in stream:
+                    last_chunk = chunk
+                    usage = _usage_tokens(chunk) or usage
+                    text = chunk.text
+                    if text:
+                        if not started:
+                            span["first_token_ms"] = round((time.perf_counter() - stream_start) * 1000, 2)
+                        started = True
+                        yield text
+            llm_scheduler.settle(model_to_use, tokens, usage)
+            if last_chunk is not None:
+                _record_usage(model_to_use, last_chunk)
+            LLM_CALLS.inc(model=model_to_use, outcome="ok")
+            return
+
+        except _api_error() as e:
+            if _is_rate_limit(e) and not started:
+                wait_time = _backoff_delay(attempt, e)
+                llm_scheduler.penalize(model_to_use, wait_time)
+                LLM_CALLS.inc(model=model_to_use, outcome="rate_limited")
+                if attempt < MAX_RETRIES - 1:
+                    LLM_RETRIES.inc(model=model_to_use)
+                    print(f"RATE LIMIT HIT (429) on {model_to_use}. Model ditahan {wait_time:.1f}s (Attempt {attempt + 1}/{MAX_RETRIES}).")
+                    continue
+                raise LLMError(
+                    "API_ERROR_429: Kuota terlampaui setelah beberapa kali percobaan. Mohon tunggu 1 menit.",
+                    status_code=429, retry_after=60
+                )
+            LLM_CALLS.inc(model=model_to_use, outcome="error")
+            if cache_name and not started and attempt < MAX_RETRIES - 1:
+                _invalidate_context_cache(model_to_use, prefix)
+                continue
+            raise LLMError(f"API_ERROR: {e}")
+
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(f"Terjadi kesalahan LLM tak terduga: {e}")
+
+    raise LLMError("Error: Gagal memproses permintaan setelah semua percobaan.")
@@ -0,0 +1,253 @@
+# agent/llm_scheduler.py
+"""
+Scheduler proses-wide untuk panggilan Gemini: token bucket RPM/TPM per model,
+kelas prioritas, fallback model berdasarkan beban, dan load shedding dini.
+
+- Setiap model punya dua bucket (request per menit, token per menit) yang terisi
+  terus-menerus. Panggilan baru mengambil 1 request + estimasi token; setelah
+  respons datang, selisih estimasi vs usage_metadata sebenarnya dikoreksi (settle).
+- Antrian berprioritas: PRIORITY_INTERACTIVE (/ask, /combine, /refine) selalu
+  dilayani sebelum PRIORITY_BULK (/generate). Request bulk juga tidak boleh
+  menghabiskan cadangan bucket (BULK_RESERVE) yang disisakan untuk interaktif.
+- Fallback: jika model pilihan sedang penuh (atau baru saja dibalas 429 oleh server),
+  model lain dipakai bila masih ada kapasitas.
+- Load shedding: jika estimasi waktu tunggu melebihi batas kelasnya, request langsung
+  ditolak dengan nilai retry_after (dipetakan ke HTTP 429 + header Retry-After),
+  alih-alih menahan thread/koneksi selama puluhan detik.
+- Balasan 429 dari server menahan model tersebut untuk SEMUA request (penalize),
+  sehingga tidak ada retry storm dari backoff per-request yang saling independen.
+"""
+
+import asyncio
+import itertools
+import math
+import threading
+import time
+from .metrics import Histogram
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+
+# Interval polling maksimum saat menunggu kapasitas (detik)
+_POLL_S = 0.25
+_ASYNC_POLL_S = 0.02
+
+
+class TokenBucket:
+    """Bucket per menit: kapasitas = limit, terisi limit/60 per detik. limit <= 0 = tanpa batas."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self, now: float):
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float, reserve: float = 0.0) -> float:
+        """Detik sampai `amount` bisa diambil dengan menyisakan reserve * kapasitas."""
+        if self.unlimited:
+            return 0.0
+        # Prompt yang lebih besar dari kapasitas tetap bisa lewat saat bucket penuh
+        needed = min(amount, self.capacity) + reserve * self.capacity
+        deficit = needed - self.level
+        return deficit / self.rate if deficit > 0 else 0.0
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self.level -= min(amount, self.capacity)
+
+    def credit(self, amount: float):
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class _ModelBudget:
+    def __init__(self, name: str, rpm: float, tpm: float):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0  # Diisi saat server membalas 429
+
+    def wait_for(self, requests: int, tokens: float, reserve: float, now: float) -> float:
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(
+            self.blocked_until - now,
+            self.requests.wait_for(requests, reserve),
+            self.tokens.wait_for(tokens, reserve),
+            0.0,
+        )
+
+
+class LLMScheduler:
+    """Admission control untuk panggilan LLM (sync via thread, async via asyncio)."""
+
+    def __init__(self, limits: dict[str, tuple[float, float]], max_wait: dict[int, float],
+                 bulk_reserve: float = 0.2, fallback: bool = True):
+        # limits: model -> (rpm, tpm); max_wait: prioritas -> detik tunggu maksimum sebelum shed
+        self.models = {name: _ModelBudget(name, rpm, tpm) for name, (rpm, tpm) in limits.items()}
+        self.max_wait = max_wait
+        self.bulk_reserve = bulk_reserve
+        self.fallback = fallback
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: dict[int, tuple[int, int, float]] = {}  # seq -> (prioritas, seq, token)
+        self._counters = {
+            name: {"granted": 0, "shed": 0}
+            for name in PRIORITY_NAMES.values()
+        }
+        self.fallbacks = 0
+        self.upstream_429 = 0
+        self.queue_wait_ms = {
+            name: Histogram(f"llm_queue_wait_ms_{name}", [1, 10, 50, 100, 500, 1000, 2000, 5000, 10000])
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def _candidates(self, preferred: str) -> list[_ModelBudget]:
+        first = self.models[preferred]
+        if not self.fallback:
+            return [first]
+        return [first] + [budget for name, budget in self.models.items() if name != preferred]
+
+    def _step(self, ticket: tuple[int, int, float], preferred: str) -> tuple[str | None, float]:
+        """
+        Satu percobaan admission (dipanggil dengan lock). Mengembalikan (model, 0) jika
+        kapasitas diberikan, atau (None, estimasi detik tunggu).
+        """
+        priority, seq, tokens = ticket
+        now = time.monotonic()
+        ahead = [other for other in self._waiting.values() if other[:2] < (priority, seq)]
+        reserve = self.bulk_reserve if priority > PRIORITY_INTERACTIVE else 0.0
+        # Request di depan antrian ikut dihitung agar estimasi tunggu jujur
+        ahead_tokens = sum(other[2] for other in ahead)
+        waits = [
+            (budget.wait_for(1 + len(ahead), tokens + ahead_tokens, reserve, now), budget)
+            for budget in self._candidates(preferred)
+        ]
+        if not ahead:
+            for wait, budget in waits:
+                if wait <= 0:
+                    budget.requests.take(1)
+                    budget.tokens.take(tokens)
+                    if budget.name != preferred:
+                        self.fallbacks += 1
+                    return budget.name, 0.0
+        return None, min(wait for wait, _ in waits)
+
+    def _register(self, priority: int, tokens: float) -> tuple[int, int, float]:
+        ticket = (priority, next(self._seq), tokens)
+        with self._cond:
+            self._waiting[ticket[1]] = ticket
+        return ticket
+
+    def _finish(self, ticket, started: float, model: str | None, wait: float) -> tuple[str | None, float | None]:
+        name = PRIORITY_NAMES.get(ticket[0], str(ticket[0]))
+        with self._cond:
+            self._waiting.pop(ticket[1], None)
+            self._counters.setdefault(name, {"granted": 0, "shed": 0})["granted" if model else "shed"] += 1
+            self._cond.notify_all()
+        if model is None:
+            return None, max(1, math.ceil(wait))
+        if name in self.queue_wait_ms:
+            self.queue_wait_ms[name].observe((time.monotonic() - started) * 1000)
+        return model, None
+
+    def deadline(self, priority: int) -> float:
+        """Batas waktu antrian satu panggilan LLM (dipakai bersama oleh semua percobaan ulangnya)."""
+        return time.monotonic() + self.max_wait.get(priority, 0.0)
+
+    def acquire(self, tokens: float, preferred: str, priority: int = PRIORITY_INTERACTIVE,
+                deadline: float | None = None):
+        """Versi blocking (thread pool). Mengembalikan (model, None) atau (None, retry_after_detik)."""
+        started = time.monotonic()
+        deadline = deadline or self.deadline(priority)
+        ticket = self._register(priority, tokens)
+        with self._cond:
+            while True:
+                model, wait = self._step(ticket, preferred)
+                remaining = deadline - time.monotonic()
+                if model is not None or wait > remaining or remaining <= 0:
+                    break
+                self._cond.wait(min(wait or _POLL_S, remaining, _POLL_S))
+        return self._finish(ticket, started, model, wait)
+
+    async def aacquire(self, tokens: float, preferred: str, priority: int = PRIORITY_INTERACTIVE,
+                       deadline: float | None = None):
+        """Versi async: menunggu dengan asyncio.sleep, tidak memblokir event loop."""
+        started = time.monotonic()
+        deadline = deadline or self.deadline(priority)
+        ticket = self._register(priority, tokens)
+        try:
+            while True:
+                with self._cond:
+                    model, wait = self._step(ticket, preferred)
+                remaining = deadline - time.monotonic()
+                if model is not None or wait > remaining or remaining <= 0:
+                    break
+                await asyncio.sleep(min(wait or _ASYNC_POLL_S, remaining, _POLL_S))
+        except BaseException:
+            # Request dibatalkan (klien memutus koneksi): lepaskan tiket antrian
+            self._finish(ticket, started, None, 0.0)
+            raise
+        return self._finish(ticket, started, model, wait)
+
+    def settle(self, model: str, estimated_tokens: float, actual_tokens: int | None):
+        """Koreksi bucket token dengan usage sebenarnya dari respons."""
+        if actual_tokens is None:
+            return
+        with self._cond:
+            budget = self.models[model]
+            budget.tokens.refill(time.monotonic())
+            budget.tokens.credit(estimated_tokens - actual_tokens)
+
+    def penalize(self, model: str, seconds: float):
+        """
+        Server membalas 429: tahan model ini untuk semua request selama `seconds`.
+        Bucket request dikosongkan, sehingga setelah masa tahan request yang antri
+        keluar satu per satu sesuai laju RPM, bukan serentak.
+        """
+        with self._cond:
+            budget = self.models[model]
+            budget.blocked_until = max(budget.blocked_until, time.monotonic() + seconds)
+            budget.requests.refill(time.monotonic())
+            budget.requests.level = min(budget.requests.level, 0.0)
+            self.upstream_429 += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            models = {}
+            for name, budget in self.models.items():
+                budget.requests.refill(now)
+                budget.tokens.refill(now)
+                models[name] = {
+                    "rpm": budget.requests.capacity or None,
+                    "tpm": budget.tokens.capacity or None,
+                    "requests_available": None if budget.requests.unlimited else round(budget.requests.level, 2),
+                    "tokens_available": None if budget.tokens.unlimited else round(budget.tokens.level),
+                    "blocked_for_s": round(max(0.0, budget.blocked_until - now), 2),
+                }
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _ in self._waiting.values():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                waiting[name] = waiting.get(name, 0) + 1
+            counters = {name: dict(values) for name, values in self._counters.items()}
+        return {
+            "models": models,
+            "waiting": waiting,
+            "requests": counters,
+            "fallbacks": self.fallbacks,
+            "upstream_429": self.upstream_429,
+            "max_wait_s": {PRIORITY_NAMES.get(p, str(p)): s for p, s in self.max_wait.items()},
+            "bulk_reserve": self.bulk_reserve,
+            "queue_wait_ms": {name: hist.snapshot() for name, hist in self.queue_wait_ms.items()},
+        }
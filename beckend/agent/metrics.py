@@ -0,0 +1,242 @@
+# agent/metrics.py
+"""
+Metrik ringan di memori (thread-safe) untuk endpoint /health dan /metrics.
+
+Histogram memakai bucket tetap (batas atas inklusif, seperti Prometheus), sehingga
+biaya observe() konstan dan memori tidak bertambah seiring jumlah request.
+Persentil (p50/p95/p99) diestimasi dari bucket dengan interpolasi linear.
+
+Metrik yang didaftarkan lewat histogram()/counter() (dengan label) dan collector
+(fungsi yang membaca statistik modul lain saat di-scrape) dirender dalam format
+teks Prometheus oleh render_prometheus().
+
+timed(stage) mengukur satu tahap hot path (routing, query embedding, vector search,
+prompt build, panggilan LLM, parse JSON, fase ingestion, ...) ke histogram
+novel_stage_duration_ms{stage=...} dan ke trace request yang sedang di-sampling
+(lihat agent/tracing.py).
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from .tracing import record_span
+
+METRIC_PREFIX = "novel_"
+# Bucket default durasi (ms): dari operasi in-memory sampai panggilan LLM yang lama
+DURATION_BUCKETS_MS = [0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class Histogram:
+    """Histogram bucket tetap: jumlah observasi per bucket + count/sum/max."""
+
+    def __init__(self, name: str, buckets: list[float]):
+        self.name = name
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Bucket terakhir = +Inf
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def _state(self):
+        with self._lock:
+            return list(self._counts), self.count, self.sum, self.max
+
+    def quantile(self, q: float, state=None) -> float | None:
+        """Estimasi kuantil dari bucket (interpolasi linear di dalam bucket)."""
+        counts, count, _, maximum = state or self._state()
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                upper = min(upper, maximum)
+                lower = min(lower, upper)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return maximum
+
+    def snapshot(self) -> dict:
+        state = self._state()
+        counts, count, total, maximum = state
+        labels = [f"<={bound:g}" for bound in self.buckets] + ["+Inf"]
+        snapshot = {
+            "count": count,
+            "avg": round(total / count, 3) if count else None,
+            "max": round(maximum, 3),
+        }
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = self.quantile(q, state)
+            snapshot[name] = round(value, 3) if value is not None else None
+        snapshot["buckets"] = dict(zip(labels, counts))
+        return snapshot
+
+    def prometheus_lines(self, name: str, labels: dict) -> list[str]:
+        counts, count, total, _ = self._state()
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total:.6g}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class MetricFamily:
+    """Satu metrik bernama dengan kombinasi label -> Histogram/Counter."""
+
+    def __init__(self, name: str, kind: str, help_text: str, label_names: tuple = (), buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = buckets or DURATION_BUCKETS_MS
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = Histogram(self.name, self.buckets) if self.kind == "histogram" else Counter()
+                    self._children[key] = child
+        return child
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        self.labels(**labels).inc(amount)
+
+    def children(self) -> list[tuple[dict, object]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.label_names, key)), child) for key, child in items]
+
+
+_registry: dict[str, MetricFamily] = {}
+_registry_lock = threading.Lock()
+_collectors = []
+
+
+def _register(name: str, kind: str, help_text: str, label_names, buckets=None) -> MetricFamily:
+    name = METRIC_PREFIX + name
+    with _registry_lock:
+        family = _registry.get(name)
+        if family is None:
+            family = MetricFamily(name, kind, help_text, label_names, buckets)
+            _registry[name] = family
+        return family
+
+
+def histogram(name: str, help_text: str, label_names=(), buckets=None) -> MetricFamily:
+    return _register(name, "histogram", help_text, label_names, buckets)
+
+
+def counter(name: str, help_text: str, label_names=()) -> MetricFamily:
+    return _register(name, "counter", help_text, label_names)
+
+
+def register_collector(collect):
+    """
+    collect() -> iterable (nama, tipe "counter"/"gauge", help, [(labels dict, nilai), ...]).
+    Dipanggil saat /metrics di-scrape; nilai None dilewati.
+    """
+    _collectors.append(collect)
+
+
+# --- Tahap hot path ---
+STAGE_DURATION = histogram("stage_duration_ms", "Durasi per tahap hot path (ms).", ("stage",))
+
+
+def observe_stage(stage: str, elapsed_ms: float, started: float | None = None, **attrs):
+    """Mencatat durasi tahap yang diukur sendiri (mis. waktu muat model)."""
+    STAGE_DURATION.observe(elapsed_ms, stage=stage)
+    record_span(stage, elapsed_ms, started, attrs)
+
+
+@contextmanager
+def timed(stage: str, **attrs):
+    """Mengukur blok sebagai satu tahap; atribut tambahan ikut ke trace (bukan label)."""
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        observe_stage(stage, (time.perf_counter() - start) * 1000, start, **attrs)
+
+
+def get_stage_summary() -> dict:
+    """Ringkasan per tahap (count, avg, p50/p95/p99, max) untuk /health."""
+    summary = {}
+    for labels, child in STAGE_DURATION.children():
+        snapshot = child.snapshot()
+        snapshot.pop("buckets")
+        summary[labels["stage"]] = snapshot
+    return dict(sorted(summary.items()))
+
+
+# --- Format teks Prometheus ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus() -> str:
+    lines = []
+    with _registry_lock:
+        families = list(_registry.values())
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for labels, child in family.children():
+            if family.kind == "histogram":
+                lines.extend(child.prometheus_lines(family.name, labels))
+            else:
+                lines.append(f"{family.name}{_format_labels(labels)} {child.value:.6g}")
+    for collect in list(_collectors):
+        try:
+            metrics = list(collect())
+        except Exception as e:
+            print(f"Metrics: collector gagal: {e}")
+            continue
+        for name, kind, help_text, samples in metrics:
+            name = METRIC_PREFIX + name
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{_format_labels(labels)} {float(value):.6g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,384 @@
+# agent/output_parser.py
+"""
+Parsing output JSON dari LLM yang toleran terhadap kerusakan umum, plus validasi skema.
+
+1. extract_json_block(): satu kali scan linear dengan penghitung kurung (sadar string
+   dan escape) untuk menemukan objek JSON pertama di teks, termasuk jika ekornya
+   terpotong (respons terhenti di tengah).
+2. repair_json(): memperbaiki cacat umum dalam satu pass -- komentar // dan /* */,
+   trailing comma, literal Python (True/False/None), newline mentah di dalam string,
+   dan ekor terpotong (string/kurung ditutup, pasangan key/value yang belum lengkap
+   dibuang).
+3. Validasi terhadap model Pydantic yang mencerminkan template output
+   (detailed_compound_template untuk /generate & /refine, reaction_summary_template
+   untuk /combine).
+4. Jika sebagian field hilang/tidak valid, aparse_llm_output() mengirim re-ask kecil
+   yang HANYA meminta field tersebut (dengan field yang sudah benar sebagai konteks),
+   bukan meregenerasi seluruh objek.
+"""
+
+import json
+import os
+import threading
+from typing import Annotated, Any, ClassVar, Optional, Union
+from pydantic import BaseModel, BeforeValidator, ConfigDict, ValidationError
+from .llm import aget_llm_response
+from .metrics import timed
+
+# Jumlah maksimum re-ask per respons (0 = matikan re-ask)
+OUTPUT_REASK_MAX = int(os.getenv("OUTPUT_REASK_MAX", "1"))
+# Batas panjang konteks field yang sudah benar di prompt re-ask
+REASK_CONTEXT_CHARS = 1500
+
+# --- TEMPLATE SKEMA OUTPUT DETAIL GENERATE (Sesuai skema data Anda) ---
+detailed_compound_template = {
+    "nama_senyawa": "nama_senyawa", "rumus_molekul": "rumus_molekul", "berat_molekul": 0.0,
+    "sinonim": "...", "deskripsi": "Deskripsi LLM yang merangkum properti, risiko, dan kecocokan.",
+    "titik_didih_celsius": 0.0, "titik_leleh_celsius": 0.0, "densitas_gcm3": 0.0,
+    "pernyataan_bahaya_ghs": "...", "kategori_aplikasi": "...",
+    "sifat_fungsional": "...", "tingkat_risiko_keselamatan": "Rendah/Sedang/Tinggi",
+    "bahaya_keselamatan": "...", "ketersediaan_bahan_baku": "Tersedia",
+    "data_unsur_penyusun": [ {"nomor_atom": 0, "nama_unsur": "...", "simbol": "..."}],
+    "skor_kecocokan": 0,
+    "justifikasi_ringkas": "1-2 kalimat mengapa senyawa ini paling cocok dengan kriteria yang diminta."
+}
+
+# --- TEMPLATE SKEMA OUTPUT RINGKAS COMBINE ---
+reaction_summary_template = {
+    "reaktan_a": "nama_reaktan_a", "reaktan_b": "nama_reaktan_b", "jenis_reaksi": "Netralisasi/Redoks/Tidak Reaktif",
+    "produk_utama": "Nama produk", "persamaan_stoikiometri": "Persamaan kimia yang seimbang.",
+    "catatan_risiko": "Ringkasan risiko.", "deskripsi_ringkas": "Satu kalimat ringkas menjelaskan hasil."
+}
+
+
+class OutputParseError(ValueError):
+    """Respons LLM tidak bisa dijadikan objek yang valid (setelah perbaikan & re-ask)."""
+
+    def __init__(self, message: str, raw: str = "", extracted: str = "", invalid_fields: list[str] | None = None):
+        super().__init__(message)
+        self.raw = raw
+        self.extracted = extracted
+        self.invalid_fields = invalid_fields or []
+
+
+# --- EKSTRAKSI & PERBAIKAN ---
+
+def extract_json_block(text: str) -> tuple[str | None, bool]:
+    """
+    Objek JSON pertama di teks (scan linear, kurung seimbang di luar string).
+    Mengembalikan (potongan, lengkap); lengkap=False jika teks berakhir sebelum objek ditutup.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None, False
+    depth, in_string, escape = 0, False, False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1], True
+    return text[start:], False
+
+
+_LITERALS = {"True": "true", "False": "false", "None": "null", "NaN": "null", "undefined": "null"}
+
+
+def _closers(stack: list[str]) -> str:
+    return "".join("}" if opener == "{" else "]" for opener in reversed(stack))
+
+
+def _strip_dangling(text: str) -> str:
+    text = text.rstrip()
+    while text.endswith(","):
+        text = text[:-1].rstrip()
+    return text
+
+
+def repair_json(fragment: str) -> str:
+    """Memperbaiki cacat umum JSON dari LLM dalam satu pass (lihat docstring modul)."""
+    out: list[str] = []
+    stack: list[str] = []
+    # Titik potong aman: panjang out setelah nilai lengkap terakhir + stack saat itu
+    safe_cut = (0, [])
+    in_string, escape = False, False
+    i, n = 0, len(fragment)
+    while i < n:
+        c = fragment[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            elif c == "\n":
+                c = "\\n"
+            out.append(c)
+            i += 1
+            continue
+        if c == '"':
+            in_string = True
+        elif c == "/" and fragment.startswith("//", i):
+            end = fragment.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        elif c == "/" and fragment.startswith("/*", i):
+            end = fragment.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        elif c in "{[":
+            stack.append(c)
+            out.append(c)
+            if len(stack) == 1:
+                # Elemen bersarang yang terpotong dibuang utuh (bukan disisakan sebagai {})
+                safe_cut = (len(out), list(stack))
+            i += 1
+            continue
+        elif c in "}]":
+            # Trailing comma sebelum kurung tutup
+            while out and out[-1] in " \t\r\n":
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(c)
+            i += 1
+            continue
+        elif c == ",":
+            if stack:
+                safe_cut = (len(out), list(stack))
+        elif c.isalpha():
+            end = i
+            while end < n and (fragment[end].isalnum() or fragment[end] == "_"):
+                end += 1
+            word = fragment[i:end]
+            out.append(_LITERALS.get(word, word))
+            i = end
+            continue
+        out.append(c)
+        i += 1
+
+    text = "".join(out)
+    if not stack and not in_string:
+        return text
+
+    # Ekor terpotong. Di luar string: coba tutup apa adanya (nilai terakhir mungkin lengkap).
+    if not in_string:
+        candidate = _strip_dangling(text)
+        if not candidate.endswith(":"):
+            candidate += _closers(stack)
+            try:
+                json.loads(candidate)
+                return candidate
+            except json.JSONDecodeError:
+                pass
+    # String terpotong atau pasangan belum lengkap: buang sampai nilai lengkap terakhir
+    cut, cut_stack = safe_cut
+    return _strip_dangling("".join(out[:cut])) + _closers(cut_stack)
+
+
+def parse_json_lenient(text: str) -> tuple[Any, dict]:
+    """
+    Objek JSON pertama di teks (diperbaiki bila perlu) + info {"repaired", "truncated", "extracted"}.
+    Melempar OutputParseError jika tidak ada objek yang bisa diambil.
+    """
+    text = text or ""
+    block, complete = extract_json_block(text)
+    if block is None:
+        raise OutputParseError("Tidak ditemukan blok JSON yang valid dalam respons LLM.", raw=text)
+    info = {"repaired": False, "truncated": not complete, "extracted": block}
+    if complete:
+        try:
+            return json.loads(block), info
+        except json.JSONDecodeError:
+            pass
+    repaired = repair_json(block)
+    info["repaired"] = True
+    try:
+        return json.loads(repaired), info
+    except json.JSONDecodeError as e:
+        raise OutputParseError(f"JSON tidak bisa diperbaiki: {e}", raw=text, extracted=block)
+
+
+# --- SKEMA (Pydantic) ---
+
+_PLACEHOLDERS = {"", "-", "n/a", "na", "null", "none", "tidak diketahui", "tidak tersedia"}
+
+
+def _placeholder_to_none(value):
+    if isinstance(value, str) and value.strip().lower() in _PLACEHOLDERS:
+        return None
+    return value
+
+
+def _to_text(value):
+    if isinstance(value, list):
+        # Dataset memakai "|" sebagai pemisah untuk field multi-nilai
+        return " | ".join(str(item) for item in value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+Number = Annotated[Optional[Union[int, float]], BeforeValidator(_placeholder_to_none)]
+Text = Annotated[Optional[str], BeforeValidator(_to_text)]
+
+
+class ElementEntry(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    nomor_atom: Number = None
+    nama_unsur: Text = None
+    simbol: Text = None
+
+
+class CompoundRecommendation(BaseModel):
+    """Skema output /generate dan /refine (detailed_compound_template)."""
+    model_config = ConfigDict(extra="allow")
+    TEMPLATE: ClassVar[dict] = detailed_compound_template
+
+    nama_senyawa: str
+    rumus_molekul: Text
+    berat_molekul: Number
+    sinonim: Text
+    deskripsi: Text
+    titik_didih_celsius: Number
+    titik_leleh_celsius: Number
+    densitas_gcm3: Number
+    pernyataan_bahaya_ghs: Text
+    kategori_aplikasi: Text
+    sifat_fungsional: Text
+    tingkat_risiko_keselamatan: Text
+    bahaya_keselamatan: Text
+    ketersediaan_bahan_baku: Text
+    data_unsur_penyusun: list[ElementEntry]
+    skor_kecocokan: Number
+    justifikasi_ringkas: Text
+
+
+class ReactionSummary(BaseModel):
+    """Skema output /combine (reaction_summary_template)."""
+    model_config = ConfigDict(extra="allow")
+    TEMPLATE: ClassVar[dict] = reaction_summary_template
+
+    reaktan_a: Text
+    reaktan_b: Text
+    jenis_reaksi: str
+    produk_utama: Text
+    persamaan_stoikiometri: Text
+    catatan_risiko: Text
+    deskripsi_ringkas: Text
+
+
+def validate_output(obj, schema: type[BaseModel]) -> tuple[dict | None, list[str]]:
+    """(objek tervalidasi, []) atau (None, field top-level yang hilang/tidak valid)."""
+    if not isinstance(obj, dict):
+        return None, list(schema.model_fields)
+    try:
+        return schema.model_validate(obj).model_dump(), []
+    except ValidationError as e:
+        invalid = []
+        for error in e.errors():
+            field = error["loc"][0] if error["loc"] else None
+            if isinstance(field, str) and field not in invalid:
+                invalid.append(field)
+        return None, invalid
+
+
+# --- TELEMETRI ---
+_stats_lock = threading.Lock()
+_stats = {"parsed": 0, "repaired": 0, "reasked": 0, "reask_fields": 0, "reask_fixed": 0, "failed": 0}
+
+
+def _count(**increments):
+    with _stats_lock:
+        for key, value in increments.items():
+            _stats[key] += value
+
+
+def get_output_parser_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+# --- RE-ASK TERARAH ---
+
+def build_reask_prompt(partial: dict, fields: list[str], schema: type[BaseModel], context: str = "") -> str:
+    known = json.dumps(partial, ensure_ascii=False)
+    if len(known) > REASK_CONTEXT_CHARS:
+        known = known[:REASK_CONTEXT_CHARS] + " ..."
+    wanted = {field: schema.TEMPLATE.get(field, "...") for field in fields}
+    return f"""
+    Objek JSON hasil analisis sebelumnya belum lengkap/tidak valid pada field: {", ".join(fields)}.
+    {f"Konteks permintaan: {context}" if context else ""}
+
+    Field yang SUDAH BENAR (jangan diubah dan jangan diulang):
+    {known}
+
+    **KELUARAN WAJIB JSON MURNI**
+    Berikan HANYA objek JSON berisi field berikut saja, konsisten dengan data di atas.
+    Jika data tidak tersedia, gunakan nilai NULL/0.0/'-'. Skema:
+    {json.dumps(wanted, ensure_ascii=False, indent=2)}
+    """
+
+
+async def aparse_llm_output(text: str, schema: type[BaseModel], context: str = "",
+                            max_reasks: int = OUTPUT_REASK_MAX) -> tuple[dict, dict]:
+    """
+    Ekstrak + perbaiki + validasi. Field yang hilang/tidak valid diminta ulang lewat
+    prompt kecil (paling banyak max_reasks kali). Mengembalikan (objek valid, info);
+    info["repaired"] / info["reasked_fields"] menandai respons yang perlu disimpan ulang
+    ke cache dalam bentuk yang sudah diperbaiki.
+    """
+    try:
+        with timed("json_parse", schema=schema.__name__) as span:
+            obj, info = parse_json_lenient(text)
+            result, invalid = validate_output(obj, schema)
+            span["repaired"], span["invalid"] = info["repaired"], len(invalid)
+    except OutputParseError:
+        _count(failed=1)
+        raise
+    info["reasked_fields"] = []
+
+    attempts = 0
+    while invalid and isinstance(obj, dict) and attempts < max_reasks:
+        attempts += 1
+        partial = {key: value for key, value in obj.items() if key not in invalid}
+        if not partial:
+            # Tidak ada yang bisa dipertahankan: re-ask kecil tidak masuk akal
+            break
+        print(f"Output parser: re-ask {len(invalid)} field ({', '.join(invalid)}).")
+        _count(reasked=1, reask_fields=len(invalid))
+        info["reasked_fields"].extend(field for field in invalid if field not in info["reasked_fields"])
+        answer = await aget_llm_response(build_reask_prompt(partial, invalid, schema, context), force_json=True)
+        try:
+            patch, _ = parse_json_lenient(answer)
+        except OutputParseError:
+            continue
+        if isinstance(patch, dict):
+            obj = {**obj, **{key: value for key, value in patch.items() if key in invalid}}
+            result, invalid = validate_output(obj, schema)
+            if not invalid:
+                _count(reask_fixed=1)
+
+    if invalid:
+        _count(failed=1)
+        raise OutputParseError(
+            f"Field tidak valid/hilang setelah perbaikan: {', '.join(invalid)}",
+            raw=text, extracted=info["extracted"], invalid_fields=invalid
+        )
+    _count(parsed=1, repaired=int(info["repaired"]))
+    return result, info
@@ -0,0 +1,229 @@
+# agent/property_index.py
+"""
+Indeks kolumnar (NumPy) untuk query rentang properti numerik senyawa.
+
+Setiap field numerik disimpan sebagai array nilai yang sudah diurutkan beserta
+posisi record-nya, sehingga filter rentang cukup dua kali np.searchsorted.
+Filter multi-atribut digabung dengan mask boolean. Indeks dibangun ulang
+otomatis saat isi CompoundStore berubah (compound_store.version).
+"""
+
+import re
+import threading
+import numpy as np
+from .compound_store import compound_store
+
+# Field numerik yang bisa difilter
+NUMERIC_FIELDS = ("titik_didih_celsius", "titik_leleh_celsius", "densitas_gcm3", "berat_molekul")
+
+# Alias kunci propertiTarget dari frontend (sudah lowercase, tanpa spasi/simbol)
+PROPERTY_ALIASES = {
+    "titikdidih": "titik_didih_celsius", "titik_didih_celsius": "titik_didih_celsius", "boilingpoint": "titik_didih_celsius",
+    "titikleleh": "titik_leleh_celsius", "titiklebur": "titik_leleh_celsius", "titik_leleh_celsius": "titik_leleh_celsius",
+    "meltingpoint": "titik_leleh_celsius",
+    "densitas": "densitas_gcm3", "massajenis": "densitas_gcm3", "densitas_gcm3": "densitas_gcm3", "density": "densitas_gcm3",
+    "beratmolekul": "berat_molekul", "berat_molekul": "berat_molekul", "massamolekul": "berat_molekul", "mw": "berat_molekul",
+}
+RISK_ALIASES = ("risiko", "tingkatrisiko", "tingkat_risiko_keselamatan", "risikokeselamatan")
+
+# Toleransi saat pengguna hanya memberi satu angka (mis. "180°C" -> 165..195)
+PROPERTY_TOLERANCE = {
+    "titik_didih_celsius": 15.0,
+    "titik_leleh_celsius": 15.0,
+    "densitas_gcm3": 0.1,
+    "berat_molekul": 10.0,
+}
+
+_NUMBER = r"-?\d+(?:[.,]\d+)?"
+
+
+def _to_float(value) -> float:
+    if value is None or isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _parse_number(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+_LOWER_BOUND = r">|≥|min|di atas|lebih dari|lebih tinggi|above|at least"
+_UPPER_BOUND = r"<|≤|maks|max|di bawah|kurang dari|lebih rendah|below|at most"
+
+
+def _bound_kind(prefix: str) -> str | None:
+    """Pembanding terakhir di teks sebelum sebuah angka: "low", "high" atau None."""
+    matches = [(m.start(), "low") for m in re.finditer(_LOWER_BOUND, prefix)]
+    matches += [(m.start(), "high") for m in re.finditer(_UPPER_BOUND, prefix)]
+    return max(matches)[1] if matches else None
+
+
+def parse_range(text: str, field: str) -> tuple[float | None, float | None] | None:
+    """
+    Mengubah teks bebas menjadi rentang (min, max). Contoh:
+    "> 150", ">=150", "minimal 150", "< 1.2", "maks 1.2", "100-200",
+    "100 sampai 200", "> 150 dan < 300", "min 100 max 200",
+    "180°C" (satu angka -> +/- toleransi field).
+    Batas yang saling bertentangan (mis. "> 300 dan < 150") menghasilkan None.
+    """
+    text = str(text).strip().lower()
+    numbers = re.findall(_NUMBER, text)
+    if not numbers:
+        return None
+
+    between = re.search(rf"({_NUMBER})\s*(?:-|–|sampai|hingga|s/d|to|\.\.)\s*({_NUMBER})", text)
+    if between:
+        low, high = sorted([_parse_number(between.group(1)), _parse_number(between.group(2))])
+        return low, high
+
+    # Setiap angka memakai pembanding tepat di depannya, sehingga dua batas sekaligus terbaca
+    lows, highs, previous_end = [], [], 0
+    for match in re.finditer(_NUMBER, text):
+        kind = _bound_kind(text[previous_end:match.start()])
+        if kind == "low":
+            lows.append(_parse_number(match.group()))
+        elif kind == "high":
+            highs.append(_parse_number(match.group()))
+        previous_end = match.end()
+    if lows or highs:
+        low, high = (max(lows) if lows else None), (min(highs) if highs else None)
+        if low is not None and high is not None and low > high:
+            return None
+        return low, high
+
+    value = _parse_number(numbers[0])
+    if re.search(_LOWER_BOUND, text):
+        return value, None
+    if re.search(_UPPER_BOUND, text):
+        return None, value
+
+    tolerance = PROPERTY_TOLERANCE.get(field, 0.0)
+    return value - tolerance, value + tolerance
+
+
+def parse_property_criteria(properti_target: dict) -> tuple[dict, str | None]:
+    """Mengekstrak filter rentang numerik dan tingkat risiko dari GenerateRequest.propertiTarget."""
+    ranges, risk = {}, None
+    for key, value in (properti_target or {}).items():
+        normalized_key = re.sub(r"[^a-z0-9_]", "", str(key).lower())
+        if normalized_key in RISK_ALIASES:
+            risk = str(value).strip()
+            continue
+        field = PROPERTY_ALIASES.get(normalized_key)
+        if field:
+            parsed = parse_range(value, field)
+            if parsed:
+                ranges[field] = parsed
+    return ranges, risk
+
+
+class PropertyIndex:
+    """Kolom numerik terurut + kode kategori untuk filter multi-atribut dalam mikrodetik."""
+
+    def __init__(self, records: list[dict], version: int = 0):
+        self.records = records
+        self.version = version
+        size = len(records)
+
+        # field -> (nilai terurut, posisi record); NaN (data kosong) tidak ikut diindeks
+        self.columns = {}
+        for field in NUMERIC_FIELDS:
+            values = np.fromiter((_to_float(r.get(field)) for r in records), dtype=np.float64, count=size)
+            valid = np.flatnonzero(~np.isnan(values))
+            order = valid[np.argsort(values[valid], kind="stable")]
+            self.columns[field] = (values[order], order)
+
+        # Tingkat risiko sebagai kode integer
+        risk_labels = [str(r.get("tingkat_risiko_keselamatan") or "").strip().lower() for r in records]
+        self.risk_vocab = {label: code for code, label in enumerate(sorted(set(risk_labels)))}
+        self.risk_codes = np.fromiter((self.risk_vocab[label] for label in risk_labels), dtype=np.int32, count=size)
+
+        # Token kategori -> array posisi
+        category_positions = {}
+        for position, record in enumerate(records):
+            for token in re.split(r"[|,]", str(record.get("kategori_aplikasi") or "")):
+                token = token.strip().lower()
+                if token:
+                    category_positions.setdefault(token, []).append(position)
+        self.category_positions = {k: np.array(v, dtype=np.int64) for k, v in category_positions.items()}
+
+    def range_positions(self, field: str, low: float | None = None, high: float | None = None) -> np.ndarray:
+        """Posisi record dengan low <= field <= high (batas None = terbuka)."""
+        sorted_values, positions = self.columns[field]
+        left = 0 if low is None else np.searchsorted(sorted_values, low, side="left")
+        right = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side="right")
+        return positions[left:right]
+
+    def search(self, ranges: dict | None = None, risk: str | None = None,
+               category: str | None = None, sort_by: str | None = None, limit: int | None = None) -> list[int]:
+        """Filter gabungan (AND) atas rentang numerik, risiko, dan kategori. Mengembalikan posisi record."""
+        mask = np.ones(len(self.records), dtype=bool)
+        for field, (low, high) in (ranges or {}).items():
+            if field not in self.columns:
+                raise ValueError(f"Field numerik tidak dikenal: {field}")
+            field_mask = np.zeros(len(self.records), dtype=bool)
+            field_mask[self.range_positions(field, low, high)] = True
+            mask &= field_mask
+        if risk:
+            code = self.risk_vocab.get(risk.strip().lower())
+            if code is None:
+                return []
+            mask &= self.risk_codes == code
+        if category:
+            category_mask = np.zeros(len(self.records), dtype=bool)
+            category_mask[self.category_positions.get(category.strip().lower(), np.empty(0, dtype=np.int64))] = True
+            mask &= category_mask
+
+        positions = np.flatnonzero(mask)
+        if sort_by in self.columns:
+            # Urutkan mengikuti kolom terurut; record tanpa nilai diletakkan di akhir
+            _, ordered = self.columns[sort_by]
+            ordered = ordered[mask[ordered]]
+            missing = np.setdiff1d(positions, ordered, assume_unique=True)
+            positions = np.concatenate([ordered, missing])
+        if limit is not None:
+            positions = positions[:limit]
+        return positions.tolist()
+
+    def search_records(self, *args, **kwargs) -> list[dict]:
+        return [self.records[i] for i in self.search(*args, **kwargs)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_property_index() -> PropertyIndex:
+    """Indeks properti proses-wide, dibangun ulang bila CompoundStore berubah."""
+    global _index
+    records, version = compound_store.snapshot()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = PropertyIndex(records, version)
+        return _index
+
+
+# Field ringkas yang dikirim ke LLM untuk setiap kandidat
+CANDIDATE_FIELDS = (
+    "nama_senyawa", "rumus_molekul", "berat_molekul", "titik_didih_celsius", "titik_leleh_celsius",
+    "densitas_gcm3", "tingkat_risiko_keselamatan", "kategori_aplikasi",
+)
+PREFILTER_MAX_CANDIDATES = 20
+
+
+def prefilter_candidates(properti_target: dict, limit: int = PREFILTER_MAX_CANDIDATES) -> list[dict] | None:
+    """
+    Tahap pre-filter /generate: mempersempit kandidat dari database memakai
+    kriteria numerik/risiko di propertiTarget. None jika tidak ada kriteria yang bisa diparse.
+    """
+    ranges, risk = parse_property_criteria(properti_target)
+    if not ranges and not risk:
+        return None
+    sort_by = next(iter(ranges), None)
+    return get_property_index().search_records(ranges, risk=risk, sort_by=sort_by, limit=limit)
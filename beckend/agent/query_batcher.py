@@ -0,0 +1,99 @@
+# agent/query_batcher.py
+"""
+Micro-batching embedding query.
+
+Query yang datang bersamaan (dari thread retrieval, atau dari beberapa worker lewat
+layanan vektor bersama) dikumpulkan selama paling lama QUERY_BATCH_WINDOW_MS atau
+sampai QUERY_BATCH_MAX_SIZE item, lalu di-embed dalam SATU forward pass. Hasilnya
+dibagikan kembali ke setiap pemanggil. Throughput sentence-transformers di CPU jauh
+lebih tinggi untuk batch daripada satu per satu.
+
+QUERY_BATCH_WINDOW_MS=0 mematikan batching (embedding langsung di thread pemanggil).
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from .metrics import Histogram
+
+QUERY_BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", "5"))
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+
+
+class QueryEmbeddingBatcher:
+    """Antrian micro-batch di depan encoder query (satu worker thread per proses)."""
+
+    def __init__(self, embed_fn, window_ms: float = QUERY_BATCH_WINDOW_MS, max_size: int = QUERY_BATCH_MAX_SIZE):
+        # embed_fn: list[str] -> list[list[float]] (mis. embeddings.embed_documents)
+        self.embed_fn = embed_fn
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self._cond = threading.Condition()
+        self._queue: list[tuple[str, Future, float]] = []
+        self._thread = None
+        self.batch_sizes = Histogram("query_batch_size", [1, 2, 4, 8, 16, 32, 64])
+        self.queue_wait_ms = Histogram("query_queue_wait_ms", [0.5, 1, 2, 5, 10, 20, 50, 100])
+
+    def embed(self, text: str) -> list[float]:
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: list[str]) -> list[list[float]]:
+        """Mendaftarkan teks ke antrian lalu menunggu hasil batch-nya."""
+        if self.window <= 0:
+            self.batch_sizes.observe(len(texts))
+            self.queue_wait_ms.observe(0.0)
+            return self.embed_fn(texts)
+        futures = []
+        with self._cond:
+            now = time.perf_counter()
+            for text in texts:
+                future = Future()
+                self._queue.append((text, future, now))
+                futures.append(future)
+            self._ensure_worker()
+            self._cond.notify()
+        return [future.result() for future in futures]
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker_loop, name="query-batcher", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> list[tuple[str, Future, float]]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # Tunggu item lain sampai jendela batch habis atau batch penuh
+            deadline = self._queue[0][2] + self.window
+            while len(self._queue) < self.max_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            batch, self._queue = self._queue[:self.max_size], self._queue[self.max_size:]
+            return batch
+
+    def _worker_loop(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.observe((started - enqueued) * 1000)
+            try:
+                vectors = self.embed_fn([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
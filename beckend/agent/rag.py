@@ -1,18 +1,73 @@
 # agent/rag.py (Sekarang berfungsi sebagai RAG Orchestrator)
-from .retriever_service import retrieve_documents
-from .generator_service import generate_answer
+import asyncio
+from .retriever_service import retrieve_documents, reload_retriever, warm_up
+from .generator_service import generate_answer, agenerate_answer
+from .embedding_service import run_ingestion
+from .response_cache import response_cache
+from .singleflight import retrieval_flight
+from .vector_client import get_vector_client
+from .index_manifest import index_generation
+
+# Kunci response cache mengikuti versi index di disk: reindex oleh worker mana pun
+# (atau layanan vektor bersama) membuat jawaban lama tidak terpakai di SEMUA worker.
+response_cache.set_generation_source(index_generation)
+
+def rebuild_index() -> str:
+    """Sinkronisasi index (ingestion inkremental) lalu tukar retriever ke versi terbaru."""
+    client = get_vector_client()
+    if client is not None:
+        # Mode layanan bersama: ingestion + reload dijalankan di proses layanan
+        try:
+            result_message = client.rebuild()
+        except Exception as e:
+            result_message = f"Error saat menghubungi layanan vektor: {e}"
+        print(f"RAGEngine: {result_message}")
+        if result_message.startswith("Error"):
+            return result_message
+        response_cache.clear()
+        return result_message
+
+    result_message = run_ingestion()
+    print(f"RAGEngine: {result_message}")
+    if result_message.startswith("Error"):
+        return result_message
+    reload_retriever()
+    # Jawaban lama mungkin tidak lagi sesuai dengan data baru
+    response_cache.clear()
+    return result_message
+
+def _schedule_rebuild(status: str):
+    """Manifest index tidak cocok/belum ada: bangun ulang lewat antrian ingestion (background)."""
+    from .ingestion_jobs import get_ingestion_queue
+    job = get_ingestion_queue().submit(reason=f"startup_manifest_{status}")
+    print(f"RAGEngine: rebuild index dijadwalkan (job {job['id']}).")
 
 class RAGEngine:
     def __init__(self):
         self.is_indexed = False # Tetap simpan flag untuk health check
+        self.startup_stats = {}  # Waktu cek manifest / mount / warm-up model (untuk /health)
         print("RAGEngine initialized.")
 
-    def index_data(self):
-        """Melakukan indexing/ingestion data. Dipanggil saat startup main.py."""
-        # ... (Logika indexing tetap sama)
-        
+    def index_data(self, rebuild: bool = False):
+        """
+        Menyiapkan retriever proses-wide. Dipanggil saat startup main.py.
+
+        Jika rebuild=True (misalnya setelah /save_compound), ingestion dijalankan
+        dulu lalu retriever ditukar secara atomik ke index yang baru.
+        """
+        if rebuild:
+            result_message = rebuild_index()
+            if result_message.startswith("Error"):
+                raise RuntimeError(result_message)
+        else:
+            # Warm-up: mount Vector Store (manifest cocok) lalu muat model embedding
+            # sekali per worker, atau tunggu layanan vektor bersama siap
+            self.startup_stats = warm_up(on_stale=_schedule_rebuild)
+            if self.startup_stats.get("index_present") is False:
+                # Belum ada index sama sekali: is_indexed menyusul setelah job rebuild selesai
+                return
+
         # Setelah sukses indexing:
-        # ...
         self.is_indexed = True # Tetapkan True di sini.
 
     def query(self, user_query: str) -> str:
@@ -36,4 +91,19 @@ class RAGEngine:
         # 2. GENERATION
         final_answer = generate_answer(user_query, retrieved_docs)
         
-        return final_answer
\ No newline at end of file
+        return final_answer
+
+    async def aquery(self, user_query: str) -> str:
+        """Versi async dari query: retrieval di thread pool, generasi via klien aio."""
+        print(f"RAG Pipeline: Running retrieval for query: {user_query}")
+
+        # Retrieval (embedding + vector search) bersifat CPU-bound, jalankan di thread
+        # dan digabung (single-flight) jika query identik sedang berjalan
+        retrieved_docs = await retrieval_flight.do(user_query, asyncio.to_thread, retrieve_documents, user_query)
+
+        if not retrieved_docs:
+            return "Gagal melakukan retrieval dokumen. Pastikan data sudah di-ingest dan server stabil."
+
+        print(f"RAG Pipeline: Found {len(retrieved_docs)} relevant documents.")
+
+        return await agenerate_answer(user_query, retrieved_docs)
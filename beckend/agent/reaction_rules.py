@@ -0,0 +1,191 @@
+# agent/reaction_rules.py
+"""
+Pre-classifier berbasis aturan untuk /combine (tanpa LLM, di bawah 1 ms).
+
+Fitur per senyawa diambil dari field dataset:
+- kode H dari pernyataan_bahaya_ghs -> kelas bahaya (oksidator, mudah terbakar,
+  korosif, reaktif terhadap air, eksplosif/swa-reaktif),
+- token kategori_aplikasi (pelarut, bahan bakar, ...),
+- simbol unsur dari data_unsur_penyusun (hidrokarbon, logam alkali murni, ...),
+- penanda asam/basa/hipoklorit dari nama & sinonim.
+
+classify_pair() mengembalikan:
+- "berbahaya"      : kombinasi yang jelas berisiko (oksidator + bahan mudah terbakar,
+                     asam + basa korosif, hipoklorit + asam/amonia, reaktif air + air),
+- "tidak_reaktif"  : pasangan yang jelas tidak bereaksi (senyawa yang sama; sesama
+                     hidrokarbon/pelarut organik tanpa kelas bahaya reaktif),
+- None             : sisanya, diteruskan ke reaction store / LLM.
+
+Aturan sengaja konservatif: jika ragu, hasilnya None.
+"""
+
+import os
+import re
+
+COMBINE_RULES_ENABLED = os.getenv("COMBINE_RULES_ENABLED", "1") == "1"
+
+# Kelas bahaya GHS berdasarkan kode H
+HAZARD_CLASSES = {
+    "eksplosif": {"H200", "H201", "H202", "H203", "H204", "H205", "H240", "H241", "H242"},
+    "mudah_terbakar": {"H220", "H221", "H222", "H223", "H224", "H225", "H226", "H227", "H228"},
+    "piroforik": {"H250", "H251", "H252"},
+    "reaktif_air": {"H260", "H261"},
+    "oksidator": {"H270", "H271", "H272"},
+    "korosif": {"H290", "H314"},
+}
+# Kelas yang membuat pasangan TIDAK boleh diklasifikasikan "tidak reaktif"
+REACTIVE_CLASSES = {"eksplosif", "piroforik", "reaktif_air", "oksidator", "korosif"}
+
+_H_CODE_RE = re.compile(r"\bH(\d{3})\b")
+_ACID_RE = re.compile(r"\b(?:acid|asam)\b")
+_BASE_RE = re.compile(r"hydroxide|hidroksida|\bammonia\b|\bamonia\b")
+_AMMONIA_RE = re.compile(r"\bammonia\b|\bamonia\b")
+_HYPOCHLORITE_RE = re.compile(r"hypochlorite|hipoklorit|\bbleach\b|\bpemutih\b")
+# Hanya beberapa sinonim pertama yang diperiksa (sinonim di ujung daftar sering berupa kode/merek)
+_NAME_SYNONYMS = 5
+
+ALKALI_METALS = {"Li", "Na", "K", "Rb", "Cs"}
+HYDROCARBON_ELEMENTS = {"C", "H"}
+ORGANIC_CHO_ELEMENTS = {"C", "H", "O"}
+INERT_CATEGORIES = {"pelarut", "bahan bakar"}
+
+
+def _split(value, separators=("|", ",")) -> list[str]:
+    tokens = [str(value or "")]
+    for sep in separators:
+        tokens = [part for token in tokens for part in token.split(sep)]
+    return [token.strip().lower() for token in tokens if token.strip()]
+
+
+def compound_features(record: dict) -> dict:
+    """Fitur ringkas satu record untuk aturan reaksi."""
+    h_codes = {f"H{code}" for code in _H_CODE_RE.findall(str(record.get("pernyataan_bahaya_ghs") or ""))}
+    names = " ".join(
+        [str(record.get("nama_senyawa") or "")] + _split(record.get("sinonim"), ("|",))[:_NAME_SYNONYMS]
+    ).lower()
+    elements = {
+        str(unsur.get("simbol")) for unsur in record.get("data_unsur_penyusun") or []
+        if isinstance(unsur, dict) and unsur.get("simbol")
+    }
+    formula = str(record.get("rumus_molekul") or "").replace(" ", "")
+    classes = {name for name, codes in HAZARD_CLASSES.items() if h_codes & codes}
+    if len(elements) == 1 and elements & ALKALI_METALS:
+        # Logam alkali murni bereaksi hebat dengan air meskipun kode H260 tidak tercatat
+        classes.add("reaktif_air")
+    return {
+        "name": record.get("nama_senyawa"),
+        "h_codes": h_codes,
+        "classes": classes,
+        "categories": set(_split(record.get("kategori_aplikasi"))),
+        "elements": elements,
+        "risk": record.get("tingkat_risiko_keselamatan") or "-",
+        "acid": bool(_ACID_RE.search(names)),
+        "base": bool(_BASE_RE.search(names)),
+        "ammonia": bool(_AMMONIA_RE.search(names)),
+        "hypochlorite": bool(_HYPOCHLORITE_RE.search(names)),
+        "water": formula in ("H2O", "OH2"),
+    }
+
+
+def _flammable(features: dict) -> bool:
+    return "mudah_terbakar" in features["classes"] or "bahan bakar" in features["categories"]
+
+
+def _inert(features: dict) -> bool:
+    """Tidak punya kelas bahaya reaktif maupun penanda asam/basa/hipoklorit."""
+    return not (features["classes"] & REACTIVE_CLASSES) and not (
+        features["acid"] or features["base"] or features["hypochlorite"] or features["water"]
+    )
+
+
+def _codes(features: dict, hazard_class: str) -> str:
+    codes = sorted(features["h_codes"] & HAZARD_CLASSES.get(hazard_class, set()))
+    return f" ({', '.join(codes)})" if codes else ""
+
+
+def _dangerous_rule(a: dict, b: dict) -> tuple[str, str] | None:
+    """(jenis_reaksi, alasan) untuk pasangan berbahaya; dicek untuk kedua urutan."""
+    for x, y in ((a, b), (b, a)):
+        if "oksidator" in x["classes"] and _flammable(y):
+            return ("Redoks (oksidasi kuat, berpotensi kebakaran/ledakan)",
+                    f"{x['name']} adalah oksidator{_codes(x, 'oksidator')} dan {y['name']} mudah terbakar"
+                    f"{_codes(y, 'mudah_terbakar')}.")
+        if "reaktif_air" in x["classes"] and y["water"]:
+            return ("Reaksi dengan air (melepaskan gas mudah terbakar)",
+                    f"{x['name']} reaktif terhadap air{_codes(x, 'reaktif_air')}.")
+        if x["hypochlorite"] and (y["acid"] or y["ammonia"]):
+            gas = "kloramin" if y["ammonia"] else "klorin"
+            return (f"Pelepasan gas beracun ({gas})",
+                    f"Hipoklorit ({x['name']}) dengan {'amonia' if y['ammonia'] else 'asam'} ({y['name']}) "
+                    f"melepaskan gas {gas}.")
+        if x["acid"] and y["base"] and ("korosif" in x["classes"] or "korosif" in y["classes"]):
+            return ("Netralisasi (eksotermik)",
+                    f"Asam ({x['name']}) dan basa ({y['name']}) korosif{_codes(x, 'korosif') or _codes(y, 'korosif')} "
+                    "bereaksi melepaskan panas.")
+    return None
+
+
+def _non_reactive_rule(a: dict, b: dict, same: bool) -> str | None:
+    """Alasan pasangan jelas tidak reaktif, atau None."""
+    if same:
+        return "Kedua reaktan adalah senyawa yang sama."
+    if not (_inert(a) and _inert(b)):
+        return None
+    if a["elements"] and b["elements"] and "C" in a["elements"] and "C" in b["elements"]:
+        if a["elements"] <= HYDROCARBON_ELEMENTS and b["elements"] <= HYDROCARBON_ELEMENTS:
+            return "Keduanya hidrokarbon (hanya C dan H) tanpa kelas bahaya reaktif."
+        if (a["elements"] <= ORGANIC_CHO_ELEMENTS and b["elements"] <= ORGANIC_CHO_ELEMENTS
+                and a["categories"] & INERT_CATEGORIES and b["categories"] & INERT_CATEGORIES):
+            return "Keduanya pelarut/bahan bakar organik (C, H, O) tanpa kelas bahaya reaktif."
+    return None
+
+
+def _risk_note(a: dict, b: dict) -> str:
+    notes = [f"Tingkat risiko: {a['name']} {a['risk']}, {b['name']} {b['risk']}."]
+    flammable = [f["name"] + _codes(f, "mudah_terbakar") for f in (a, b) if "mudah_terbakar" in f["classes"]]
+    if flammable:
+        notes.append(f"Campuran tetap mudah terbakar: {', '.join(flammable)}.")
+    return " ".join(notes)
+
+
+def classify_pair(record_a: dict, record_b: dict, compound_a: str, compound_b: str) -> dict | None:
+    """
+    Hasil berformat ReactionSummary (+ "klasifikasi" dan "alasan") untuk pasangan yang
+    bisa diputuskan dengan aturan, atau None jika harus dianalisis LLM.
+    """
+    if not COMBINE_RULES_ENABLED:
+        return None
+    a, b = compound_features(record_a), compound_features(record_b)
+    same = record_a is record_b or bool(a["name"] and a["name"] == b["name"])
+    # Pesan memakai nama yang diketik pengguna, bukan ID dataset
+    a["name"], b["name"] = compound_a, compound_b
+    dangerous = _dangerous_rule(a, b)
+    if dangerous:
+        jenis_reaksi, alasan = dangerous
+        return {
+            "reaktan_a": compound_a,
+            "reaktan_b": compound_b,
+            "jenis_reaksi": jenis_reaksi,
+            "produk_utama": "-",
+            "persamaan_stoikiometri": "-",
+            "catatan_risiko": f"BERBAHAYA: {alasan} Jangan dicampur tanpa prosedur dan APD yang sesuai. "
+                              + _risk_note(a, b),
+            "deskripsi_ringkas": f"Kombinasi {compound_a} dan {compound_b} ditandai berbahaya oleh klasifikasi "
+                                 "aturan (kelas bahaya GHS dan komposisi).",
+            "klasifikasi": "berbahaya",
+            "alasan": alasan,
+        }
+    alasan = _non_reactive_rule(a, b, same)
+    if alasan:
+        return {
+            "reaktan_a": compound_a,
+            "reaktan_b": compound_b,
+            "jenis_reaksi": "Tidak Reaktif",
+            "produk_utama": "Tidak ada (campuran fisik)",
+            "persamaan_stoikiometri": "Tidak ada reaksi kimia.",
+            "catatan_risiko": _risk_note(a, b),
+            "deskripsi_ringkas": f"{compound_a} dan {compound_b} hanya membentuk campuran fisik. {alasan}",
+            "klasifikasi": "tidak_reaktif",
+            "alasan": alasan,
+        }
+    return None
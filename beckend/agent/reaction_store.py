@@ -0,0 +1,218 @@
+# agent/reaction_store.py
+"""
+Reaction store: hasil analisis /combine yang persisten, dengan kunci pasangan senyawa.
+
+- Kunci tidak sensitif urutan (A+B == B+A). Nama yang ter-resolve ke dataset
+  (nama, sinonim, rumus; lihat fast_path.resolve_compound) memakai nama_senyawa
+  sebagai identitas, sehingga "methane" dan "CID-297" berbagi entri.
+- Disimpan di SQLite (REACTION_STORE_DB) tanpa TTL: dipakai bersama semua worker
+  dan bertahan lintas restart, berbeda dengan response cache yang LRU + TTL.
+- Setiap lookup /combine menambah penghitung permintaan per pasangan (juga untuk
+  pasangan yang belum punya hasil). Penghitung dikumpulkan di memori dan ditulis
+  sebagai satu transaksi paling cepat setiap REACTION_COUNT_FLUSH_S detik, sehingga
+  jalur /combine tidak menunggu lock tulis SQLite di setiap request; gagal menulis
+  (mis. "database is locked") hanya menunda hitungan ke flush berikutnya. Job offline
+  tools/precompute_reactions.py memakai penghitung ini untuk memilih pasangan populer.
+
+lookup_reaction() adalah jalur cepat /combine & /combine_batch sebelum LLM:
+pre-classifier aturan (agent/reaction_rules.py) lalu reaction store.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from .reaction_rules import classify_pair
+from .response_cache import normalize_prompt
+
+REACTION_STORE_DB = os.getenv("REACTION_STORE_DB", "reaction_pairs.db")  # kosong = nonaktif
+# Interval minimum penulisan penghitung permintaan yang dikumpulkan di memori (detik)
+REACTION_COUNT_FLUSH_S = float(os.getenv("REACTION_COUNT_FLUSH_S", "5"))
+
+
+def resolve_reactant(name: str) -> dict | None:
+    """Record dataset untuk nama reaktan (None jika tidak ada atau ambigu)."""
+    from .fast_path import resolve_compound
+    return resolve_compound(normalize_prompt(name), name)
+
+
+def reactant_identity(name: str, record: dict | None = None) -> str:
+    if record is not None and record.get("nama_senyawa"):
+        return normalize_prompt(str(record["nama_senyawa"]))
+    return normalize_prompt(name)
+
+
+class ReactionStore:
+    """Tabel reaction_pairs: satu baris per pasangan (hasil boleh NULL = baru diminta)."""
+
+    def __init__(self, path: str = REACTION_STORE_DB, flush_interval: float = REACTION_COUNT_FLUSH_S):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {"hits": 0, "misses": 0, "rule_hits": 0, "stored": 0, "count_flush_errors": 0}
+        # pair_key -> [reaktan_a, reaktan_b, identity_a, jumlah, terakhir diminta] (belum ditulis)
+        self._pending_counts: dict[str, list] = {}
+        self._last_flush = time.time()
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Hitungan permintaan tidak kritis: tanpa fsync per commit
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reaction_pairs ("
+                "pair_key TEXT PRIMARY KEY, reactant_a TEXT NOT NULL, reactant_b TEXT NOT NULL, "
+                "identity_a TEXT NOT NULL, result TEXT, source TEXT, model TEXT, created REAL, "
+                "requests INTEGER NOT NULL DEFAULT 0, last_requested REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_reaction_pairs_requests ON reaction_pairs(requests)"
+            )
+            self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    @staticmethod
+    def pair_key(identity_a: str, identity_b: str) -> str:
+        return "::".join(sorted([identity_a, identity_b]))
+
+    def get(self, compound_a: str, compound_b: str, identity_a: str, identity_b: str,
+            count_request: bool = True) -> dict | None:
+        """Hasil tersimpan (reaktan disesuaikan dengan urutan request) atau None."""
+        if not self.enabled:
+            return None
+        key = self.pair_key(identity_a, identity_b)
+        now = time.time()
+        with self._lock:
+            if count_request:
+                pending = self._pending_counts.setdefault(key, [compound_a, compound_b, identity_a, 0, now])
+                pending[3] += 1
+                pending[4] = now
+                if now - self._last_flush >= self.flush_interval:
+                    self._flush_counts_locked()
+            row = self._conn.execute(
+                "SELECT result, identity_a FROM reaction_pairs WHERE pair_key = ?", (key,)
+            ).fetchone()
+            self._stats["hits" if row and row[0] else "misses"] += 1
+        if not row or not row[0]:
+            return None
+        result = json.loads(row[0])
+        if row[1] != identity_a and identity_a != identity_b:
+            # Disimpan dengan urutan B+A: tukar reaktan agar sesuai request
+            result["reaktan_a"], result["reaktan_b"] = result.get("reaktan_b"), result.get("reaktan_a")
+        return result
+
+    def put(self, compound_a: str, compound_b: str, result: dict, source: str, model: str | None = None,
+            identity_a: str | None = None, identity_b: str | None = None):
+        """Menyimpan hasil untuk pasangan (menimpa hasil lama; penghitung permintaan dipertahankan)."""
+        if not self.enabled:
+            return
+        if identity_a is None or identity_b is None:
+            identity_a = reactant_identity(compound_a, resolve_reactant(compound_a))
+            identity_b = reactant_identity(compound_b, resolve_reactant(compound_b))
+        key = self.pair_key(identity_a, identity_b)
+        value = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO reaction_pairs (pair_key, reactant_a, reactant_b, identity_a, result, source, model, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(pair_key) DO UPDATE SET "
+                "reactant_a = excluded.reactant_a, reactant_b = excluded.reactant_b, identity_a = excluded.identity_a, "
+                "result = excluded.result, source = excluded.source, model = excluded.model, created = excluded.created",
+                (key, compound_a, compound_b, identity_a, value, source, model, time.time())
+            )
+            self._conn.commit()
+            self._stats["stored"] += 1
+
+    def _flush_counts_locked(self):
+        """Menulis penghitung yang terkumpul dalam satu transaksi (dipanggil dengan self._lock)."""
+        self._last_flush = time.time()
+        if not self._pending_counts:
+            return
+        pending, self._pending_counts = self._pending_counts, {}
+        try:
+            self._conn.executemany(
+                "INSERT INTO reaction_pairs (pair_key, reactant_a, reactant_b, identity_a, requests, last_requested) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(pair_key) DO UPDATE SET "
+                "requests = requests + excluded.requests, last_requested = excluded.last_requested",
+                [(key, *values) for key, values in pending.items()]
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            # Hitungan tidak kritis: disimpan lagi untuk flush berikutnya, request tetap jalan
+            self._conn.rollback()
+            self._stats["count_flush_errors"] += 1
+            print(f"ReactionStore: gagal menulis penghitung permintaan ({e}); dicoba lagi nanti.")
+            for key, values in pending.items():
+                merged = self._pending_counts.setdefault(key, values)
+                if merged is not values:
+                    merged[3] += values[3]
+                    merged[4] = max(merged[4], values[4])
+
+    def flush_counts(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._flush_counts_locked()
+
+    def has_result(self, identity_a: str, identity_b: str) -> bool:
+        if not self.enabled:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result IS NOT NULL FROM reaction_pairs WHERE pair_key = ?",
+                (self.pair_key(identity_a, identity_b),)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def popular_pending(self, limit: int, min_requests: int = 1) -> list[tuple[str, str, int]]:
+        """Pasangan paling sering diminta yang belum punya hasil: [(reaktan_a, reaktan_b, requests)]."""
+        if not self.enabled:
+            return []
+        with self._lock:
+            self._flush_counts_locked()
+            return self._conn.execute(
+                "SELECT reactant_a, reactant_b, requests FROM reaction_pairs "
+                "WHERE result IS NULL AND requests >= ? ORDER BY requests DESC, last_requested DESC LIMIT ?",
+                (min_requests, limit)
+            ).fetchall()
+
+    def record_rule_hit(self):
+        with self._lock:
+            self._stats["rule_hits"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"enabled": self.enabled, "path": self.path, **self._stats,
+                     "pending_counts": len(self._pending_counts)}
+            if self.enabled:
+                stored, pending = self._conn.execute(
+                    "SELECT COUNT(result), COUNT(*) - COUNT(result) FROM reaction_pairs"
+                ).fetchone()
+                stats.update(pairs_stored=stored, pairs_pending=pending)
+        return stats
+
+
+# Instance proses-wide
+reaction_store = ReactionStore()
+
+
+def lookup_reaction(compound_a: str, compound_b: str, count_request: bool = True) -> tuple[dict, str] | None:
+    """
+    Jawaban /combine tanpa LLM: (hasil, "rule") dari pre-classifier atau (hasil, "store")
+    dari reaction store. None = pasangan harus dianalisis LLM.
+    """
+    record_a, record_b = resolve_reactant(compound_a), resolve_reactant(compound_b)
+    if record_a is not None and record_b is not None:
+        result = classify_pair(record_a, record_b, compound_a, compound_b)
+        if result is not None:
+            reaction_store.record_rule_hit()
+            return result, "rule"
+    result = reaction_store.get(
+        compound_a, compound_b,
+        reactant_identity(compound_a, record_a), reactant_identity(compound_b, record_b),
+        count_request=count_request,
+    )
+    return (result, "store") if result is not None else None
@@ -0,0 +1,252 @@
+# agent/refine_sessions.py
+"""
+Sesi refinement /refine di sisi server.
+
+Tanpa sesi, setiap iterasi /refine mengirim ulang GenerateRequest + currentRecommendation,
+lalu server memilih ulang kandidat dan menyusun ulang seluruh prompt. Dengan sesi:
+
+- Konteks request (kriteria + kandidat dari database) disusun SEKALI saat sesi dibuat
+  dan dipakai ulang di setiap iterasi (tanpa retrieval ulang). Bersama instruksi/skema,
+  konteks ini menjadi prefix prompt yang stabil antar iterasi -- bisa dikirim lewat
+  context cache Gemini (lihat agent/llm.py).
+- Klien cukup mengirim feedback baru; riwayat iterasi disimpan ringkas (nama senyawa,
+  skor, justifikasi) dan dibatasi REFINE_HISTORY_TURNS iterasi terakhir, sehingga ukuran
+  prompt tidak tumbuh tanpa batas pada rantai refinement yang panjang.
+- Sesi disimpan di SQLite (REFINE_SESSION_DB) dengan kolom TTL/LRU, sehingga dipakai
+  bersama oleh semua worker uvicorn (start.sh menjalankan beberapa worker): session_id
+  dari satu worker dikenali worker lain. TTL diperpanjang setiap dipakai; jumlah sesi
+  dibatasi REFINE_SESSION_MAX (yang paling lama tidak dipakai dibuang).
+- Satu iterasi per sesi pada satu waktu, lintas worker: acquire() mengambil lease
+  (busy_until + token) secara atomik di database. Iterasi kedua yang datang bersamaan
+  ditolak (SessionBusy -> HTTP 409) sebelum memanggil LLM.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+REFINE_SESSION_TTL = float(os.getenv("REFINE_SESSION_TTL", "1800"))  # detik sejak terakhir dipakai
+REFINE_SESSION_MAX = int(os.getenv("REFINE_SESSION_MAX", "512"))
+REFINE_HISTORY_TURNS = int(os.getenv("REFINE_HISTORY_TURNS", "5"))
+REFINE_SESSION_DB = os.getenv("REFINE_SESSION_DB", "refine_sessions.db")
+# Batas lease satu iterasi (panggilan LLM + parsing); lease yang kedaluwarsa boleh diambil lagi
+REFINE_SESSION_LEASE = float(os.getenv("REFINE_SESSION_LEASE", "180"))
+# Panjang maksimum justifikasi/feedback yang disimpan di riwayat
+_HISTORY_TEXT_CHARS = 300
+
+
+class SessionBusy(Exception):
+    """Sesi sedang memproses iterasi lain (di worker mana pun)."""
+
+
+def _clip(text, limit: int = _HISTORY_TEXT_CHARS) -> str:
+    text = str(text if text is not None else "-")
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def summarize_recommendation(recommendation: dict) -> dict:
+    """Ringkasan rekomendasi untuk riwayat dan prompt iterasi (bukan objek lengkap)."""
+    return {
+        "nama_senyawa": recommendation.get("nama_senyawa", "N/A"),
+        "skor_kecocokan": recommendation.get("skor_kecocokan", "N/A"),
+        "justifikasi_ringkas": _clip(recommendation.get("justifikasi_ringkas", "N/A")),
+    }
+
+
+class RefineSession:
+    def __init__(self, id: str, request: dict, context: str, parse_context: str, recommendation: dict,
+                 history: list | None = None, turns: int = 0, created_at: float | None = None,
+                 updated_at: float | None = None, lease: str | None = None):
+        self.id = id
+        self.request = request              # GenerateRequest awal (dict)
+        self.context = context              # Kriteria + kandidat, disusun sekali
+        self.parse_context = parse_context  # Konteks untuk re-ask output parser
+        self.recommendation = recommendation
+        self.history = history or []
+        self.turns = turns
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+        self.lease = lease                  # Token lease jika diambil lewat acquire()
+
+    def record_turn(self, feedback: str, recommendation: dict, history_turns: int = REFINE_HISTORY_TURNS):
+        self.history.append({"feedback": _clip(feedback), **summarize_recommendation(self.recommendation)})
+        self.history = self.history[-history_turns:] if history_turns > 0 else []
+        self.recommendation = recommendation
+        self.turns += 1
+        self.updated_at = time.time()
+
+    def summary(self) -> dict:
+        return {
+            "session_id": self.id,
+            "turns": self.turns,
+            "request": self.request,
+            "current_recommendation": self.recommendation,
+            "history": list(self.history),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+_COLUMNS = "id, request, context, parse_context, recommendation, history, turns, created, accessed"
+
+
+def _from_row(row, lease: str | None = None) -> RefineSession:
+    return RefineSession(
+        id=row[0], request=json.loads(row[1]), context=row[2], parse_context=row[3],
+        recommendation=json.loads(row[4]), history=json.loads(row[5]), turns=row[6],
+        created_at=row[7], updated_at=row[8], lease=lease,
+    )
+
+
+class RefineSessionStore:
+    """Sesi refinement di SQLite (dipakai bersama semua worker) dengan eviction LRU + TTL."""
+
+    def __init__(self, path: str = REFINE_SESSION_DB, max_sessions: int = REFINE_SESSION_MAX,
+                 ttl: float = REFINE_SESSION_TTL, lease: float = REFINE_SESSION_LEASE):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.lease = lease
+        self._lock = threading.Lock()
+        # Penghitung per worker (jumlah sesi aktif dibaca dari database)
+        self._stats = {"created": 0, "expired": 0, "evicted": 0, "turns": 0, "busy": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS refine_sessions ("
+            "id TEXT PRIMARY KEY, request TEXT NOT NULL, context TEXT NOT NULL, parse_context TEXT NOT NULL, "
+            "recommendation TEXT NOT NULL, history TEXT NOT NULL, turns INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL, busy_until REAL, busy_token TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_refine_sessions_accessed ON refine_sessions(accessed)")
+        self._conn.commit()
+
+    def create(self, request: dict, context: str, parse_context: str, recommendation: dict) -> RefineSession:
+        session = RefineSession(uuid.uuid4().hex, request, context, parse_context, recommendation)
+        now = session.created_at
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO refine_sessions ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session.id, json.dumps(request, ensure_ascii=False), context, parse_context,
+                 json.dumps(recommendation, ensure_ascii=False), "[]", 0, now, now)
+            )
+            self._stats["created"] += 1
+            # Buang sesi kedaluwarsa dan sesi LRU yang melebihi batas
+            expired = self._conn.execute("DELETE FROM refine_sessions WHERE accessed < ?", (now - self.ttl,)).rowcount
+            evicted = self._conn.execute(
+                "DELETE FROM refine_sessions WHERE id IN ("
+                "SELECT id FROM refine_sessions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            ).rowcount
+            self._conn.commit()
+            self._stats["expired"] += expired
+            self._stats["evicted"] += evicted
+        return session
+
+    def get(self, session_id: str) -> RefineSession | None:
+        """Mengambil sesi dan memperpanjang TTL-nya; None jika tidak ada/kedaluwarsa."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM refine_sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[8] > self.ttl:
+                self._conn.execute("DELETE FROM refine_sessions WHERE id = ?", (session_id,))
+                self._conn.commit()
+                self._stats["expired"] += 1
+                return None
+            self._conn.execute("UPDATE refine_sessions SET accessed = ? WHERE id = ?", (now, session_id))
+            self._conn.commit()
+        return _from_row(row)
+
+    def acquire(self, session_id: str) -> RefineSession | None:
+        """
+        Mengambil lease iterasi secara atomik (lintas worker). None jika sesi tidak ada/
+        kedaluwarsa; SessionBusy jika iterasi lain sedang berjalan.
+        """
+        if self.get(session_id) is None:
+            return None
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            claimed = self._conn.execute(
+                "UPDATE refine_sessions SET busy_until = ?, busy_token = ?, accessed = ? "
+                "WHERE id = ? AND (busy_until IS NULL OR busy_until < ?)",
+                (now + self.lease, token, now, session_id, now)
+            ).rowcount
+            self._conn.commit()
+            if not claimed:
+                self._stats["busy"] += 1
+                raise SessionBusy(session_id)
+            # Dibaca ulang SETELAH lease: iterasi dari worker lain yang baru selesai ikut terlihat
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM refine_sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return _from_row(row, lease=token) if row else None
+
+    def release(self, session: RefineSession):
+        """Melepas lease (idempoten; lease yang sudah diambil alih request lain tidak disentuh)."""
+        if not session.lease:
+            return
+        with self._lock:
+            self._conn.execute(
+                "UPDATE refine_sessions SET busy_until = NULL, busy_token = NULL WHERE id = ? AND busy_token = ?",
+                (session.id, session.lease)
+            )
+            self._conn.commit()
+        session.lease = None
+
+    def record_turn(self, session: RefineSession, feedback: str, recommendation: dict):
+        """
+        Mencatat iterasi ke database (sesi baru dari /refine atau sesi yang sedang di-lease).
+        Sesi dari acquire() hanya ditulis selama lease-nya masih dipegang: jika iterasi
+        melewati REFINE_SESSION_LEASE dan lease diambil request lain, SessionBusy dilempar
+        dan iterasi ini tidak menimpa riwayat.
+        """
+        session.record_turn(feedback, recommendation)
+        query = "UPDATE refine_sessions SET recommendation = ?, history = ?, turns = ?, accessed = ? WHERE id = ?"
+        params = [json.dumps(recommendation, ensure_ascii=False), json.dumps(session.history, ensure_ascii=False),
+                  session.turns, session.updated_at, session.id]
+        if session.lease:
+            query += " AND busy_token = ?"
+            params.append(session.lease)
+        with self._lock:
+            updated = self._conn.execute(query, params).rowcount
+            self._conn.commit()
+            if session.lease and not updated:
+                self._stats["busy"] += 1
+                raise SessionBusy(session.id)
+            self._stats["turns"] += 1
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM refine_sessions WHERE id = ?", (session_id,)).rowcount
+            self._conn.commit()
+        return bool(deleted)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM refine_sessions WHERE accessed >= ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        active = len(self)
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "active": active,
+                "max_sessions": self.max_sessions,
+                "ttl_s": self.ttl,
+                "history_turns": REFINE_HISTORY_TURNS,
+                **self._stats,
+            }
+
+
+# Instance proses-wide (database dipakai bersama semua worker)
+refine_sessions = RefineSessionStore()
@@ -0,0 +1,254 @@
+# agent/response_cache.py
+"""
+Cache respons LLM untuk /generate, /refine, /combine (dan opsional /ask).
+
+- Kunci: prompt yang dinormalisasi + model + konfigurasi generasi (lihat make_cache_key).
+- Pasangan /combine disimpan tanpa memperhatikan urutan (A+B == B+A).
+- Eviction LRU + TTL yang dibatasi jumlah entri.
+- Backend opsional SQLite di disk (RESPONSE_CACHE_DB) agar bisa dipakai bersama
+  oleh semua worker uvicorn.
+- Opsional: pencocokan kemiripan embedding untuk pertanyaan /ask yang hampir sama.
+- Kunci di-scope dengan stamp versi data (set_generation_source, diisi RAG dengan stamp
+  manifest index): setelah reindex oleh worker mana pun, semua worker berhenti memakai
+  jawaban lama tanpa perlu clear() di setiap proses. Entri lama habis lewat LRU/TTL.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Konfigurasi (bisa di-override lewat environment variables)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # detik
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "")  # kosong = hanya memori
+ASK_SEMANTIC_CACHE = os.getenv("ASK_SEMANTIC_CACHE", "0") == "1"
+ASK_SEMANTIC_THRESHOLD = float(os.getenv("ASK_SEMANTIC_THRESHOLD", "0.95"))
+
+# Respons dengan awalan ini adalah error dan TIDAK boleh di-cache
+_ERROR_PREFIXES = ("API_ERROR", "Error", "Terjadi kesalahan LLM", "Gagal")
+
+
+def normalize_prompt(text: str) -> str:
+    """Menyamakan whitespace dan huruf besar/kecil agar prompt identik menghasilkan kunci sama."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def make_cache_key(prompt: str, model: str, config: dict | None = None) -> str:
+    """Kunci cache dari prompt ternormalisasi + model + konfigurasi generasi."""
+    payload = json.dumps(
+        {"prompt": normalize_prompt(prompt), "model": model, "config": config or {}},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_combine_key(compound_a: str, compound_b: str, model: str, config: dict | None = None) -> str:
+    """Kunci cache /combine yang tidak sensitif urutan: A+B dan B+A menghasilkan kunci sama."""
+    pair = sorted([normalize_prompt(compound_a), normalize_prompt(compound_b)])
+    return make_cache_key("combine::" + "::".join(pair), model, config)
+
+
+def is_cacheable(value: str) -> bool:
+    return bool(value) and not value.startswith(_ERROR_PREFIXES)
+
+
+class _MemoryBackend:
+    """LRU + TTL di memori proses."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if time.time() - created > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _SQLiteBackend:
+    """LRU + TTL di file SQLite, dipakai bersama antar worker (mode WAL)."""
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_accessed ON response_cache(accessed)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE response_cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            # Buang entri kedaluwarsa dan entri LRU yang melebihi batas
+            self._conn.execute("DELETE FROM response_cache WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+
+class ResponseCache:
+    """Cache respons LLM dengan penghitung hit/miss."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 ttl: float = RESPONSE_CACHE_TTL, db_path: str = RESPONSE_CACHE_DB):
+        if db_path:
+            self._backend = _SQLiteBackend(db_path, max_entries, ttl)
+            self.backend_name = "sqlite"
+        else:
+            self._backend = _MemoryBackend(max_entries, ttl)
+            self.backend_name = "memory"
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+
+        # Indeks kemiripan untuk /ask: daftar (vektor ternormalisasi, kunci)
+        self._semantic_entries = []
+        self._semantic_lock = threading.Lock()
+        self._semantic_max = max_entries
+        self._generation_source = None
+
+    def set_generation_source(self, source):
+        """source() -> stamp versi data; kunci cache di-scope dengan stamp ini."""
+        self._generation_source = source
+
+    def _scoped(self, key: str) -> str:
+        if self._generation_source is None:
+            return key
+        return f"{self._generation_source()}:{key}"
+
+    def get(self, key: str, record_miss: bool = True):
+        """Mengambil nilai persis. record_miss=False jika pemanggil masih akan mencoba get_similar()."""
+        value = self._backend.get(self._scoped(key))
+        with self._stats_lock:
+            if value is not None:
+                self.hits += 1
+            elif record_miss:
+                self.misses += 1
+        return value
+
+    def set(self, key: str, value: str):
+        if is_cacheable(value):
+            self._backend.set(self._scoped(key), value)
+
+    # --- Pencocokan semantik (opsional, untuk /ask) ---
+    def get_similar(self, query_vector, threshold: float = ASK_SEMANTIC_THRESHOLD):
+        """Mencari jawaban untuk pertanyaan yang embedding-nya hampir sama (cosine >= threshold)."""
+        import numpy as np
+
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._semantic_lock:
+            entries = list(self._semantic_entries)
+
+        value = None
+        if entries:
+            scores = np.stack([v for v, _ in entries]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                value = self._backend.get(entries[best][1])
+
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.semantic_hits += 1
+                self.hits += 1
+        return value
+
+    def add_similar(self, query_vector, key: str):
+        import numpy as np
+
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._semantic_lock:
+            # Kunci disimpan sudah di-scope: entri dari versi index lama otomatis tidak ketemu
+            self._semantic_entries.append((vector, self._scoped(key)))
+            if len(self._semantic_entries) > self._semantic_max:
+                self._semantic_entries.pop(0)
+
+    def clear(self):
+        self._backend.clear()
+        with self._semantic_lock:
+            self._semantic_entries.clear()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "backend": self.backend_name,
+                "entries": len(self._backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "semantic_hits": self.semantic_hits,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+            }
+
+
+# Instance proses-wide
+response_cache = ResponseCache()
@@ -1,41 +1,317 @@
 # agent/retriever_service.py
+from __future__ import annotations
+
 import os
-from langchain_community.vectorstores import Chroma
-from langchain_core.documents import Document
-from .embedding_service import initialize_embeddings, VECTOR_DB_PATH
+import threading
+import time
+from typing import TYPE_CHECKING
+from .embedding_service import get_shared_embeddings, get_embeddings_load_ms, VECTOR_DB_PATH
+from .index_manifest import check_manifest, index_generation, MANIFEST_MATCH
+from .vector_client import get_vector_client
+from .query_batcher import QueryEmbeddingBatcher
+from .vector_store import open_vector_backend, VECTOR_BACKEND
+from .metrics import timed, observe_stage
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# Jumlah dokumen yang diambil per query
+RETRIEVER_TOP_K = 3
+# Hybrid retrieval: BM25 leksikal (rumus, ID, GHS, sinonim) + vektor, digabung dengan RRF
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))  # Kandidat per peringkat sebelum fusi
+# Fast start: index di-mount tanpa menunggu model embedding; model dimuat di background
+FAST_START = os.getenv("FAST_START", "1") == "1"
+
+# 🔥 STATE RETRIEVER PROSES-WIDE
+# Model embedding dan Vector Store dimuat SEKALI per worker, lalu dipakai bersama
+# oleh RAGEngine.query dan AgentOrchestrator. Saat index dibangun ulang,
+# reload_retriever() membuat instance baru lalu menukar referensinya secara atomik,
+# sehingga query yang sedang berjalan tetap memakai instance lama sampai selesai.
+# Dalam mode layanan bersama (VECTOR_SERVICE_URL), embedding & pencarian diteruskan
+# ke satu proses layanan, dan worker ini tidak memuat model/index sama sekali.
+_retriever = None
+_retriever_generation = None  # index_generation() saat retriever dimuat
+_retriever_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "loaded": False,
+    "load_time_ms": None,
+    "loaded_at": None,
+    "reload_count": 0,
+    "query_count": 0,
+    "query_errors": 0,
+    "query_total_ms": 0.0,
+    "query_max_ms": 0.0,
+    "query_last_ms": None,
+    "exact_hits": 0,       # Query identifier persis: langsung ke record, tanpa vektor
+    "lexical_only": 0,     # Pencarian vektor gagal/kosong, hasil dari BM25 saja
+}
+
+
+def _build_retriever():
+    """Memuat Vector Store dari disk (backend VECTOR_BACKEND: chroma atau flat)."""
 
-def get_retriever():
-    """Memuat Vector Store dan mengembalikannya sebagai Retriever."""
-    
     # Kunci perbaikan: Cek eksistensi folder fisik Vector DB
     if not os.path.exists(VECTOR_DB_PATH):
         # Jika folder tidak ada, RAGEngine pasti gagal, kita lempar error yang jelas
         raise FileNotFoundError(
             f"Vector Database not found at {VECTOR_DB_PATH}. Run ingestion (startup event) first."
         )
-        
-    embeddings = initialize_embeddings()
-    
-    # Memuat Vector Store yang sudah di-persist
-    # KODE INI BERJALAN di setiap worker yang memproses query
-    vectorstore = Chroma(
-        persist_directory=VECTOR_DB_PATH,
-        embedding_function=embeddings
-    )
-    
-    # Mengembalikan sebagai LangChain Retriever
-    return vectorstore.as_retriever(search_kwargs={"k": 3})
+
+    # Memuat Vector Store yang sudah di-persist. Tanpa embedding_function: semua
+    # pencarian memakai vektor dari micro-batcher (search_batch), sehingga mount
+    # index tidak perlu menunggu model MiniLM dimuat.
+    return open_vector_backend()
+
+
+def _load_and_swap():
+    """Membangun retriever baru, mencatat waktu muat, lalu menukarnya secara atomik."""
+    global _retriever, _retriever_generation
+    start = time.perf_counter()
+    generation = index_generation()
+    new_retriever = _build_retriever()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    # Penugasan referensi bersifat atomik; pembaca lama tetap memegang instance lama.
+    _retriever = new_retriever
+    _retriever_generation = generation
+    with _stats_lock:
+        if _stats["loaded"]:
+            _stats["reload_count"] += 1
+        _stats["loaded"] = True
+        _stats["load_time_ms"] = round(elapsed_ms, 2)
+        _stats["loaded_at"] = time.time()
+    print(f"Retriever: Vector Store dimuat dalam {elapsed_ms:.1f} ms.")
+    return new_retriever
+
+
+def get_retriever():
+    """
+    Mengembalikan retriever proses-wide, memuatnya sekali jika belum ada. Jika index
+    dibangun ulang oleh proses lain (manifest berubah), retriever dimuat ulang di sini.
+    """
+    retriever = _retriever
+    if retriever is not None and _retriever_generation == index_generation():
+        return retriever
+
+    with _retriever_lock:
+        # Double-checked: thread lain mungkin sudah memuat saat kita menunggu lock
+        if _retriever is not None and _retriever_generation == index_generation():
+            return _retriever
+        return _load_and_swap()
+
+
+def reload_retriever():
+    """Memuat ulang Vector Store setelah index dibangun ulang (swap atomik)."""
+    with _retriever_lock:
+        return _load_and_swap()
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_query_batcher() -> QueryEmbeddingBatcher:
+    """Micro-batcher proses-wide di depan encoder query (model dimuat saat batch pertama)."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = QueryEmbeddingBatcher(lambda texts: get_shared_embeddings().embed_documents(texts))
+    return _batcher
+
+
+def _warm(startup: dict):
+    """Mount index yang ada (import chromadb) lalu muat & panaskan model embedding."""
+    try:
+        if startup["index_present"]:
+            get_retriever()
+            startup["mount_ms"] = _stats["load_time_ms"]
+        start = time.perf_counter()
+        get_query_batcher().embed("warm-up")
+        startup["model_warmup_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        startup["model_load_ms"] = get_embeddings_load_ms()
+    except Exception as e:
+        startup["warm_up_error"] = str(e)
+        print(f"Retriever: warm-up gagal: {e}")
+
+
+def warm_up(on_stale=None) -> dict:
+    """
+    Startup worker. Mode lokal: cek manifest index (murah: hash dataset), jadwalkan
+    rebuild lewat on_stale(status) jika tidak cocok/belum ada, lalu mount index dan
+    muat model embedding -- di background jika FAST_START, sehingga startup tidak
+    menunggu import chromadb/torch. Query pertama yang datang lebih awal cukup
+    menunggu lock retriever/model yang sedang dimuat.
+    Mode layanan bersama: cukup tunggu layanan siap.
+    Mengembalikan ringkasan waktu startup (untuk /health).
+    """
+    start = time.perf_counter()
+    client = get_vector_client()
+    if client is not None:
+        client.wait_ready()
+        print(f"Retriever: memakai layanan vektor bersama di {client.url}.")
+        return {"mode": "shared_service", "service_wait_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    manifest = check_manifest()
+    startup = {"mode": "local", "fast_start": FAST_START, "manifest": manifest["status"],
+               "manifest_check_ms": manifest["check_ms"], "index_present": os.path.exists(VECTOR_DB_PATH)}
+    if manifest["status"] != MANIFEST_MATCH:
+        print(f"Retriever: manifest index {manifest['status']}, index dibangun ulang.")
+        if on_stale is not None:
+            on_stale(manifest["status"])
+
+    if FAST_START:
+        threading.Thread(target=_warm, args=(startup,), name="retriever-warmup", daemon=True).start()
+    else:
+        _warm(startup)
+    startup["warm_up_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return startup
+
+
+def embed_query(text: str) -> list[float]:
+    """Embedding satu query (model lokal atau layanan vektor bersama)."""
+    client = get_vector_client()
+    if client is not None:
+        return client.embed_queries([text])[0]
+    return get_query_batcher().embed(text)
+
+
+def search_batch(queries: list[str], k: int) -> list[list[Document]]:
+    """
+    Top-k untuk beberapa query. Embedding lewat micro-batcher, sehingga query dari
+    request lain yang datang bersamaan ikut di-embed dalam forward pass yang sama.
+    """
+    backend = get_retriever()
+    with timed("query_embedding", queries=len(queries)):
+        vectors = get_query_batcher().embed_many(queries)
+    with timed("vector_search", backend=VECTOR_BACKEND, k=k):
+        return [backend.similarity_search_by_vector(vector, k=k) for vector in vectors]
+
+
+def _search(user_query: str, k: int) -> list[Document]:
+    client = get_vector_client()
+    if client is not None:
+        with timed("vector_service", k=k):
+            return client.search([user_query], k)[0]
+    return search_batch([user_query], k)[0]
+
+
+def get_retriever_stats() -> dict:
+    """Ringkasan waktu muat dan latensi query retriever untuk endpoint /health."""
+    with _stats_lock:
+        stats = dict(_stats)
+    client = get_vector_client()
+    stats["mode"] = "shared_service" if client is not None else "local"
+    stats["backend"] = VECTOR_BACKEND
+    if client is not None:
+        stats["service_url"] = client.url
+    else:
+        stats["query_batching"] = get_query_batcher().stats()
+    count = stats["query_count"]
+    stats["query_avg_ms"] = round(stats["query_total_ms"] / count, 2) if count else None
+    stats["query_total_ms"] = round(stats["query_total_ms"], 2)
+    return stats
+
+
+def _record_query(elapsed_ms: float, failed: bool = False):
+    observe_stage("retrieval", elapsed_ms, failed=failed)
+    with _stats_lock:
+        _stats["query_count"] += 1
+        _stats["query_total_ms"] += elapsed_ms
+        _stats["query_last_ms"] = round(elapsed_ms, 2)
+        if elapsed_ms > _stats["query_max_ms"]:
+            _stats["query_max_ms"] = round(elapsed_ms, 2)
+        if failed:
+            _stats["query_errors"] += 1
+
+
+def _record_document(record: dict):
+    from langchain_core.documents import Document
+    from .embedding_service import chunk_metadata
+    from .lexical_index import record_text
+    return Document(page_content=record_text(record), metadata=chunk_metadata(record, "deskripsi"))
+
+
+def _count(stat: str):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def hybrid_search(user_query: str, k: int) -> list[Document]:
+    """
+    Identifier persis (mis. "CH4", "CID-297", "methane") -> record langsung.
+    Selain itu: peringkat BM25 dan peringkat vektor digabung dengan reciprocal-rank
+    fusion per senyawa. Senyawa yang ditemukan BM25 memakai teks record lengkap
+    (rumus, sinonim, GHS, deskripsi) sebagai konteks.
+    """
+    from .lexical_index import get_lexical_index, reciprocal_rank_fusion
+
+    index = get_lexical_index()
+    with timed("lexical_search") as span:
+        exact = index.exact_match(user_query, limit=k)
+        span["exact"] = bool(exact)
+        if not exact:
+            lexical_records = {
+                str(record.get("nama_senyawa")): record
+                for record in index.search_records(user_query, HYBRID_CANDIDATES)
+            }
+    if exact:
+        _count("exact_hits")
+        return [_record_document(record) for record in exact]
+
+    try:
+        vector_docs = _search(user_query, HYBRID_CANDIDATES)
+    except Exception as e:
+        if not lexical_records:
+            raise
+        print(f"Retrieval: pencarian vektor gagal ({e}), memakai hasil BM25 saja.")
+        vector_docs = []
+    if not vector_docs and lexical_records:
+        _count("lexical_only")
+
+    vector_by_name = {}
+    for doc in vector_docs:
+        # Chunk terbaik per senyawa saja yang ikut peringkat
+        vector_by_name.setdefault(str(doc.metadata.get("nama_senyawa") or doc.page_content[:80]), doc)
+
+    fused = reciprocal_rank_fusion([list(lexical_records), list(vector_by_name)])
+    return [
+        _record_document(lexical_records[name]) if name in lexical_records else vector_by_name[name]
+        for name in fused[:k]
+    ]
+
 
 def retrieve_documents(user_query: str) -> list[Document]:
     """Mencari dan mengambil dokumen yang relevan."""
+    start = time.perf_counter()
     try:
-        retriever = get_retriever()
-        documents = retriever.invoke(user_query)
+        if HYBRID_RETRIEVAL:
+            documents = hybrid_search(user_query, RETRIEVER_TOP_K)
+        else:
+            documents = _search(user_query, RETRIEVER_TOP_K)
+        _record_query((time.perf_counter() - start) * 1000)
         return documents
     except FileNotFoundError as e:
         print(f"Retrieval Error: {e}")
+        _record_query((time.perf_counter() - start) * 1000, failed=True)
         # Jika file tidak ada, kembalikan list kosong, yang akan ditangkap di generator_service
-        return [] 
+        return []
     except Exception as e:
         print(f"Retrieval Error: An unexpected error occurred: {e}")
-        return []
\ No newline at end of file
+        _record_query((time.perf_counter() - start) * 1000, failed=True)
+        return []
+
+
+def similarity_search(user_query: str, k: int) -> list[Document]:
+    """Top-k dokumen berdasarkan kemiripan vektor (k bebas, untuk seleksi kandidat /generate)."""
+    start = time.perf_counter()
+    try:
+        documents = _search(user_query, k)
+        _record_query((time.perf_counter() - start) * 1000)
+        return documents
+    except Exception as e:
+        print(f"Retrieval Error: similarity search gagal: {e}")
+        _record_query((time.perf_counter() - start) * 1000, failed=True)
+        return []
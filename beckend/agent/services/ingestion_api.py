@@ -1,7 +1,8 @@
 # agent/services/ingestion_api.py
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from ...agent.embedding_service import run_ingestion # Import fungsi dari embedding_service.py
+from typing import Optional
+from ..ingestion_jobs import get_ingestion_queue # Antrian job ingestion di background
 
 router = APIRouter()
 
@@ -9,23 +10,40 @@ router = APIRouter()
 class IngestionResponse(BaseModel):
     status: str
     message: str
+    job_id: Optional[str] = None
+
+class IngestionJobStatus(BaseModel):
+    id: str
+    status: str
+    reason: Optional[str] = None
+    requests: int
+    message: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
 
 @router.post("/ingest", response_model=IngestionResponse)
 def start_ingestion():
     """
     Endpoint untuk memicu proses Data Ingestion secara asinkron (memuat data JSON ke Vector DB).
     
-    Tim FE memanggil endpoint ini sekali untuk menyiapkan data.
+    Tim FE memanggil endpoint ini sekali untuk menyiapkan data, lalu mem-poll
+    /ingest/{job_id} untuk melihat statusnya.
     """
-    print("API: Starting data ingestion process...")
+    print("API: Queueing data ingestion job...")
     
-    # Memanggil fungsi inti ingestion yang ada di embedding_service.py
-    result_message = run_ingestion()
-    
-    # Cek apakah ada pesan error yang dikembalikan
-    if result_message.startswith("Error"):
-        # Mengembalikan status error jika proses gagal
-        return IngestionResponse(status="error", message=result_message)
-    else:
-        # Mengembalikan status success jika berhasil
-        return IngestionResponse(status="success", message=result_message)
\ No newline at end of file
+    # Mendaftarkan job ke antrian background (langsung kembali, tidak menunggu ingestion)
+    job = get_ingestion_queue().submit(reason="ingest")
+    return IngestionResponse(
+        status=job["status"],
+        message="Ingestion dijadwalkan. Cek status di /ingest/{job_id}.",
+        job_id=job["id"]
+    )
+
+@router.get("/ingest/{job_id}", response_model=IngestionJobStatus)
+def get_ingestion_status(job_id: str):
+    """Status job ingestion: queued, running, success, atau error."""
+    job = get_ingestion_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job ingestion '{job_id}' tidak ditemukan.")
+    return IngestionJobStatus(**job)
@@ -0,0 +1,85 @@
+# agent/services/vector_server.py
+"""
+Layanan embedding/retrieval bersama: SATU proses memegang model MiniLM dan index Chroma,
+semua worker uvicorn memanggilnya lewat Unix socket atau loopback.
+
+Menjalankan (lihat start.sh):
+    uvicorn agent.services.vector_server:app --uds /tmp/novel_vector.sock
+    VECTOR_SERVICE_URL=unix:///tmp/novel_vector.sock uvicorn main:app --workers 4
+
+Endpoint menerima batch (texts / queries berupa list) sehingga beberapa query
+di-embed dalam satu forward pass.
+"""
+
+import threading
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from ..vector_client import serve_locally
+
+# Proses ini adalah layanannya sendiri: jangan meneruskan ke VECTOR_SERVICE_URL
+serve_locally()
+
+from ..embedding_service import get_shared_embeddings, run_ingestion
+from ..retriever_service import (
+    get_retriever_stats, reload_retriever, search_batch, warm_up,
+)
+
+app = FastAPI(title="Novel Chemiscal Vector Service")
+startup_stats = {}
+
+
+class EmbedRequest(BaseModel):
+    texts: list[str]
+
+
+class SearchRequest(BaseModel):
+    queries: list[str]
+    k: int = 3
+
+
+def _serialize(doc) -> dict:
+    return {"page_content": doc.page_content, "metadata": doc.metadata}
+
+
+def _rebuild_in_background(status: str):
+    threading.Thread(target=rebuild, name="vector-rebuild", daemon=True).start()
+
+
+@app.on_event("startup")
+def startup_event():
+    try:
+        # Manifest cocok: index langsung di-mount; tidak cocok: rebuild di background
+        startup_stats.update(warm_up(on_stale=_rebuild_in_background))
+        print("✅ Vector service siap (model + index dimuat sekali).")
+    except Exception as e:
+        print(f"❌ Vector service: index belum bisa dimuat: {e}")
+
+
+@app.get("/health")
+def health():
+    return {"status": "healthy", "startup": startup_stats, "retriever": get_retriever_stats()}
+
+
+@app.post("/embed")
+def embed(req: EmbedRequest):
+    # Satu forward pass untuk seluruh batch
+    return {"vectors": get_shared_embeddings().embed_documents(req.texts)}
+
+
+@app.post("/search")
+def search(req: SearchRequest):
+    try:
+        results = search_batch(req.queries, req.k)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"results": [[_serialize(doc) for doc in docs] for docs in results]}
+
+
+@app.post("/rebuild")
+def rebuild():
+    """Ingestion inkremental lalu swap retriever (dipanggil oleh job ingestion di worker API)."""
+    message = run_ingestion()
+    print(f"Vector service: {message}")
+    if not message.startswith("Error"):
+        reload_retriever()
+    return {"message": message}
@@ -0,0 +1,58 @@
+# agent/singleflight.py
+"""
+Request coalescing (single-flight) untuk panggilan async yang identik.
+
+Jika beberapa request dengan kunci yang sama datang bersamaan (mis. satu kelas
+menekan /combine dengan pasangan yang sama), hanya satu panggilan upstream
+(Gemini / retrieval) yang dijalankan; semua request menerima hasil yang sama.
+"""
+
+import asyncio
+import threading
+
+
+class SingleFlight:
+    """Menggabungkan panggilan async yang sedang berjalan berdasarkan kunci."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._stats_lock = threading.Lock()
+        self.calls = 0       # Panggilan upstream yang benar-benar dijalankan
+        self.coalesced = 0   # Request yang menumpang panggilan yang sudah berjalan (= panggilan dihemat)
+
+    async def do(self, key: str, func, *args, **kwargs):
+        """Menjalankan func(*args, **kwargs) sekali per kunci yang sedang in-flight."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._forget(k, _t))
+            with self._stats_lock:
+                self.calls += 1
+        else:
+            with self._stats_lock:
+                self.coalesced += 1
+        # shield: jika satu klien memutus koneksi, panggilan bersama tetap berjalan untuk yang lain
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+            }
+
+
+# Grup proses-wide
+llm_flight = SingleFlight("llm")
+retrieval_flight = SingleFlight("retrieval")
+
+
+def get_singleflight_stats() -> dict:
+    return {group.name: group.stats() for group in (llm_flight, retrieval_flight)}
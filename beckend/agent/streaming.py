@@ -0,0 +1,66 @@
+# agent/streaming.py
+"""
+Utilitas Server-Sent Events (SSE) dan parser JSON parsial untuk endpoint streaming.
+
+PartialJSONParser menerima potongan teks JSON dari LLM sedikit demi sedikit dan
+mengembalikan field top-level yang sudah lengkap (mis. "nama_senyawa"), sehingga
+UI bisa mengisi field lebih awal sebelum seluruh objek selesai.
+"""
+
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def sse_event(event: str, data) -> str:
+    """Memformat satu event SSE (data selalu diserialisasi sebagai JSON satu baris)."""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class PartialJSONParser:
+    """Parser inkremental untuk pasangan key/value top-level dari objek JSON yang sedang di-stream."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self._pos = None  # Posisi setelah pasangan terakhir yang sudah lengkap
+
+    def feed(self, text: str) -> dict:
+        """Menambahkan potongan teks; mengembalikan field yang BARU lengkap pada potongan ini."""
+        self.buffer += text
+        if self._pos is None:
+            start = self.buffer.find("{")
+            if start < 0:
+                return {}
+            self._pos = start + 1
+
+        new_fields = {}
+        while True:
+            pos = self._skip(self._pos, ",")
+            if pos >= len(self.buffer) or self.buffer[pos] != '"':
+                break
+            try:
+                key, pos = _decoder.raw_decode(self.buffer, pos)
+                pos = self._skip(pos)
+                if pos >= len(self.buffer) or self.buffer[pos] != ":":
+                    break
+                pos = self._skip(pos + 1)
+                value, end = _decoder.raw_decode(self.buffer, pos)
+            except json.JSONDecodeError:
+                # Value belum lengkap: tunggu potongan berikutnya
+                break
+            # Angka di ujung buffer mungkin masih berlanjut (mis. "12" -> "123")
+            if end >= len(self.buffer) and not isinstance(value, (str, dict, list)):
+                break
+            self.fields[key] = value
+            new_fields[key] = value
+            self._pos = end
+        return new_fields
+
+    def _skip(self, pos: int, extra: str = "") -> int:
+        chars = _WHITESPACE + extra
+        while pos < len(self.buffer) and self.buffer[pos] in chars:
+            pos += 1
+        return pos
@@ -0,0 +1,118 @@
+# agent/tracing.py
+"""
+Profiler sampling untuk request lambat (opt-in).
+
+Jika TRACE_SAMPLE_RATE > 0, sebagian request (acak, sesuai rate) diberi Trace.
+Setiap tahap yang diukur dengan metrics.timed() selama request itu berjalan
+(termasuk di thread pool lewat asyncio.to_thread, karena contextvars ikut
+disalin) dicatat sebagai span: nama tahap, offset mulai, durasi, thread, atribut.
+
+Trace yang durasinya >= TRACE_SLOW_MS ditulis sebagai satu baris JSON ke
+TRACE_DUMP_PATH dan disimpan di memori (TRACE_KEEP terakhir, lihat /debug/traces).
+Request yang tidak di-sampling tidak menanggung biaya apa pun selain satu
+lookup contextvar per tahap.
+"""
+
+import collections
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+TRACE_DUMP_PATH = os.getenv("TRACE_DUMP_PATH", "traces/slow_requests.jsonl")
+TRACE_KEEP = int(os.getenv("TRACE_KEEP", "50"))
+TRACE_MAX_SPANS = 500  # Batas span per trace (mis. ingestion batch besar)
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_recent = collections.deque(maxlen=TRACE_KEEP)
+_dump_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.dropped_spans = 0
+
+    def add_span(self, stage: str, elapsed_ms: float, started: float | None, attrs: dict):
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped_spans += 1
+            return
+        offset = (started if started is not None else time.perf_counter() - elapsed_ms / 1000) - self.start
+        span = {
+            "stage": stage,
+            "offset_ms": round(offset * 1000, 3),
+            "duration_ms": round(elapsed_ms, 3),
+            "thread": threading.current_thread().name,
+        }
+        if attrs:
+            span["attrs"] = attrs
+        self.spans.append(span)  # list.append atomik: aman dari beberapa thread
+
+
+def start_trace(name: str, sample_rate: float = TRACE_SAMPLE_RATE):
+    """Memulai trace untuk request ini jika ter-sampling. Mengembalikan token untuk finish_trace."""
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        return None
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+
+def record_span(stage: str, elapsed_ms: float, started: float | None = None, attrs: dict | None = None):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(stage, elapsed_ms, started, attrs or {})
+
+
+def finish_trace(handle, **info) -> dict | None:
+    """Menutup trace; di-dump jika lebih lambat dari TRACE_SLOW_MS."""
+    if handle is None:
+        return None
+    trace, token = handle
+    try:
+        _current_trace.reset(token)
+    except ValueError:
+        # Ditutup dari konteks lain (mis. akhir body streaming): trace tetap dicatat
+        pass
+    duration_ms = (time.perf_counter() - trace.start) * 1000
+    if duration_ms < TRACE_SLOW_MS:
+        return None
+    record = {
+        "id": trace.id,
+        "name": trace.name,
+        "started_at": trace.started_at,
+        "duration_ms": round(duration_ms, 3),
+        **info,
+        "spans": sorted(trace.spans, key=lambda span: span["offset_ms"]),
+    }
+    if trace.dropped_spans:
+        record["dropped_spans"] = trace.dropped_spans
+    _recent.append(record)
+    try:
+        with _dump_lock:
+            directory = os.path.dirname(TRACE_DUMP_PATH)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(TRACE_DUMP_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Tracing: gagal menulis trace ke {TRACE_DUMP_PATH}: {e}")
+    print(f"Tracing: request lambat {trace.name} {duration_ms:.0f} ms (trace {trace.id}).")
+    return record
+
+
+def get_recent_traces() -> list[dict]:
+    return list(_recent)
+
+
+def get_tracing_config() -> dict:
+    return {"sample_rate": TRACE_SAMPLE_RATE, "slow_ms": TRACE_SLOW_MS, "dump_path": TRACE_DUMP_PATH,
+            "recent": len(_recent)}
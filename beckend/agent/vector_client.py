@@ -0,0 +1,95 @@
+# agent/vector_client.py
+"""
+Klien untuk layanan embedding/retrieval bersama (agent/services/vector_server.py).
+
+Jika VECTOR_SERVICE_URL di-set, worker API TIDAK memuat MiniLM maupun Chroma sendiri:
+embedding query, pencarian top-k, dan rebuild index diteruskan ke satu proses
+layanan lokal. Memori tetap datar berapa pun jumlah worker uvicorn.
+
+Format URL:
+    unix:///tmp/novel_vector.sock   - Unix domain socket (default di start.sh)
+    http://127.0.0.1:8765           - loopback TCP
+"""
+
+import os
+import threading
+import time
+import httpx
+
+VECTOR_SERVICE_URL = os.getenv("VECTOR_SERVICE_URL", "")
+VECTOR_SERVICE_TIMEOUT = float(os.getenv("VECTOR_SERVICE_TIMEOUT", "30"))
+# Berapa lama worker menunggu layanan siap saat startup (model sedang dimuat)
+VECTOR_SERVICE_STARTUP_TIMEOUT = float(os.getenv("VECTOR_SERVICE_STARTUP_TIMEOUT", "180"))
+
+
+class VectorServiceClient:
+    """Klien HTTP sinkron (dipanggil dari thread pool, sama seperti retrieval lokal)."""
+
+    def __init__(self, url: str, timeout: float = VECTOR_SERVICE_TIMEOUT):
+        self.url = url
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):])
+            self._http = httpx.Client(transport=transport, base_url="http://vector-service", timeout=timeout)
+        else:
+            self._http = httpx.Client(base_url=url.rstrip("/"), timeout=timeout)
+
+    def _post(self, path: str, payload: dict, timeout=httpx.USE_CLIENT_DEFAULT) -> dict:
+        response = self._http.post(path, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def health(self) -> dict:
+        response = self._http.get("/health")
+        response.raise_for_status()
+        return response.json()
+
+    def wait_ready(self, timeout: float = VECTOR_SERVICE_STARTUP_TIMEOUT) -> dict:
+        """Menunggu sampai layanan menjawab /health (dipakai saat startup worker)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.health()
+            except httpx.HTTPError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        return self._post("/embed", {"texts": texts})["vectors"]
+
+    def search(self, queries: list[str], k: int) -> list:
+        """Top-k (list Document per query) untuk beberapa query sekaligus."""
+        from langchain_core.documents import Document
+
+        results = self._post("/search", {"queries": queries, "k": k})["results"]
+        return [
+            [Document(page_content=doc["page_content"], metadata=doc["metadata"]) for doc in docs]
+            for docs in results
+        ]
+
+    def rebuild(self) -> str:
+        # Ingestion bisa memakan waktu lama: tanpa timeout
+        return self._post("/rebuild", {}, timeout=None)["message"]
+
+
+_client = None
+_client_lock = threading.Lock()
+_serve_locally = False
+
+
+def serve_locally():
+    """Dipanggil oleh proses layanan itu sendiri: selalu pakai model & index lokal."""
+    global _serve_locally
+    _serve_locally = True
+
+
+def get_vector_client() -> VectorServiceClient | None:
+    """Klien proses-wide, atau None jika mode layanan bersama tidak aktif."""
+    global _client
+    if not VECTOR_SERVICE_URL or _serve_locally:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = VectorServiceClient(VECTOR_SERVICE_URL)
+    return _client
@@ -0,0 +1,130 @@
+# agent/vector_store.py
+"""
+Backend vector store yang bisa dipilih lewat VECTOR_BACKEND:
+
+- "chroma" (default): Chroma persisten via LangChain (SQLite + HNSW).
+- "flat": indeks datar di dalam proses. Embedding dinormalisasi (float32) disimpan
+  di file yang dibaca lewat np.memmap; top-k eksak = satu perkalian matriks-vektor
+  + np.argpartition. Untuk korpus beberapa ribu chunk ini jauh lebih ringan
+  daripada membuka HNSW Chroma, dan hasilnya eksak (recall 100%).
+
+Chroma tetap menjadi sumber kebenaran untuk ingestion inkremental (diff ID chunk);
+indeks flat adalah snapshot baca-saja yang diekspor dari koleksi Chroma setelah
+setiap ingestion (tanpa embed ulang). Kedua backend punya method yang sama:
+similarity_search_by_vector(vector, k) -> list[Document].
+"""
+
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from .embedding_service import open_vectorstore
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+FLAT_INDEX_PATH = os.getenv("FLAT_INDEX_PATH", "flat_index")
+FLAT_EXPORT_PAGE_SIZE = 1000
+
+
+class FlatIndex:
+    """Top-k eksak (cosine) atas matriks embedding ter-normalisasi yang di-memmap."""
+
+    def __init__(self, path: str = FLAT_INDEX_PATH):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        self.vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r",
+                                 shape=(self.count, self.dim)) if self.count else np.empty((0, self.dim), np.float32)
+        # Offset baris docs.jsonl: teks & metadata dibaca hanya untuk hasil top-k
+        self.offsets = np.fromfile(os.path.join(path, "offsets.i64"), dtype=np.int64)
+        self._docs = open(os.path.join(path, "docs.jsonl"), "rb")
+        self._docs_lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def search(self, vector, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Posisi dan skor cosine top-k, terurut menurun."""
+        if not self.count:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.vectors @ query
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def _read_doc(self, position: int) -> dict:
+        with self._docs_lock:
+            self._docs.seek(int(self.offsets[position]))
+            return json.loads(self._docs.readline())
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs) -> list:
+        from langchain_core.documents import Document
+
+        positions, _ = self.search(embedding, k)
+        docs = [self._read_doc(position) for position in positions]
+        return [Document(page_content=doc["page_content"], metadata=doc["metadata"] or {}) for doc in docs]
+
+
+def export_flat_index(vectorstore=None, path: str = FLAT_INDEX_PATH) -> int:
+    """
+    Mengekspor embedding + dokumen dari koleksi Chroma ke indeks flat (tanpa embed ulang).
+    Ditulis ke folder sementara lalu ditukar; pembaca lama tetap memegang file lamanya.
+    """
+    vectorstore = vectorstore or open_vectorstore()
+    collection = vectorstore._collection
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    count, dim, offsets = 0, None, []
+    with open(os.path.join(tmp_path, "vectors.f32"), "wb") as vectors_file, \
+            open(os.path.join(tmp_path, "docs.jsonl"), "wb") as docs_file:
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                  limit=FLAT_EXPORT_PAGE_SIZE, offset=offset)
+            if not len(page["ids"]):
+                break
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms == 0, 1, norms)
+            dim = embeddings.shape[1]
+            vectors_file.write(embeddings.tobytes())
+            for doc_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                offsets.append(docs_file.tell())
+                line = json.dumps({"id": doc_id, "page_content": text, "metadata": metadata}, ensure_ascii=False)
+                docs_file.write(line.encode("utf-8") + b"\n")
+            count += len(page["ids"])
+            offset += FLAT_EXPORT_PAGE_SIZE
+
+    np.asarray(offsets, dtype=np.int64).tofile(os.path.join(tmp_path, "offsets.i64"))
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"dim": dim or 0, "count": count}, f)
+
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    print(f"Flat index: {count} vektor diekspor ke {path}.")
+    return count
+
+
+def open_vector_backend(backend: str = VECTOR_BACKEND):
+    """Membuka backend terpilih; keduanya menyediakan similarity_search_by_vector."""
+    if backend == "flat":
+        if not os.path.exists(os.path.join(FLAT_INDEX_PATH, "meta.json")):
+            # Belum pernah diekspor (mis. pertama kali pindah backend): ekspor dari Chroma
+            export_flat_index()
+        return FlatIndex(FLAT_INDEX_PATH)
+    if backend != "chroma":
+        raise ValueError(f"VECTOR_BACKEND tidak dikenal: {backend} (pilihan: chroma, flat)")
+    return open_vectorstore()
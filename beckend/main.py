@@ -1,22 +1,60 @@
 # FILE: main.py (KODE LENGKAP DIPERBAIKI DENGAN SEMUA MODEL DI BAGIAN ATAS)
 
-from fastapi import FastAPI, HTTPException
+import time
+_IMPORT_START = time.perf_counter()  # Mengukur waktu import modul (dilaporkan di /health)
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any # Diperlukan untuk typing
 from agent.AgentOrchestrator import AgentOrchestrator
 from agent.rag import RAGEngine
+from agent.retriever_service import get_retriever_stats
+from agent.response_cache import response_cache, make_cache_key, make_combine_key
+from agent.llm import (
+    get_request_signature, astream_llm_response, LLMError, llm_priority, PRIORITY_BULK,
+    rate_limit_headers, get_llm_scheduler_stats, get_context_cache_stats
+)
+from agent.streaming import sse_event, PartialJSONParser
+from agent.output_parser import (
+    aparse_llm_output, parse_json_lenient, validate_output, OutputParseError, get_output_parser_stats,
+    CompoundRecommendation, ReactionSummary, detailed_compound_template
+)
+from agent.batching import iter_bounded, chunked, ndjson_line, BATCH_MAX_ITEMS, COMBINE_PACK_SIZE
+from agent.singleflight import get_singleflight_stats
+from agent.fast_path import get_fast_path_stats
+from agent.lexical_index import get_lexical_index
+from agent.ingestion_jobs import get_ingestion_queue
+from agent.services.ingestion_api import router as ingestion_router
+from agent.compound_store import compound_store, project_fields
+from agent.property_index import get_property_index
+from agent.generator_service import (
+    select_candidates, serialize_candidates, build_candidate_query, record_generation, get_generation_stats
+)
+from agent.metrics import timed, histogram, register_collector, render_prometheus, get_stage_summary
+from agent.tracing import start_trace, finish_trace, get_recent_traces, get_tracing_config
+from agent.refine_sessions import refine_sessions, SessionBusy
+from agent.reaction_store import reaction_store, lookup_reaction
+from agent.combine_prompts import (
+    CombineRequest, create_combine_prompt, create_combine_pack_prompt, parse_packed_reactions
+)
+import asyncio
 import json
 import os
-import re 
 import shutil # Diperlukan untuk Ingestion ulang/Save
-from agent.embedding_service import DATA_FILE_PATH # Untuk menyimpan data ke JSON
+
+IMPORT_MS = round((time.perf_counter() - _IMPORT_START) * 1000, 2)
+startup_timing = {"import_ms": IMPORT_MS}
 
 app = FastAPI(title="ChemisTry Agentic RAG API")
 
 # Definisikan agent dan rag di global scope.
 rag = RAGEngine()
-agent = AgentOrchestrator()
+agent = AgentOrchestrator(rag_engine=rag)
+
+# Endpoint /ingest dan /ingest/{job_id} (antrian ingestion di background)
+app.include_router(ingestion_router)
 
 # === CORS FIX 🔥 ===
 app.add_middleware(
@@ -27,14 +65,144 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# === METRIK & TRACING PER REQUEST 🔥 ===
+HTTP_REQUEST_DURATION = histogram(
+    "http_request_duration_ms", "Durasi request HTTP (ms), sampai body selesai dikirim.",
+    ("method", "path", "status")
+)
+# Endpoint observability sendiri tidak di-trace
+_UNTRACED_PATHS = {"/metrics", "/debug/traces", "/health"}
+
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """
+    Mencatat durasi setiap request ke histogram (label path = template route, bukan URL
+    mentah, agar jumlah seri tetap kecil) dan, jika ter-sampling, trace per tahap.
+    Untuk respons streaming, pengukuran selesai saat body terakhir terkirim.
+    """
+    start = time.perf_counter()
+    handle = None if request.url.path in _UNTRACED_PATHS else start_trace(f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+    except Exception:
+        HTTP_REQUEST_DURATION.observe((time.perf_counter() - start) * 1000,
+                                      method=request.method, path=_route_path(request), status=500)
+        finish_trace(handle, status=500)
+        raise
+    if handle is not None:
+        response.headers["X-Trace-Id"] = handle[0].id
+
+    def finish():
+        HTTP_REQUEST_DURATION.observe((time.perf_counter() - start) * 1000,
+                                      method=request.method, path=_route_path(request), status=response.status_code)
+        finish_trace(handle, status=response.status_code)
+
+    body_iterator = response.body_iterator
+
+    async def observed_body():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            finish()
+
+    response.body_iterator = observed_body()
+    return response
+
+
+def _route_path(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _collect_app_metrics():
+    """Statistik modul yang sudah ada (cache, singleflight, fast path, scheduler, parser) untuk /metrics."""
+    cache = response_cache.stats()
+    yield "response_cache_requests_total", "counter", "Lookup response cache per hasil.", [
+        ({"result": "hit"}, cache["hits"] - cache["semantic_hits"]),
+        ({"result": "semantic_hit"}, cache["semantic_hits"]),
+        ({"result": "miss"}, cache["misses"]),
+    ]
+    flights = get_singleflight_stats()
+    yield "singleflight_calls_total", "counter", "Panggilan upstream yang dijalankan singleflight.", [
+        ({"group": name}, stats["calls"]) for name, stats in flights.items()
+    ]
+    yield "singleflight_coalesced_total", "counter", "Request yang menumpang panggilan yang sedang berjalan.", [
+        ({"group": name}, stats["coalesced"]) for name, stats in flights.items()
+    ]
+    fast_path = get_fast_path_stats()
+    yield "fast_path_queries_total", "counter", "Query /ask yang diperiksa fast path per hasil.", [
+        ({"result": "served"}, fast_path["served"]),
+        ({"result": "passed"}, fast_path["queries"] - fast_path["served"]),
+    ]
+    scheduler = get_llm_scheduler_stats()
+    yield "llm_scheduler_waiting", "gauge", "Request yang sedang antri di scheduler LLM.", [
+        ({"priority": name}, count) for name, count in scheduler["waiting"].items()
+    ]
+    yield "llm_scheduler_admissions_total", "counter", "Hasil admission scheduler LLM per prioritas.", [
+        ({"priority": name, "result": result}, count)
+        for name, counters in scheduler["requests"].items() for result, count in counters.items()
+    ]
+    yield "llm_scheduler_fallbacks_total", "counter", "Panggilan yang dialihkan ke model lain.", [
+        ({}, scheduler["fallbacks"])
+    ]
+    yield "llm_upstream_429_total", "counter", "Balasan 429 dari server Gemini.", [({}, scheduler["upstream_429"])]
+    yield "llm_tokens_available", "gauge", "Sisa token di bucket TPM per model.", [
+        ({"model": name}, model["tokens_available"]) for name, model in scheduler["models"].items()
+    ]
+    parser = get_output_parser_stats()
+    yield "output_parser_total", "counter", "Hasil parsing output JSON LLM.", [
+        ({"result": key}, value) for key, value in parser.items()
+    ]
+    generation = get_generation_stats()
+    yield "generate_prompt_tokens_total", "counter", "Estimasi token prompt /generate.", [
+        ({}, generation["prompt_tokens_total"])
+    ]
+    yield "generate_requests_total", "counter", "Jumlah prompt /generate.", [({}, generation["requests"])]
+    reactions = reaction_store.stats()
+    yield "reaction_lookups_total", "counter", "Lookup /combine sebelum LLM per hasil.", [
+        ({"result": "rule"}, reactions["rule_hits"]),
+        ({"result": "store"}, reactions["hits"]),
+        ({"result": "miss"}, reactions["misses"]),
+    ]
+    yield "reaction_pairs_stored", "gauge", "Pasangan dengan hasil di reaction store.", [
+        ({}, reactions.get("pairs_stored"))
+    ]
+    sessions = refine_sessions.stats()
+    yield "refine_sessions_active", "gauge", "Sesi refine yang tersimpan.", [({}, sessions["active"])]
+    yield "refine_session_turns_total", "counter", "Iterasi refine dalam sesi.", [({}, sessions["turns"])]
+    context_cache = get_context_cache_stats()
+    yield "llm_context_cache_total", "counter", "Context cache Gemini per hasil.", [
+        ({"result": key}, context_cache[key]) for key in ("created", "failed", "used", "invalidated")
+    ]
+
+
+register_collector(_collect_app_metrics)
+
+
 @app.on_event("startup")
 def startup_event():
     print("--- STARTUP EVENT: Memulai Indexing RAG ---")
+    start = time.perf_counter()
+    try:
+        compound_store.load()
+        get_lexical_index()  # Dipakai hybrid retrieval & fast path; dibangun sekali di sini
+    except Exception as e:
+        print(f"❌ CompoundStore error in startup: {e}")
     try:
         rag.index_data() 
         print("✅ RAG Engine initialized successfully via Startup Event")
     except Exception as e:
         print(f"❌ Indexing error in startup: {e}")
+    startup_timing["startup_event_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    print(f"Startup: import {IMPORT_MS} ms, startup event {startup_timing['startup_event_ms']} ms.")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # Penghitung permintaan /combine yang masih di memori
+    reaction_store.flush_counts()
 
 # ====================================================================
 # 🔥 INPUT MODELS (SEMUA MODEL DI SINI UNTUK MENGHINDARI NameError) 🔥
@@ -49,60 +217,92 @@ class GenerateRequest(BaseModel):
     propertiTarget: Dict[str, str] 
     deskripsiKriteria: str | None = ""
 
-class CombineRequest(BaseModel):
-    compound_a: str
-    compound_b: str
+# 🔥 MODEL UNTUK PENCARIAN PROPERTI NUMERIK 🔥
+class PropertyRange(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+class CompoundSearchRequest(BaseModel):
+    # Kunci: titik_didih_celsius, titik_leleh_celsius, densitas_gcm3, berat_molekul
+    ranges: Dict[str, PropertyRange] = {}
+    risk: Optional[str] = None
+    category: Optional[str] = None
+    sort_by: Optional[str] = None
+    limit: int = 50
+    fields: Optional[List[str]] = None
 
 # 🔥 MODEL UNTUK REFINEMENT (ITERASI) 🔥
 class RefineRequest(GenerateRequest):
     currentRecommendation: Dict[str, Any] 
     feedback: str 
+
+# Sesi refine di server: dibuat sekali, lalu setiap iterasi cukup mengirim feedback
+class RefineSessionRequest(GenerateRequest):
+    currentRecommendation: Dict[str, Any]
+
+class RefineFeedbackRequest(BaseModel):
+    feedback: str
 # ====================================================================
 
 
-# --- TEMPLATE SKEMA OUTPUT DETAIL GENERATE (Sesuai skema data Anda) ---
-detailed_compound_template = {
-    "nama_senyawa": "nama_senyawa", "rumus_molekul": "rumus_molekul", "berat_molekul": 0.0,
-    "sinonim": "...", "deskripsi": "Deskripsi LLM yang merangkum properti, risiko, dan kecocokan.",
-    "titik_didih_celsius": 0.0, "titik_leleh_celsius": 0.0, "densitas_gcm3": 0.0,
-    "pernyataan_bahaya_ghs": "...", "kategori_aplikasi": "...",
-    "sifat_fungsional": "...", "tingkat_risiko_keselamatan": "Rendah/Sedang/Tinggi",
-    "bahaya_keselamatan": "...", "ketersediaan_bahan_baku": "Tersedia",
-    "data_unsur_penyusun": [ {"nomor_atom": 0, "nama_unsur": "...", "simbol": "..."}],
-    "skor_kecocokan": 0,
-    "justifikasi_ringkas": "1-2 kalimat mengapa senyawa ini paling cocok dengan kriteria yang diminta."
-}
+# Instruksi + skema JSON /generate & /refine sama untuk semua request: disusun SEKALI per proses
+# dan diletakkan di AWAL prompt, sehingga menjadi prefix stabil yang bisa dikirim lewat
+# context cache Gemini (lihat agent/llm.py) alih-alih di-pretty-print ulang setiap request.
+COMPOUND_PROMPT_PREFIX = f"""
+    Anda adalah seorang Ahli Kimia. Tugas Anda adalah MEREKOMENDASIKAN HANYA SATU senyawa terbaik 
+    dari database Anda yang paling memenuhi kriteria pengguna di bawah. Anda harus mengisi **SEMUA FIELD** JSON.
+    Jika data tidak tersedia, gunakan nilai NULL/0.0/'-'.
+
+    **KELUARAN WAJIB JSON MURNI**
+    Berikan HANYA OBJEK JSON tunggal. Gunakan struktur JSON KETAT berikut:
+    
+    {json.dumps(detailed_compound_template, indent=2)}
+    """
 
-# --- TEMPLATE SKEMA OUTPUT RINGKAS COMBINE ---
-reaction_summary_template = {
-    "reaktan_a": "nama_reaktan_a", "reaktan_b": "nama_reaktan_b", "jenis_reaksi": "Netralisasi/Redoks/Tidak Reaktif",
-    "produk_utama": "Nama produk", "persamaan_stoikiometri": "Persamaan kimia yang seimbang.",
-    "catatan_risiko": "Ringkasan risiko.", "deskripsi_ringkas": "Satu kalimat ringkas menjelaskan hasil."
-}
+_JSON_REMINDER = """
+    Jawab HANYA dengan objek JSON sesuai struktur di atas.
+    """
 
 
 # Helper untuk membuat prompt dari request
-def create_compound_prompt(req: GenerateRequest, feedback: str = None, previous_result: Dict[str, Any] = None):
+def create_request_context(req: GenerateRequest, candidates: List[Dict[str, Any]] = None) -> str:
+    """Kriteria pengguna + kandidat database (bagian prompt yang tetap selama satu sesi /refine)."""
     kriteria_prompt = "\n".join([
         f"- {key}: {value}" for key, value in req.propertiTarget.items()
     ])
     if req.deskripsiKriteria:
         kriteria_prompt += f"\n- Kriteria Tambahan: {req.deskripsiKriteria}"
 
-    prompt = f"""
-    Anda adalah seorang Ahli Kimia. Tugas Anda adalah MEREKOMENDASIKAN HANYA SATU senyawa terbaik 
-    dari database Anda yang paling memenuhi kriteria berikut. Anda harus mengisi **SEMUA FIELD** JSON di bawah ini.
-    Jika data tidak tersedia, gunakan nilai NULL/0.0/'-'.
+    # Kandidat terbaik dari database (vektor + filter properti), diserialisasi ringkas
+    kandidat_prompt = ""
+    if candidates:
+        kandidat_json = serialize_candidates(candidates)
+        kandidat_prompt = f"""
+    KANDIDAT DARI DATABASE (paling relevan dengan kriteria, pilih salah satu dari daftar ini):
+    {kandidat_json}
+    """
 
+    return f"""
     Kriteria Pengguna Awal: {req.jenisProduk}, {req.tujuan}
     Properti Target Awal: {kriteria_prompt}
-    
+    {kandidat_prompt}
     """
-    
-    if previous_result and feedback:
-        # Jika ini adalah iterasi (refinement)
-        prompt += f"""
-        ---
+
+
+def create_refinement_prompt(previous_result: Dict[str, Any], feedback: str, history=()) -> str:
+    """Bagian iterasi refinement: riwayat ringkas (opsional), rekomendasi terakhir, feedback baru."""
+    riwayat_prompt = ""
+    if history:
+        riwayat = "\n".join(
+            f"        {i}. Feedback: {turn['feedback']} -> {turn['nama_senyawa']} (skor {turn['skor_kecocokan']})"
+            for i, turn in enumerate(history, start=1)
+        )
+        riwayat_prompt = f"""
+        RIWAYAT PERBAIKAN SEBELUMNYA (terlama ke terbaru):
+{riwayat}
+        """
+    return f"""
+        ---{riwayat_prompt}
         REKOMENDASI SEBELUMNYA:
         Nama Senyawa: {previous_result.get("nama_senyawa", "N/A")}
         Justifikasi: {previous_result.get("justifikasi_ringkas", "N/A")}
@@ -111,20 +311,72 @@ def create_compound_prompt(req: GenerateRequest, feedback: str = None, previous_
         **PERINTAH PERBAIKAN BARU (FEEDBACK):** {feedback}
         
         Berdasarkan kriteria awal DAN perintah perbaikan di atas, carilah senyawa baru atau modifikasi justifikasi untuk senyawa yang lebih baik.
-        """
+        """ + _JSON_REMINDER
+
+
+def create_compound_prompt(req: GenerateRequest, feedback: str = None, previous_result: Dict[str, Any] = None,
+                           candidates: List[Dict[str, Any]] = None, context: str = None):
+    """
+    Bagian prompt yang spesifik per request. Dikirim ke LLM bersama prefix
+    COMPOUND_PROMPT_PREFIX (argumen prefix= pada aprocess_query/astream_llm_response).
+    """
+    prompt = context if context is not None else create_request_context(req, candidates)
+
+    if previous_result and feedback:
+        # Jika ini adalah iterasi (refinement)
+        prompt += create_refinement_prompt(previous_result, feedback)
     elif feedback:
         # Jika ada feedback langsung di query awal (kasus jarang)
-        prompt += f"\n\n**Perintah Tambahan/Feedback:** {feedback}"
-        
-    prompt += f"""
-    **KELUARAN WAJIB JSON MURNI**
-    Berikan HANYA OBJEK JSON tunggal. Gunakan struktur JSON KETAT berikut:
-    
-    {json.dumps(detailed_compound_template, indent=2)}
-    """
+        prompt += f"\n\n**Perintah Tambahan/Feedback:** {feedback}" + _JSON_REMINDER
+    else:
+        prompt += _JSON_REMINDER
     return prompt
 
 
+def compound_cache_key(prefix: str, query: str) -> str:
+    """Kunci response cache untuk prompt JSON /generate & /refine (prefix + bagian per request)."""
+    model, config = get_request_signature(force_json=True)
+    return make_cache_key(prefix + query, model, config)
+
+
+async def select_generate_candidates(req: GenerateRequest) -> List[Dict[str, Any]]:
+    """Kandidat untuk prompt /generate & /refine (retrieval berjalan di thread pool)."""
+    query_text = build_candidate_query(req.jenisProduk, req.tujuan, req.propertiTarget, req.deskripsiKriteria)
+    return await asyncio.to_thread(select_candidates, query_text, req.propertiTarget)
+
+
+async def build_request_context(req: GenerateRequest, kind: str = "generate") -> tuple[str, int]:
+    """Seleksi kandidat + susun konteks request. Mengembalikan (konteks, jumlah kandidat)."""
+    candidates = await select_generate_candidates(req)
+    with timed("prompt_build", kind=kind, candidates=len(candidates)):
+        return create_request_context(req, candidates), len(candidates)
+
+
+def raise_for_llm_error(result: str):
+    """Pesan error dari lapisan LLM -> HTTPException (429 dengan Retry-After, selain itu 503)."""
+    if result.startswith("API_ERROR_429:"):
+        raise HTTPException(status_code=429, detail=result, headers=rate_limit_headers(result))
+    if result.startswith("API_ERROR:") or result.startswith("Terjadi kesalahan LLM"):
+        raise HTTPException(status_code=503, detail=result)
+
+
+async def parse_llm_json(result_json_str: str, schema, context: str = "", cache_key: str | None = None) -> Dict[str, Any]:
+    """
+    Ekstraksi + perbaikan + validasi output JSON LLM (agent/output_parser.py).
+    Hanya hasil yang lolos validasi yang disimpan ke cache (orchestrator tidak menyimpan
+    respons JSON mentah), dalam bentuk yang sudah diperbaiki agar request berikutnya tidak
+    mengulang perbaikan maupun re-ask.
+    """
+    result, _ = await aparse_llm_output(result_json_str, schema, context=context)
+    if cache_key:
+        response_cache.set(cache_key, json.dumps(result, ensure_ascii=False))
+    return result
+
+
+def _generate_context(req: GenerateRequest) -> str:
+    return f"rekomendasi senyawa untuk {req.jenisProduk}, {req.tujuan}; properti target {json.dumps(req.propertiTarget, ensure_ascii=False)}"
+
+
 @app.get("/")
 def read_root():
     return {
@@ -133,41 +385,77 @@ def read_root():
             "/ask": "POST - Ask questions about compounds (RAG)",
             "/generate": "POST - Generate new compound recommendations (Agent)",
             "/refine": "POST - Refine compound recommendation (Agent Iterative)",
+            "/ask/stream": "POST - Streaming /ask (Server-Sent Events)",
+            "/refine/stream": "POST - Streaming /refine with partial JSON events (Server-Sent Events)",
+            "/refine/session": "POST - Create a refine session from a request + current recommendation",
+            "/refine/{session_id}": "POST - Refine within a session (feedback only); GET/DELETE - session state",
+            "/refine/{session_id}/stream": "POST - Streaming refine within a session (Server-Sent Events)",
             "/combine": "POST - Predict reaction/properties of combined compounds (Agent)",
-            "/save_compound": "POST - Save and index new compound data (Live Update)"
+            "/combine_batch": "POST - Many /combine pairs in one request (NDJSON stream, packed prompts)",
+            "/reactions/popular": "GET - Most requested /combine pairs without a stored result",
+            "/generate_batch": "POST - Many /generate requests in one request (NDJSON stream)",
+            "/save_compound": "POST - Save compound data and queue a background re-index (Live Update)",
+            "/ingest": "POST - Queue a background ingestion job",
+            "/ingest/{job_id}": "GET - Ingestion job status",
+            "/compounds": "GET - Paginated compound list (offset, limit, fields, risk, category)",
+            "/compounds/{nama_senyawa}": "GET - Lookup a single compound",
+            "/search_compounds": "POST - Numeric property range search (boiling point, density, MW, risk)",
+            "/metrics": "GET - Prometheus metrics (per-stage latency, LLM tokens, cache hit rates)",
+            "/debug/traces": "GET - Recent slow-request traces (TRACE_SAMPLE_RATE > 0)"
         }
     }
 
 @app.post("/ask")
-def ask(req: QueryRequest):
+async def ask(req: QueryRequest):
     """Endpoint untuk pertanyaan umum tentang senyawa kimia (RAG Pipeline)"""
     try:
-        result = agent.process_query(req.query) 
+        result = await agent.aprocess_query(req.query)
+        if result.startswith("API_ERROR_429:"):
+            raise HTTPException(status_code=429, detail=result, headers=rate_limit_headers(result))
         return {"answer": result}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # === ENDPOINT /generate (Panggilan Awal) ===
+async def run_generate(req: GenerateRequest, prepared: tuple[str, int] | None = None) -> Dict[str, Any]:
+    """
+    Inti /generate (dipakai juga oleh /generate_batch); error dilempar sebagai HTTPException.
+    prepared: hasil build_request_context jika pemanggil sudah menyusunnya.
+    """
+    # Seleksi kandidat hybrid (vektor + filter properti numerik) sebelum ke LLM
+    context, candidate_count = prepared or await build_request_context(req)
+    query = create_compound_prompt(req, context=context)
+    cache_key = compound_cache_key(COMPOUND_PROMPT_PREFIX, query)
+    start = time.perf_counter()
+    # /generate adalah beban bulk: mengalah pada /ask di scheduler LLM
+    with llm_priority(PRIORITY_BULK):
+        result_json_str = await agent.aprocess_query(query, force_json=True, cache_key=cache_key,
+                                                     prefix=COMPOUND_PROMPT_PREFIX)
+    record_generation(COMPOUND_PROMPT_PREFIX + query, candidate_count, (time.perf_counter() - start) * 1000)
+    
+    # ... (Logika Error Handling dan Ekstraksi JSON)
+    raise_for_llm_error(result_json_str)
+
+    with llm_priority(PRIORITY_BULK):
+        return await parse_llm_json(result_json_str, CompoundRecommendation, _generate_context(req),
+                                    cache_key=cache_key)
+
+
+def _request_fields(req: GenerateRequest) -> Dict[str, Any]:
+    """Field GenerateRequest saja (tanpa currentRecommendation/feedback) untuk disimpan di sesi."""
+    return req.model_dump(include=set(GenerateRequest.model_fields))
+
+
 @app.post("/generate", response_model=Dict[str, Any]) 
-def generate_compound(req: GenerateRequest):
+async def generate_compound(req: GenerateRequest):
     try:
-        query = create_compound_prompt(req)
-        result_json_str = agent.process_query(query, force_json=True) 
-        
-        # ... (Logika Error Handling dan Regex Extraction)
-        if result_json_str.startswith("API_ERROR_429:"):
-             raise HTTPException(status_code=429, detail=result_json_str)
-        if result_json_str.startswith("API_ERROR:") or result_json_str.startswith("Terjadi kesalahan LLM"):
-             raise HTTPException(status_code=503, detail=result_json_str)
-
-        match = re.search(r'\{.*\}', result_json_str, re.DOTALL)
-        if not match:
-             raise json.JSONDecodeError("Tidak ditemukan blok JSON yang valid dalam respons LLM.", result_json_str, 0)
-        
-        json_extracted_str = match.group(0).strip()
-        result_parsed = json.loads(json_extracted_str) 
-
-        return {"success": True, "answer": result_parsed}
+        prepared = await build_request_context(req)
+        result_parsed = await run_generate(req, prepared)
+        # Sesi refine: iterasi berikutnya cukup POST /refine/{session_id} dengan feedback
+        session = refine_sessions.create(_request_fields(req), prepared[0], _generate_context(req), result_parsed)
+        return {"success": True, "answer": result_parsed, "session_id": session.id}
         
     except HTTPException:
         raise
@@ -177,32 +465,36 @@ def generate_compound(req: GenerateRequest):
 
 # 🔥 ENDPOINT BARU: /refine (Iterasi Feedback) 🔥
 @app.post("/refine", response_model=Dict[str, Any])
-def refine_compound(req: RefineRequest):
+async def refine_compound(req: RefineRequest):
+    """
+    Refinement tanpa sesi (request lengkap setiap iterasi). Respons menyertakan session_id;
+    iterasi berikutnya bisa memakai POST /refine/{session_id} yang hanya berisi feedback.
+    """
     try:
         # Gunakan fungsi helper dengan parameter feedback dan previous_result
+        context, _ = await build_request_context(req, kind="refine")
         query = create_compound_prompt(
             req, 
             feedback=req.feedback, 
-            previous_result=req.currentRecommendation
+            previous_result=req.currentRecommendation,
+            context=context
         )
+        cache_key = compound_cache_key(COMPOUND_PROMPT_PREFIX, query)
         
         # Kirim ke LLM untuk regenerasi
-        result_json_str = agent.process_query(query, force_json=True) 
+        result_json_str = await agent.aprocess_query(query, force_json=True, cache_key=cache_key,
+                                                     prefix=COMPOUND_PROMPT_PREFIX)
 
-        # ... (Logika Error Handling dan Regex Extraction)
-        if result_json_str.startswith("API_ERROR_429:"):
-             raise HTTPException(status_code=429, detail=result_json_str)
-        if result_json_str.startswith("API_ERROR:") or result_json_str.startswith("Terjadi kesalahan LLM"):
-             raise HTTPException(status_code=503, detail=result_json_str)
+        # ... (Logika Error Handling dan Ekstraksi JSON)
+        raise_for_llm_error(result_json_str)
 
-        match = re.search(r'\{.*\}', result_json_str, re.DOTALL)
-        if not match:
-             raise json.JSONDecodeError("Tidak ditemukan blok JSON yang valid dalam respons LLM.", result_json_str, 0)
-        
-        json_extracted_str = match.group(0).strip()
-        result_parsed = json.loads(json_extracted_str) 
+        result_parsed = await parse_llm_json(result_json_str, CompoundRecommendation, _generate_context(req),
+                                             cache_key=cache_key)
 
-        return {"success": True, "answer": result_parsed}
+        session = refine_sessions.create(_request_fields(req), context, _generate_context(req),
+                                         req.currentRecommendation)
+        refine_sessions.record_turn(session, req.feedback, result_parsed)
+        return {"success": True, "answer": result_parsed, "session_id": session.id}
         
     except HTTPException:
         raise
@@ -210,95 +502,270 @@ def refine_compound(req: RefineRequest):
         raise HTTPException(status_code=500, detail=f"Internal Server Error (/refine): {str(e)}")
 
 
+# 🔥 ENDPOINT STREAMING (SSE): /ask/stream dan /refine/stream 🔥
+# Non-streaming /ask dan /refine tetap bekerja seperti sebelumnya.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.post("/ask/stream")
+async def ask_stream(req: QueryRequest):
+    """
+    Versi streaming /ask. Event SSE:
+    token {"text"}, reset {"reason"}, done {"answer"}, error {"status_code", "detail", "retry_after"}.
+    """
+    async def event_stream():
+        parts = []
+        try:
+            async for event, data in agent.astream_query(req.query):
+                if event == "reset":
+                    parts = []
+                    yield sse_event("reset", {"reason": data})
+                else:
+                    parts.append(data)
+                    yield sse_event("token", {"text": data})
+            yield sse_event("done", {"answer": "".join(parts)})
+        except LLMError as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.message, "retry_after": e.retry_after})
+        except Exception as e:
+            yield sse_event("error", {"status_code": 500, "detail": str(e)})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def refine_events(prefix: str, query: str, parse_context: str, endpoint: str, on_result=None):
+    """
+    Event SSE refinement (mode JSON): partial {field: value} setiap kali field top-level
+    selesai, lalu done {"success", "answer", ...} atau error {"status_code", "detail", "retry_after"}.
+    on_result(result) -> dict tambahan untuk event done (mis. mencatat iterasi sesi).
+    """
+    cache_key = compound_cache_key(prefix, query)
+    parser = PartialJSONParser()
+    result_json_str = response_cache.get(cache_key)
+    try:
+        if result_json_str is None:
+            async for text in astream_llm_response(query, force_json=True, prefix=prefix):
+                new_fields = parser.feed(text)
+                if new_fields:
+                    yield sse_event("partial", new_fields)
+            result_json_str = parser.buffer
+        else:
+            yield sse_event("partial", parser.feed(result_json_str))
+
+        result_parsed = await parse_llm_json(result_json_str, CompoundRecommendation, parse_context)
+        response_cache.set(cache_key, json.dumps(result_parsed, ensure_ascii=False))
+        extra = on_result(result_parsed) if on_result else {}
+        yield sse_event("done", {"success": True, "answer": result_parsed, **(extra or {})})
+    except LLMError as e:
+        yield sse_event("error", {"status_code": e.status_code, "detail": e.message, "retry_after": e.retry_after})
+    except SessionBusy as e:
+        yield sse_event("error", {"status_code": 409, "detail": _session_busy(str(e)).detail})
+    except Exception as e:
+        yield sse_event("error", {"status_code": 500, "detail": f"Internal Server Error ({endpoint}): {str(e)}"})
+
+
+@app.post("/refine/stream")
+async def refine_stream(req: RefineRequest):
+    """
+    Versi streaming /refine (mode JSON). Event SSE:
+    partial {field: value} setiap kali field top-level selesai (mis. nama_senyawa),
+    done {"success", "answer", "session_id"}, error {"status_code", "detail", "retry_after"}.
+    """
+    context, _ = await build_request_context(req, kind="refine")
+    query = create_compound_prompt(
+        req,
+        feedback=req.feedback,
+        previous_result=req.currentRecommendation,
+        context=context
+    )
+
+    def on_result(result_parsed):
+        session = refine_sessions.create(_request_fields(req), context, _generate_context(req),
+                                         req.currentRecommendation)
+        refine_sessions.record_turn(session, req.feedback, result_parsed)
+        return {"session_id": session.id}
+
+    return StreamingResponse(
+        refine_events(COMPOUND_PROMPT_PREFIX, query, _generate_context(req), "/refine/stream", on_result),
+        media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+# 🔥 SESI REFINE: konteks request disimpan di server, klien hanya mengirim feedback baru 🔥
+def _session_busy(session_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Sesi refine '{session_id}' sedang memproses iterasi lain. Coba lagi setelah selesai."
+    )
+
+
+def _get_refine_session(session_id: str, acquire: bool = False):
+    """Sesi dari store bersama; acquire=True mengambil lease iterasi (409 jika sedang dipakai)."""
+    try:
+        session = refine_sessions.acquire(session_id) if acquire else refine_sessions.get(session_id)
+    except SessionBusy:
+        raise _session_busy(session_id)
+    if session is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Sesi refine '{session_id}' tidak ditemukan atau sudah kedaluwarsa. "
+                   "Mulai sesi baru lewat /generate, /refine atau /refine/session."
+        )
+    return session
+
+
+def _session_prompt(session, feedback: str) -> tuple[str, str]:
+    """(prefix, query): prefix = instruksi/skema + konteks sesi (stabil antar iterasi)."""
+    prefix = COMPOUND_PROMPT_PREFIX + session.context
+    return prefix, create_refinement_prompt(session.recommendation, feedback, session.history)
+
+
+@app.post("/refine/session", response_model=Dict[str, Any])
+async def create_refine_session(req: RefineSessionRequest):
+    """Membuat sesi refine dari request awal + rekomendasi yang sudah ada (tanpa panggilan LLM)."""
+    context, _ = await build_request_context(req, kind="refine")
+    session = refine_sessions.create(_request_fields(req), context, _generate_context(req),
+                                     req.currentRecommendation)
+    return {"success": True, "session_id": session.id, "ttl_s": refine_sessions.ttl}
+
+
+@app.get("/refine/{session_id}", response_model=Dict[str, Any])
+def get_refine_session(session_id: str):
+    return _get_refine_session(session_id).summary()
+
+
+@app.delete("/refine/{session_id}", response_model=Dict[str, Any])
+def delete_refine_session(session_id: str):
+    if not refine_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Sesi refine '{session_id}' tidak ditemukan.")
+    return {"success": True}
+
+
+@app.post("/refine/{session_id}", response_model=Dict[str, Any])
+async def refine_session_turn(session_id: str, req: RefineFeedbackRequest):
+    """Satu iterasi refinement dalam sesi: hanya feedback baru yang dikirim klien."""
+    session = _get_refine_session(session_id, acquire=True)
+    try:
+        prefix, query = _session_prompt(session, req.feedback)
+        cache_key = compound_cache_key(prefix, query)
+        result_json_str = await agent.aprocess_query(query, force_json=True, cache_key=cache_key, prefix=prefix)
+        raise_for_llm_error(result_json_str)
+        result_parsed = await parse_llm_json(result_json_str, CompoundRecommendation, session.parse_context,
+                                             cache_key=cache_key)
+        refine_sessions.record_turn(session, req.feedback, result_parsed)
+        return {"success": True, "answer": result_parsed, "session_id": session.id, "turn": session.turns}
+    except HTTPException:
+        raise
+    except SessionBusy:
+        # Lease kedaluwarsa dan diambil iterasi lain: hasil ini tidak dicatat
+        raise _session_busy(session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal Server Error (/refine/{{session_id}}): {str(e)}")
+    finally:
+        refine_sessions.release(session)
+
+
+@app.post("/refine/{session_id}/stream")
+async def refine_session_stream(session_id: str, req: RefineFeedbackRequest):
+    """
+    Versi streaming iterasi sesi (event sama dengan /refine/stream, done berisi session_id dan turn).
+    Sesi yang tidak ada tetap dijawab 404; lease diambil DI DALAM stream (sesi sibuk -> event
+    error 409), sehingga klien yang putus sebelum body dimulai tidak meninggalkan lease.
+    """
+    _get_refine_session(session_id)
+
+    async def event_stream():
+        try:
+            session = _get_refine_session(session_id, acquire=True)
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+            return
+        try:
+            prefix, query = _session_prompt(session, req.feedback)
+
+            def on_result(result_parsed):
+                refine_sessions.record_turn(session, req.feedback, result_parsed)
+                return {"session_id": session.id, "turn": session.turns}
+
+            async for event in refine_events(prefix, query, session.parse_context, "/refine/{session_id}/stream",
+                                             on_result):
+                yield event
+        finally:
+            # Juga saat klien memutus stream di tengah jalan
+            refine_sessions.release(session)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 # 🔥 ENDPOINT BARU: /save_compound (Life Update Database) 🔥
 @app.post("/save_compound", response_model=Dict[str, str])
 async def save_compound(compound_data: Dict[str, Any]):
     """
     Endpoint untuk menyimpan hasil JSON rekomendasi ke file database, lalu 
-    memicu ingestion ulang (update live RAG).
+    menjadwalkan ingestion ulang (update live RAG) di background.
+
+    Respons langsung kembali dengan job_id; status re-index bisa di-poll di /ingest/{job_id}.
     """
     try:
-        # 1. Load data yang sudah ada
-        with open(DATA_FILE_PATH, 'r', encoding='utf-8') as f:
-            data_list = json.load(f)
-
-        # 2. Tambahkan data senyawa baru
-        compound_id = compound_data.get("nama_senyawa", "New_Compound_" + str(len(data_list)))
+        # 1. Tambahkan data senyawa baru
+        compound_id = compound_data.get("nama_senyawa", "New_Compound_" + str(compound_store.count()))
         compound_data["id"] = compound_id 
-        data_list.append(compound_data)
 
-        # 3. Tulis kembali seluruh data ke file JSON
-        with open(DATA_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data_list, f, indent=2, ensure_ascii=False)
+        # 2. Simpan lewat log append-only CompoundStore (tanpa menulis ulang seluruh file JSON)
+        await asyncio.to_thread(compound_store.add, compound_data)
         
-        # 4. 🔥 PICU INGENTION ULANG (Live Update RAG) 🔥
-        print("API: Memicu re-indexing RAG untuk live update...")
-        rag.index_data()
+        # 3. 🔥 JADWALKAN INGESTION ULANG (Live Update RAG, di-debounce) 🔥
+        print("API: Menjadwalkan re-indexing RAG untuk live update...")
+        job = get_ingestion_queue().submit(reason=f"save_compound:{compound_id}")
         
-        return {"status": "success", "message": f"Senyawa '{compound_id}' berhasil disimpan ke database dan RAG diupdate secara live."}
+        return {
+            "status": "success",
+            "message": f"Senyawa '{compound_id}' berhasil disimpan ke database. RAG sedang diupdate di background.",
+            "job_id": job["id"],
+        }
         
     except Exception as e:
-        # Jika terjadi error saat write file atau ingestion
+        # Jika terjadi error saat write file atau penjadwalan ingestion
         raise HTTPException(status_code=500, detail=f"Gagal menyimpan atau mengindeks ulang data: {str(e)}")
 
 
 # === ENDPOINT /combine (FIX JSON) ===
-@app.post("/combine", response_model=dict)
-def combine_compounds(req: CombineRequest):
-    """Endpoint untuk memprediksi hasil penggabungan dua senyawa."""
+def _store_reaction(compound_a: str, compound_b: str, result: Dict[str, Any], model: str):
+    """reaction_store.put yang tidak menggagalkan request (hasil LLM tetap dikirim ke klien)."""
+    try:
+        reaction_store.put(compound_a, compound_b, result, "llm", model)
+    except Exception as e:
+        print(f"Reaction store gagal menyimpan {compound_a} + {compound_b}: {e}")
+
+
+async def run_combine(req: CombineRequest) -> Dict[str, Any]:
+    """Inti /combine (dipakai juga oleh /combine_batch); error dilempar sebagai HTTPException."""
     result_json_str = "Error: LLM not called."
-    json_extracted_str = ""
     
     try:
         # 1. & 2. Buat Query Reaksi dan Proses dengan agent
-        query = f"""
-        Anda adalah ahli kimia. Analisis interaksi antara senyawa: {req.compound_a} dan {req.compound_b}.
+        query = create_combine_prompt(req.compound_a, req.compound_b)
         
-        Tentukan: jenis reaksi, produk utama, persamaan stoikiometri, dan risiko.
-
-        **KELUARAN WAJIB JSON MURNI**
-        Berikan HANYA respons JSON, tidak ada teks pengantar atau penutup.
-        Struktur output JSON harus KETAT sesuai dengan skema:
-        {json.dumps(reaction_summary_template, indent=2)}
-        """
-        
-        result_json_str = agent.process_query(query, force_json=True)
+        # Kunci cache tidak sensitif urutan: A+B dan B+A memakai entri yang sama
+        model, config = get_request_signature(force_json=True)
+        cache_key = make_combine_key(req.compound_a, req.compound_b, model, config)
+        result_json_str = await agent.aprocess_query(query, force_json=True, cache_key=cache_key)
 
         # 🔥 PERBAIKAN CHECK 1: Deteksi API Error (SEBELUM parsing JSON)
-        if result_json_str.startswith("API_ERROR_429:"):
-             raise HTTPException(
-                 status_code=429, 
-                 detail=result_json_str
-             )
-        if result_json_str.startswith("API_ERROR:") or result_json_str.startswith("Terjadi kesalahan LLM"):
-             raise HTTPException(
-                 status_code=503, 
-                 detail=result_json_str
-             )
-        
-        # 3. Ekstraksi JSON MURNI menggunakan Regex
-        match = re.search(r'\{.*\}', result_json_str, re.DOTALL)
-        
-        if not match:
-             raise json.JSONDecodeError("Tidak ditemukan blok JSON yang valid dalam respons LLM.", result_json_str, 0)
+        raise_for_llm_error(result_json_str)
         
-        json_extracted_str = match.group(0).strip()
-        
-        # 4. Parsing dan kembalikan JSON
-        result_parsed = json.loads(json_extracted_str) 
-
-        return {
-            "success": True,
-            "result": result_parsed 
-        }
+        # 3. & 4. Ekstraksi, perbaikan, dan validasi JSON (re-ask hanya untuk field yang kurang)
+        context = f"reaksi antara {req.compound_a} dan {req.compound_b}"
+        result_parsed = await parse_llm_json(result_json_str, ReactionSummary, context, cache_key=cache_key)
+        # Disimpan persisten per pasangan (tanpa TTL, dipakai bersama semua worker)
+        await asyncio.to_thread(_store_reaction, req.compound_a, req.compound_b, result_parsed, model)
+        return result_parsed
         
     except HTTPException:
         raise
         
-    except json.JSONDecodeError as e:
-        # Logging error 500 jika parsing (setelah regex) masih gagal
+    except OutputParseError as e:
+        # Logging error 500 jika parsing (setelah perbaikan & re-ask) masih gagal
         raw_start = result_json_str.strip()[:100] if result_json_str.strip() else "[Empty Response]"
-        extracted_start = json_extracted_str[:100] if 'json_extracted_str' in locals() and json_extracted_str else "[Extraction Failed]"
+        extracted_start = e.extracted[:100] if e.extracted else "[Extraction Failed]"
         
         raise HTTPException(
             status_code=500, 
@@ -307,19 +774,280 @@ def combine_compounds(req: CombineRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
+
+def _lookup_or_llm(compound_a: str, compound_b: str) -> tuple[Dict[str, Any], str] | None:
+    """lookup_reaction yang tidak pernah menggagalkan request: error (mis. SQLite terkunci) -> jalur LLM."""
+    try:
+        return lookup_reaction(compound_a, compound_b)
+    except Exception as e:
+        print(f"Reaction lookup gagal untuk {compound_a} + {compound_b}: {e}. Lanjut ke LLM.")
+        return None
+
+
+async def lookup_precomputed_reaction(req: CombineRequest) -> tuple[Dict[str, Any], str] | None:
+    """Pre-classifier aturan + reaction store (tanpa LLM); None = perlu analisis LLM."""
+    with timed("reaction_lookup"):
+        return await asyncio.to_thread(_lookup_or_llm, req.compound_a, req.compound_b)
+
+
+@app.post("/combine", response_model=dict)
+async def combine_compounds(req: CombineRequest):
+    """
+    Endpoint untuk memprediksi hasil penggabungan dua senyawa.
+    source: "rule" (pre-classifier aturan), "store" (reaction store) atau "llm".
+    """
+    precomputed = await lookup_precomputed_reaction(req)
+    if precomputed is not None:
+        result_parsed, source = precomputed
+    else:
+        result_parsed, source = await run_combine(req), "llm"
+    return {
+        "success": True,
+        "result": result_parsed,
+        "source": source
+    }
+
+
+@app.get("/reactions/popular", response_model=Dict[str, Any])
+def popular_reactions(limit: int = 50):
+    """Pasangan /combine paling sering diminta yang belum punya hasil tersimpan (kandidat precompute)."""
+    pairs = reaction_store.popular_pending(max(1, min(limit, 500)))
+    return {"items": [{"compound_a": a, "compound_b": b, "requests": requests} for a, b, requests in pairs]}
+
+
+# 🔥 ENDPOINT BATCH: /combine_batch dan /generate_batch (NDJSON) 🔥
+# Body berupa list request; setiap baris respons adalah hasil satu item (urutan selesai,
+# bukan urutan input; cocokkan lewat "index"). Error per item tidak menggagalkan batch.
+# Baris terakhir: {"done": true, "total", "succeeded", "failed", ...}.
+NDJSON_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _batch_error(index: int, error: Exception) -> Dict[str, Any]:
+    line = {"index": index, "success": False}
+    if isinstance(error, HTTPException):
+        line.update(status_code=error.status_code, error=error.detail)
+        retry_after = (error.headers or {}).get("Retry-After")
+        if retry_after:
+            line["retry_after"] = int(retry_after)
+    else:
+        line.update(status_code=500, error=f"Internal Server Error: {str(error)}")
+    return line
+
+
+def _check_batch_size(items: list):
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch kosong.")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch terlalu besar ({len(items)} item, maksimal {BATCH_MAX_ITEMS}).")
+
+
+@app.post("/combine_batch")
+async def combine_batch(reqs: List[CombineRequest]):
+    """
+    Analisis banyak pasangan sekaligus. Pasangan yang terjawab pre-classifier aturan,
+    reaction store, atau cache langsung dikirim; sisanya (unik, tidak sensitif urutan) dipaket COMBINE_PACK_SIZE per prompt
+    JSON, dijalankan dengan konkurensi terbatas (prioritas bulk). Pasangan yang tidak
+    terjawab di respons paket dijalankan ulang sendiri-sendiri lewat jalur /combine.
+    """
+    _check_batch_size(reqs)
+    model, config = get_request_signature(force_json=True)
+
+    cached_lines = []
+    pending: Dict[str, List[int]] = {}  # kunci cache -> index item (pasangan duplikat digabung)
+    with timed("reaction_lookup", pairs=len(reqs)):
+        precomputed = await asyncio.to_thread(
+            lambda: [_lookup_or_llm(pair.compound_a, pair.compound_b) for pair in reqs]
+        )
+    for index, pair in enumerate(reqs):
+        if precomputed[index] is not None:
+            result, source = precomputed[index]
+            cached_lines.append({"index": index, "success": True, "source": source, "result": result})
+            continue
+        key = make_combine_key(pair.compound_a, pair.compound_b, model, config)
+        cached = response_cache.get(key)
+        if cached:
+            try:
+                result, invalid = validate_output(parse_json_lenient(cached)[0], ReactionSummary)
+            except OutputParseError:
+                result, invalid = None, ["*"]
+            if not invalid:
+                cached_lines.append({"index": index, "success": True, "source": "cache", "result": result})
+                continue
+        pending.setdefault(key, []).append(index)
+
+    llm_prompts = 0
+
+    async def run_pack(keys: List[str]) -> List[tuple]:
+        nonlocal llm_prompts
+        outcomes = []
+        with llm_priority(PRIORITY_BULK):
+            packed = {}
+            if len(keys) > 1:
+                llm_prompts += 1
+                pairs = [reqs[pending[key][0]] for key in keys]
+                result_json_str = await agent.aprocess_query(create_combine_pack_prompt(pairs), force_json=True)
+                try:
+                    # 429/503 upstream: error untuk seluruh paket, tanpa fallback per pasangan
+                    # (fallback hanya menambah panggilan gagal ke Gemini yang sedang bermasalah)
+                    raise_for_llm_error(result_json_str)
+                except HTTPException as error:
+                    return [(key, error, "packed") for key in keys]
+                packed = parse_packed_reactions(result_json_str, len(keys))
+            for position, key in enumerate(keys):
+                if position in packed:
+                    # Disimpan per pasangan: /combine berikutnya untuk pasangan ini langsung cache hit
+                    response_cache.set(key, json.dumps(packed[position], ensure_ascii=False))
+                    pair = reqs[pending[key][0]]
+                    await asyncio.to_thread(_store_reaction, pair.compound_a, pair.compound_b, packed[position], model)
+                    outcomes.append((key, packed[position], "packed"))
+                    continue
+                llm_prompts += 1
+                try:
+                    outcomes.append((key, await run_combine(reqs[pending[key][0]]), "single"))
+                except Exception as e:
+                    outcomes.append((key, e, "single"))
+        return outcomes
+
+    packs = chunked(list(pending), COMBINE_PACK_SIZE)
+
+    async def event_stream():
+        succeeded = failed = 0
+        for line in cached_lines:
+            succeeded += 1
+            yield ndjson_line(line)
+        async for outcomes in iter_bounded([lambda keys=keys: run_pack(keys) for keys in packs]):
+            if isinstance(outcomes, Exception):
+                # Tidak terduga (bukan error per item): laporkan sebagai baris error tanpa index
+                failed += 1
+                yield ndjson_line(_batch_error(-1, outcomes))
+                continue
+            for key, result, source in outcomes:
+                for index in pending[key]:
+                    if isinstance(result, Exception):
+                        failed += 1
+                        yield ndjson_line(_batch_error(index, result))
+                    else:
+                        succeeded += 1
+                        yield ndjson_line({"index": index, "success": True, "source": source, "result": result})
+        yield ndjson_line({"done": True, "total": len(reqs), "succeeded": succeeded, "failed": failed,
+                           "cached": len(cached_lines), "llm_prompts": llm_prompts})
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson", headers=NDJSON_HEADERS)
+
+
+@app.post("/generate_batch")
+async def generate_batch(reqs: List[GenerateRequest]):
+    """
+    Rekomendasi untuk banyak kriteria sekaligus. Setiap item punya kandidat dan prompt
+    besar sendiri (tidak dipaket), jadi dijalankan lewat jalur /generate dengan
+    konkurensi terbatas; hasil dikirim per item begitu selesai.
+    """
+    _check_batch_size(reqs)
+
+    async def run_item(index: int):
+        try:
+            return {"index": index, "success": True, "answer": await run_generate(reqs[index])}
+        except Exception as e:
+            return _batch_error(index, e)
+
+    async def event_stream():
+        succeeded = failed = 0
+        async for line in iter_bounded([lambda index=index: run_item(index) for index in range(len(reqs))]):
+            if line["success"]:
+                succeeded += 1
+            else:
+                failed += 1
+            yield ndjson_line(line)
+        yield ndjson_line({"done": True, "total": len(reqs), "succeeded": succeeded, "failed": failed})
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson", headers=NDJSON_HEADERS)
+
 @app.get("/health")
 def health_check():
     # Cek status RAG
-    return {"status": "healthy", "rag_initialized": rag.is_indexed}
+    return {
+        "status": "healthy",
+        "rag_initialized": rag.is_indexed or get_retriever_stats()["loaded"],
+        "startup": {**startup_timing, **rag.startup_stats},
+        "retriever": get_retriever_stats(),
+        "response_cache": response_cache.stats(),
+        "generation": get_generation_stats(),
+        "singleflight": get_singleflight_stats(),
+        "fast_path": get_fast_path_stats(),
+        "llm_scheduler": get_llm_scheduler_stats(),
+        "output_parser": get_output_parser_stats(),
+        "refine_sessions": refine_sessions.stats(),
+        "reaction_store": reaction_store.stats(),
+        "context_cache": get_context_cache_stats(),
+        "stages": get_stage_summary(),
+        "tracing": get_tracing_config(),
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Metrik dalam format teks Prometheus (untuk di-scrape)."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/traces")
+def debug_traces():
+    """Trace request lambat terakhir (hanya terisi jika TRACE_SAMPLE_RATE > 0)."""
+    return {"config": get_tracing_config(), "traces": get_recent_traces()}
 
 @app.get("/get_all_compounds")
-def get_all_compounds():
-    """Endpoint untuk mendapatkan semua data senyawa dari database."""
+def get_all_compounds(offset: int = 0, limit: Optional[int] = None, fields: Optional[str] = None):
+    """
+    Endpoint untuk mendapatkan semua data senyawa dari database.
+
+    Tanpa parameter, mengembalikan seluruh list seperti sebelumnya. Opsional:
+    offset/limit untuk paginasi dan fields (dipisah koma) untuk field projection.
+    """
     try:
-        with open(DATA_FILE_PATH, 'r', encoding='utf-8') as f:
-            data_list = json.load(f)
+        data_list = compound_store.all()
+        if offset or limit is not None:
+            data_list = data_list[offset:offset + limit if limit is not None else None]
+        if fields:
+            field_list = [f.strip() for f in fields.split(",") if f.strip()]
+            data_list = [project_fields(item, field_list) for item in data_list]
         return data_list
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Database senyawa tidak ditemukan.")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Gagal memuat data: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Gagal memuat data: {str(e)}")
+
+@app.get("/compounds")
+def list_compounds(offset: int = 0, limit: int = 50, fields: Optional[str] = None,
+                   risk: Optional[str] = None, category: Optional[str] = None):
+    """Daftar senyawa terpaginasi (dengan total), opsional difilter risiko/kategori."""
+    try:
+        field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        return compound_store.page(offset=offset, limit=min(limit, 500), fields=field_list,
+                                   risk=risk, category=category)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Database senyawa tidak ditemukan.")
+
+@app.post("/search_compounds")
+def search_compounds(req: CompoundSearchRequest):
+    """
+    Pencarian senyawa berdasarkan rentang properti numerik (mis. titik didih > 150,
+    densitas < 1.2) ditambah filter risiko/kategori. Dilayani indeks kolumnar NumPy.
+    """
+    try:
+        index = get_property_index()
+        ranges = {field: (r.min, r.max) for field, r in req.ranges.items()}
+        positions = index.search(ranges, risk=req.risk, category=req.category, sort_by=req.sort_by)
+        items = [project_fields(index.records[i], req.fields) for i in positions[:max(req.limit, 0)]]
+        return {"total": len(positions), "items": items}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Database senyawa tidak ditemukan.")
+
+@app.get("/compounds/{nama_senyawa}")
+def get_compound(nama_senyawa: str):
+    """Lookup satu senyawa berdasarkan nama_senyawa, rumus_molekul, atau sinonim."""
+    compound = (compound_store.get(nama_senyawa)
+                or next(iter(compound_store.find_by_formula(nama_senyawa)), None)
+                or next(iter(compound_store.find_by_synonym(nama_senyawa)), None))
+    if compound is None:
+        raise HTTPException(status_code=404, detail=f"Senyawa '{nama_senyawa}' tidak ditemukan.")
+    return compound
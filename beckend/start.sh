@@ -0,0 +1,17 @@
+#!/bin/sh
+# Menjalankan API dengan beberapa worker uvicorn.
+# Default: satu layanan vektor bersama (model MiniLM + Chroma dimuat sekali) di Unix socket,
+# semua worker memanggilnya lewat VECTOR_SERVICE_URL. Set VECTOR_SERVICE_SHARED=0 untuk
+# mode lama (setiap worker memuat model & index sendiri).
+set -e
+
+WORKERS="${WEB_CONCURRENCY:-4}"
+
+if [ "${VECTOR_SERVICE_SHARED:-1}" = "1" ]; then
+  SOCKET="${VECTOR_SERVICE_SOCKET:-/tmp/novel_vector.sock}"
+  rm -f "$SOCKET"
+  python -m uvicorn agent.services.vector_server:app --uds "$SOCKET" &
+  export VECTOR_SERVICE_URL="unix://$SOCKET"
+fi
+
+exec python -m uvicorn main:app --host 0.0.0.0 --port "${PORT:-8000}" --workers "$WORKERS"
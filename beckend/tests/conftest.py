@@ -0,0 +1,15 @@
+# tests/conftest.py
+"""
+Test unit backend. Menjalankan (dari folder beckend):
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+# Paket agent di-import seperti oleh main.py (folder beckend sebagai root)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Store SQLite proses-wide tidak menulis file ke folder kerja saat test
+os.environ.setdefault("REFINE_SESSION_DB", ":memory:")
+os.environ.setdefault("REACTION_STORE_DB", "")
@@ -0,0 +1,31 @@
+# tests/test_data_source.py
+"""Parser array JSON inkremental (agent/data_source._iter_json_array)."""
+
+import json
+
+import pytest
+
+from agent.data_source import _iter_json_array
+
+ITEMS = [1234567, 2, -0.125, 1.5e3, True, None, "teks panjang, dengan koma", [1, [2, 3]],
+         {"nama_senyawa": "Etanol", "berat_molekul": 46.07, "data_unsur_penyusun": [{"simbol": "C"}]}]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 7, 16, 1 << 16])
+def test_values_split_across_buffer_boundaries(tmp_path, chunk_size):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(ITEMS, indent=1), encoding="utf-8")
+    assert list(_iter_json_array(str(path), chunk_size=chunk_size)) == ITEMS
+
+
+def test_number_cut_at_buffer_end(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("[1234567, 2]", encoding="utf-8")
+    assert list(_iter_json_array(str(path), chunk_size=4)) == [1234567, 2]
+
+
+def test_unterminated_array_raises(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("[1, 2", encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(_iter_json_array(str(path), chunk_size=2))
@@ -0,0 +1,86 @@
+# tests/test_llm_scheduler.py
+"""Admission control LLM (agent/llm_scheduler.py): prioritas, shedding, penalize, fallback."""
+
+import asyncio
+import time
+
+from agent.llm_scheduler import LLMScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+PRO, FLASH = "gemini-pro", "gemini-flash"
+
+
+def _scheduler(limits=None, max_wait=1.0, fallback=True) -> LLMScheduler:
+    # tpm 0 = tanpa batas token; yang diuji hanya bucket request
+    return LLMScheduler(
+        limits or {PRO: (600, 0)},
+        max_wait={PRIORITY_INTERACTIVE: max_wait, PRIORITY_BULK: max_wait},
+        bulk_reserve=0.0, fallback=fallback,
+    )
+
+
+def _drain(scheduler: LLMScheduler, model: str = PRO):
+    budget = scheduler.models[model]
+    budget.requests.refill(time.monotonic())
+    budget.requests.level = 0.0
+
+
+def test_interactive_served_before_waiting_bulk():
+    scheduler = _scheduler()
+    _drain(scheduler)
+    granted = []
+
+    async def request(priority, delay=0.0):
+        await asyncio.sleep(delay)
+        model, retry_after = await scheduler.aacquire(1, PRO, priority)
+        assert model == PRO and retry_after is None
+        granted.append(priority)
+
+    async def main():
+        # Bulk sudah antri lebih dulu; interactive yang datang belakangan tetap dilayani duluan
+        await asyncio.gather(request(PRIORITY_BULK), request(PRIORITY_INTERACTIVE, delay=0.01))
+
+    asyncio.run(main())
+    assert granted == [PRIORITY_INTERACTIVE, PRIORITY_BULK]
+
+
+def test_sheds_with_retry_after_when_wait_exceeds_limit():
+    scheduler = _scheduler({PRO: (60, 0)}, max_wait=0.2)  # 1 request/detik
+    _drain(scheduler)
+    started = time.monotonic()
+    model, retry_after = scheduler.acquire(1, PRO, PRIORITY_INTERACTIVE)
+    assert model is None
+    assert retry_after >= 1
+    # Ditolak dini, tidak menunggu sampai batas
+    assert time.monotonic() - started < 0.2
+    assert scheduler.stats()["requests"]["interactive"]["shed"] == 1
+
+
+def test_penalize_blocks_model_for_all_requests():
+    scheduler = _scheduler(max_wait=0.1, fallback=False)
+    scheduler.penalize(PRO, 0.5)
+    model, retry_after = scheduler.acquire(1, PRO, PRIORITY_INTERACTIVE)
+    assert model is None and retry_after >= 1
+    assert scheduler.stats()["upstream_429"] == 1
+
+    # Dengan batas tunggu yang cukup, request menunggu masa tahan selesai
+    scheduler = _scheduler(max_wait=2.0, fallback=False)
+    scheduler.penalize(PRO, 0.3)
+    started = time.monotonic()
+    model, _ = scheduler.acquire(1, PRO, PRIORITY_INTERACTIVE)
+    assert model == PRO
+    assert time.monotonic() - started >= 0.3
+
+
+def test_falls_back_to_model_with_capacity():
+    scheduler = _scheduler({PRO: (600, 0), FLASH: (600, 0)}, max_wait=0.1)
+    scheduler.penalize(PRO, 5)
+    model, retry_after = scheduler.acquire(1, PRO, PRIORITY_INTERACTIVE)
+    assert (model, retry_after) == (FLASH, None)
+    assert scheduler.stats()["fallbacks"] == 1
+
+
+def test_no_fallback_when_disabled():
+    scheduler = _scheduler({PRO: (600, 0), FLASH: (600, 0)}, max_wait=0.1, fallback=False)
+    scheduler.penalize(PRO, 5)
+    model, retry_after = scheduler.acquire(1, PRO, PRIORITY_INTERACTIVE)
+    assert model is None and retry_after >= 5
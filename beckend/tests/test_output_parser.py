@@ -0,0 +1,91 @@
+# tests/test_output_parser.py
+"""Perbaikan JSON (repair_json) dan parsing + re-ask terarah (aparse_llm_output)."""
+
+import asyncio
+import json
+
+import pytest
+
+from agent import output_parser
+from agent.output_parser import OutputParseError, ReactionSummary, aparse_llm_output, repair_json
+
+REACTION = {
+    "reaktan_a": "HCl", "reaktan_b": "NaOH", "jenis_reaksi": "Netralisasi",
+    "produk_utama": "NaCl + H2O", "persamaan_stoikiometri": "HCl + NaOH -> NaCl + H2O",
+    "catatan_risiko": "Eksotermik.", "deskripsi_ringkas": "Asam kuat dinetralkan basa kuat.",
+}
+
+
+@pytest.mark.parametrize("fragment, expected", [
+    # Trailing comma di objek dan array
+    ('{"a": 1, "b": [1, 2,],}', {"a": 1, "b": [1, 2]}),
+    # Komentar // dan /* */ dibuang, "//" di dalam string dipertahankan
+    ('{\n  // komentar\n  "a": 1, /* blok */ "b": "http://x.org"\n}', {"a": 1, "b": "http://x.org"}),
+    # Literal Python
+    ('{"a": True, "b": False, "c": None}', {"a": True, "b": False, "c": None}),
+    # Newline mentah di dalam string
+    ('{"a": "baris 1\nbaris 2"}', {"a": "baris 1\nbaris 2"}),
+    # String terpotong: pasangan key/value yang belum lengkap dibuang
+    ('{"a": "lengkap", "b": "terpot', {"a": "lengkap"}),
+    # Objek bertingkat terpotong setelah key: kurung ditutup sesuai stack
+    ('{"a": 1, "b": {"c": [1, 2], "d": {"e": "x", "f":', {"a": 1, "b": {"c": [1, 2], "d": {"e": "x"}}}),
+])
+def test_repair_json(fragment, expected):
+    assert json.loads(repair_json(fragment)) == expected
+
+
+def _patch_llm(monkeypatch, answers: list[str]) -> list[str]:
+    """Mengganti LLM re-ask dengan jawaban tetap; mengembalikan daftar prompt yang dikirim."""
+    prompts = []
+
+    async def fake_llm(prompt, force_json=False):
+        prompts.append(prompt)
+        return answers.pop(0)
+
+    monkeypatch.setattr(output_parser, "aget_llm_response", fake_llm)
+    return prompts
+
+
+def test_parse_repairs_without_reask(monkeypatch):
+    prompts = _patch_llm(monkeypatch, [])
+    text = "Berikut hasilnya:\n```json\n" + json.dumps(REACTION)[:-1] + ",}\n```"
+    result, info = asyncio.run(aparse_llm_output(text, ReactionSummary))
+    assert result["jenis_reaksi"] == "Netralisasi"
+    assert info["repaired"] and not info["reasked_fields"]
+    assert prompts == []
+
+
+def test_reask_only_patches_invalid_fields(monkeypatch):
+    broken = {key: value for key, value in REACTION.items() if key != "jenis_reaksi"}
+    broken["produk_utama"] = {"tidak": "valid"}
+    # Patch juga mencoba menimpa field yang sudah benar: harus diabaikan
+    prompts = _patch_llm(monkeypatch, [json.dumps(
+        {"jenis_reaksi": "Netralisasi", "produk_utama": "NaCl + H2O", "reaktan_a": "DIUBAH"}
+    )])
+    result, info = asyncio.run(aparse_llm_output(json.dumps(broken), ReactionSummary, max_reasks=1))
+    assert result["jenis_reaksi"] == "Netralisasi"
+    assert result["produk_utama"] == "NaCl + H2O"
+    assert result["reaktan_a"] == "HCl"
+    assert sorted(info["reasked_fields"]) == ["jenis_reaksi", "produk_utama"]
+    # Prompt re-ask hanya meminta field yang tidak valid
+    assert len(prompts) == 1
+    assert "jenis_reaksi" in prompts[0] and "produk_utama" in prompts[0]
+    assert '"catatan_risiko": "Ringkasan risiko."' not in prompts[0]
+
+
+@pytest.mark.parametrize("text", [
+    "Maaf, saya tidak dapat membantu permintaan tersebut.",
+    "",
+])
+def test_unrecoverable_reply_raises(monkeypatch, text):
+    _patch_llm(monkeypatch, [])
+    with pytest.raises(OutputParseError):
+        asyncio.run(aparse_llm_output(text, ReactionSummary))
+
+
+def test_failed_reask_raises_with_invalid_fields(monkeypatch):
+    broken = {key: value for key, value in REACTION.items() if key != "jenis_reaksi"}
+    _patch_llm(monkeypatch, ["bukan JSON"])
+    with pytest.raises(OutputParseError) as excinfo:
+        asyncio.run(aparse_llm_output(json.dumps(broken), ReactionSummary, max_reasks=1))
+    assert excinfo.value.invalid_fields == ["jenis_reaksi"]
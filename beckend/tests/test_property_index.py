@@ -0,0 +1,27 @@
+# tests/test_property_index.py
+"""Parsing rentang properti dari teks bebas (agent/property_index.parse_range)."""
+
+import pytest
+
+from agent.property_index import parse_range
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("> 150", (150.0, None)),
+    ("minimal 150", (150.0, None)),
+    ("maks 1.2", (None, 1.2)),
+    ("< 1.2 g/cm3", (None, 1.2)),
+    ("100-200", (100.0, 200.0)),
+    ("-10 sampai 5", (-10.0, 5.0)),
+    ("180°C", (165.0, 195.0)),
+    # Dua batas sekaligus: batas atas tidak boleh hilang
+    (">150 dan <300", (150.0, 300.0)),
+    ("min 100 max 200", (100.0, 200.0)),
+    ("lebih dari 100 dan kurang dari 200", (100.0, 200.0)),
+    ("di atas 50 dan di atas 80", (80.0, None)),
+    # Batas yang bertentangan ditolak
+    ("> 300 dan < 150", None),
+    ("tinggi", None),
+])
+def test_parse_range(text, expected):
+    assert parse_range(text, "titik_didih_celsius") == expected
@@ -0,0 +1,73 @@
+# tests/test_reaction_rules.py
+"""Tabel kasus pre-classifier aturan /combine (agent/reaction_rules.classify_pair)."""
+
+import pytest
+
+from agent import reaction_rules
+from agent.reaction_rules import classify_pair
+
+
+def _record(nama, rumus, unsur, bahaya="", kategori="", sinonim=""):
+    return {
+        "nama_senyawa": nama,
+        "rumus_molekul": rumus,
+        "data_unsur_penyusun": [{"simbol": simbol} for simbol in unsur],
+        "pernyataan_bahaya_ghs": bahaya,
+        "kategori_aplikasi": kategori,
+        "sinonim": sinonim,
+        "tingkat_risiko_keselamatan": "Sedang",
+    }
+
+
+POTASSIUM_PERMANGANATE = _record("Potassium permanganate", "KMnO4", ["K", "Mn", "O"],
+                                 "H272: May intensify fire; oxidizer", "oksidator")
+ETHANOL = _record("Ethanol", "C2H6O", ["C", "H", "O"], "H225: Highly flammable liquid and vapor", "pelarut")
+SODIUM_HYPOCHLORITE = _record("Sodium hypochlorite", "ClNaO", ["Cl", "Na", "O"],
+                              "H290 | H314", "disinfektan", "bleach | natrium hipoklorit")
+AMMONIA = _record("Ammonia", "H3N", ["N", "H"], "H221 | H314", "pendingin")
+HYDROCHLORIC_ACID = _record("Hydrochloric acid", "ClH", ["Cl", "H"], "H290 | H314 | H335", "reagen")
+SODIUM_HYDROXIDE = _record("Sodium hydroxide", "HNaO", ["Na", "O", "H"], "H290 | H314", "reagen")
+SODIUM = _record("Sodium", "Na", ["Na"], "", "reagen")
+WATER = _record("Water", "H2O", ["H", "O"], "", "pelarut")
+HEXANE = _record("Hexane", "C6H14", ["C", "H"], "H225 | H304", "pelarut")
+TOLUENE = _record("Toluene", "C7H8", ["C", "H"], "H225 | H304", "pelarut")
+
+
+@pytest.mark.parametrize("record_a, record_b, klasifikasi, jenis_reaksi", [
+    # Oksidator + bahan mudah terbakar (kedua urutan)
+    (POTASSIUM_PERMANGANATE, ETHANOL, "berbahaya", "Redoks"),
+    (ETHANOL, POTASSIUM_PERMANGANATE, "berbahaya", "Redoks"),
+    # Hipoklorit + amonia -> kloramin
+    (SODIUM_HYPOCHLORITE, AMMONIA, "berbahaya", "Pelepasan gas beracun (kloramin)"),
+    # Asam + basa korosif
+    (HYDROCHLORIC_ACID, SODIUM_HYDROXIDE, "berbahaya", "Netralisasi"),
+    # Logam alkali murni + air (tanpa kode H260 tercatat)
+    (SODIUM, WATER, "berbahaya", "Reaksi dengan air"),
+    # Sesama hidrokarbon tanpa kelas bahaya reaktif
+    (HEXANE, TOLUENE, "tidak_reaktif", "Tidak Reaktif"),
+    # Senyawa yang sama
+    (HYDROCHLORIC_ACID, HYDROCHLORIC_ACID, "tidak_reaktif", "Tidak Reaktif"),
+])
+def test_classify_pair(monkeypatch, record_a, record_b, klasifikasi, jenis_reaksi):
+    monkeypatch.setattr(reaction_rules, "COMBINE_RULES_ENABLED", True)
+    result = classify_pair(record_a, record_b, record_a["nama_senyawa"], record_b["nama_senyawa"])
+    assert result is not None
+    assert result["klasifikasi"] == klasifikasi
+    assert result["jenis_reaksi"].startswith(jenis_reaksi)
+    # Pesan memakai nama yang diketik pengguna
+    assert (result["reaktan_a"], result["reaktan_b"]) == (record_a["nama_senyawa"], record_b["nama_senyawa"])
+
+
+@pytest.mark.parametrize("record_a, record_b", [
+    # Asam + pelarut netral: tidak jelas, diteruskan ke reaction store / LLM
+    (HYDROCHLORIC_ACID, ETHANOL),
+    (ETHANOL, HYDROCHLORIC_ACID),
+])
+def test_classify_pair_undecided(monkeypatch, record_a, record_b):
+    monkeypatch.setattr(reaction_rules, "COMBINE_RULES_ENABLED", True)
+    assert classify_pair(record_a, record_b, record_a["nama_senyawa"], record_b["nama_senyawa"]) is None
+
+
+def test_classify_pair_disabled(monkeypatch):
+    monkeypatch.setattr(reaction_rules, "COMBINE_RULES_ENABLED", False)
+    assert classify_pair(POTASSIUM_PERMANGANATE, ETHANOL, "KMnO4", "etanol") is None
@@ -0,0 +1,85 @@
+# tests/test_refine_sessions.py
+"""Store sesi /refine (agent/refine_sessions.py): lease lintas worker, TTL, LRU."""
+
+import time
+
+import pytest
+
+from agent.refine_sessions import RefineSessionStore, SessionBusy
+
+REQUEST = {"jenisProduk": "pelarut", "tujuan": "uji"}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def _create(store: RefineSessionStore):
+    return store.create(REQUEST, "konteks", "konteks parse", {"nama_senyawa": "Etanol"})
+
+
+def test_session_visible_from_another_worker(db_path):
+    worker_a, worker_b = RefineSessionStore(db_path), RefineSessionStore(db_path)
+    session = _create(worker_a)
+    loaded = worker_b.get(session.id)
+    assert loaded is not None
+    assert (loaded.request, loaded.context, loaded.recommendation) == (REQUEST, "konteks", {"nama_senyawa": "Etanol"})
+
+
+def test_concurrent_acquire_raises_session_busy(db_path):
+    worker_a, worker_b = RefineSessionStore(db_path), RefineSessionStore(db_path)
+    session = _create(worker_a)
+    leased = worker_a.acquire(session.id)
+    with pytest.raises(SessionBusy):
+        worker_b.acquire(session.id)
+    assert worker_b.stats()["busy"] == 1
+    worker_a.release(leased)
+    assert worker_b.acquire(session.id) is not None
+
+
+def test_release_ignores_lease_taken_over(db_path):
+    store = RefineSessionStore(db_path, lease=0.05)
+    session = _create(store)
+    stale = store.acquire(session.id)
+    time.sleep(0.1)
+    # Lease kedaluwarsa boleh diambil request lain
+    current = store.acquire(session.id)
+    store.release(stale)
+    with pytest.raises(SessionBusy):
+        store.acquire(session.id)
+    store.release(current)
+    assert store.acquire(session.id) is not None
+
+
+def test_record_turn_with_stale_lease_is_rejected(db_path):
+    store = RefineSessionStore(db_path, lease=0.05)
+    session = _create(store)
+    stale = store.acquire(session.id)
+    time.sleep(0.1)
+    current = store.acquire(session.id)
+    store.record_turn(current, "lebih murah", {"nama_senyawa": "Metanol"})
+    with pytest.raises(SessionBusy):
+        store.record_turn(stale, "lebih aman", {"nama_senyawa": "Aseton"})
+    saved = store.get(session.id)
+    assert saved.turns == 1
+    assert saved.recommendation == {"nama_senyawa": "Metanol"}
+    assert [turn["feedback"] for turn in saved.history] == ["lebih murah"]
+
+
+def test_ttl_and_lru_eviction(db_path):
+    store = RefineSessionStore(db_path, max_sessions=2, ttl=60)
+    first = _create(store)
+    time.sleep(0.01)
+    second = _create(store)
+    time.sleep(0.01)
+    store.get(first.id)  # first dipakai lagi: second yang paling lama tidak dipakai
+    time.sleep(0.01)
+    _create(store)
+    assert store.get(second.id) is None
+    assert store.get(first.id) is not None
+
+    store = RefineSessionStore(db_path, ttl=0.05)
+    session = _create(store)
+    time.sleep(0.1)
+    assert store.get(session.id) is None
@@ -0,0 +1,68 @@
+# tests/test_response_cache.py
+"""Cache respons LLM (agent/response_cache.py): LRU, TTL, kunci, stamp generasi."""
+
+import time
+
+import pytest
+
+from agent.response_cache import ResponseCache, make_cache_key, make_combine_key
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def factory(max_entries=16, ttl=60.0):
+        db_path = str(tmp_path / "cache.db") if request.param == "sqlite" else ""
+        cache = ResponseCache(max_entries=max_entries, ttl=ttl, db_path=db_path)
+        assert cache.backend_name == request.param
+        return cache
+    return factory
+
+
+def test_lru_evicts_least_recently_used(make_cache):
+    cache = make_cache(max_entries=2)
+    cache.set("a", "jawaban a")
+    time.sleep(0.01)
+    cache.set("b", "jawaban b")
+    time.sleep(0.01)
+    # "a" dipakai lagi: "b" yang paling lama tidak dipakai
+    assert cache.get("a") == "jawaban a"
+    time.sleep(0.01)
+    cache.set("c", "jawaban c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "jawaban a"
+    assert cache.get("c") == "jawaban c"
+
+
+def test_ttl_expiry(make_cache):
+    cache = make_cache(ttl=0.05)
+    cache.set("a", "jawaban a")
+    assert cache.get("a") == "jawaban a"
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize("value", ["", "API_ERROR_429: kuota", "API_ERROR: 500", "Error: klien",
+                                   "Terjadi kesalahan LLM tak terduga: x", "Gagal memproses"])
+def test_errors_are_not_cached(make_cache, value):
+    cache = make_cache()
+    cache.set("a", value)
+    assert cache.get("a") is None
+
+
+def test_generation_stamp_scopes_keys(make_cache):
+    cache = make_cache()
+    generation = ["1"]
+    cache.set_generation_source(lambda: generation[0])
+    cache.set("a", "jawaban lama")
+    assert cache.get("a") == "jawaban lama"
+    # Reindex oleh worker lain mengganti stamp: jawaban lama tidak dipakai lagi
+    generation[0] = "2"
+    assert cache.get("a") is None
+
+
+def test_cache_keys():
+    config = {"temperature": 0.2}
+    assert make_cache_key("Apa  titik didih\nETANOL?", "m", config) == make_cache_key("apa titik didih etanol?", "m", config)
+    assert make_cache_key("etanol", "m", config) != make_cache_key("etanol", "m2", config)
+    assert make_combine_key("HCl", "NaOH", "m", config) == make_combine_key("naoh", " hcl ", "m", config)
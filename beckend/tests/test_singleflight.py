@@ -0,0 +1,78 @@
+# tests/test_singleflight.py
+"""Request coalescing (agent/singleflight.py)."""
+
+import asyncio
+
+import pytest
+
+from agent.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_upstream_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def upstream(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return f"hasil {value}"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("kunci", upstream, 1) for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert results == ["hasil 1"] * 10
+    assert calls == [1]
+    assert flight.stats() == {"calls": 1, "coalesced": 9, "inflight": 0}
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight("test")
+
+    async def upstream(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        return await asyncio.gather(flight.do("a", upstream, "a"), flight.do("b", upstream, "b"))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert flight.stats()["calls"] == 2
+
+
+def test_exception_propagates_to_every_caller():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream gagal")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("kunci", upstream) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "upstream gagal" for result in results)
+
+
+def test_key_is_released_after_completion():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("gagal sekali")
+        return "ok"
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await flight.do("kunci", upstream)
+        # Kegagalan tidak di-cache: panggilan berikutnya menjalankan upstream lagi
+        return await flight.do("kunci", upstream)
+
+    assert asyncio.run(main()) == "ok"
+    assert len(calls) == 2
+    assert flight.stats()["inflight"] == 0
@@ -0,0 +1,560 @@
+# tools/bench_suite.py
+"""
+Benchmark dan load test yang bisa diulang untuk jalur RAG dan endpoint agent.
+
+Menjalankan (dari folder beckend):
+    python -m tools.bench_suite                                    # semua skenario
+    python -m tools.bench_suite --sizes 0,10000 --scenarios corpus
+    python -m tools.bench_suite --rps 10 --duration 30 --gemini-429-rate 0.1
+    python -m tools.bench_suite --compare bench_results/lama.json   # jalankan lalu bandingkan
+    python -m tools.bench_suite --compare lama.json --against baru.json  # bandingkan saja
+
+Skenario:
+    corpus  - per ukuran korpus (0 = dataset asli, N = N senyawa sintetis):
+              run_ingestion dari nol (throughput chunk/detik), run_ingestion ulang tanpa
+              perubahan, latensi retrieve_documents dan pencarian vektor saja (p50/p95/p99).
+    load    - beban open-loop pada RPS tetap untuk /ask, /combine dan /generate: request
+              dikirim sesuai jadwal tanpa menunggu respons sebelumnya. Per endpoint: status,
+              RPS tercapai, latensi p50/p95/p99, keterlambatan kirim klien, panggilan upstream.
+    save    - /save_compound end-to-end: waktu respons API, lalu waktu sampai job ingestion
+              selesai (index vektor sudah memuat senyawa baru).
+
+Gemini diganti tools/fake_gemini.py (latensi, 429 dan JSON rusak bisa diatur) yang dijalankan
+otomatis. Setiap skenario berjalan di subprocess dengan folder kerja sementara sendiri
+(data/, chroma_db, flat_index, embedding_cache terpisah dari milik server), karena path
+tersebut relatif terhadap cwd dan singleton proses (retriever, client Chroma, cache)
+tidak boleh bocor antar ukuran korpus.
+
+Hasil ditulis ke JSON (default bench_results/bench-<commit>-<waktu>.json): commit,
+konfigurasi, angka per skenario, dan ringkasan tahap dari agent.metrics per subprocess.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BECKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("corpus", "load", "save")
+LOAD_ENDPOINTS = ("ask", "combine", "generate")
+# Kunci metrik yang dibandingkan oleh --compare (latensi: lebih kecil lebih baik)
+_COMPARE_SUFFIXES = ("p50_ms", "p95_ms", "p99_ms", "per_s", "achieved_rps", "_s")
+
+
+# --- Utilitas ---
+
+def _percentiles(samples: list[float]) -> dict:
+    """samples dalam detik -> ringkasan dalam ms."""
+    if not samples:
+        return {"count": 0}
+    values = sorted(value * 1000 for value in samples)
+
+    def at(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    return {"count": len(values), "p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99),
+            "max_ms": round(values[-1], 3), "mean_ms": round(sum(values) / len(values), 3)}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_info() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=BECKEND_DIR, capture_output=True, text=True,
+                                  timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or None,
+            "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+def _use_fake_embeddings():
+    """--embeddings fake: vektor deterministik, mengukur pipeline tanpa biaya model MiniLM."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    import agent.embedding_service as embedding_service
+    embedding_service._shared_embeddings = DeterministicFakeEmbedding(size=384)
+
+
+def _prepare_workdir(workdir: str, size: int):
+    """Isi data/ folder kerja: dataset asli (size 0) atau `size` senyawa sintetis."""
+    from agent.data_source import iter_dataset
+    from agent.embedding_service import DATA_FILE_PATH
+    from tools.synthetic_data import write_records, write_synthetic_dataset
+
+    source = os.path.join(BECKEND_DIR, DATA_FILE_PATH)
+    target = os.path.join(workdir, DATA_FILE_PATH)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if size > 0:
+        write_synthetic_dataset(target, size, source)
+        return
+    # Dataset asli: file utama + shard + log digabung menjadi satu file utama
+    cwd = os.getcwd()
+    os.chdir(BECKEND_DIR)
+    try:
+        records = list(iter_dataset())
+    finally:
+        os.chdir(cwd)
+    write_records(target, records)
+
+
+def _sample_queries(records: list[dict], count: int, seed: int) -> list[str]:
+    """Campuran query: identifier persis, pertanyaan pendek, dan pencarian deskriptif."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        record = rng.choice(records)
+        name = record.get("nama_senyawa") or ""
+        synonym = str(record.get("sinonim") or name).split(",")[0].strip()
+        category = str(record.get("kategori_aplikasi") or "pelarut").split(",")[0].strip()
+        risk = record.get("tingkat_risiko_keselamatan") or "Rendah"
+        queries.append(rng.choice([
+            name,
+            f"apa kegunaan {synonym}?",
+            f"senyawa untuk {category} dengan risiko {risk}",
+        ]))
+    return queries
+
+
+# --- Worker: corpus ---
+
+def run_corpus(args) -> dict:
+    """Ingestion dingin + ulang, lalu latensi retrieval, untuk satu ukuran korpus."""
+    _prepare_workdir(os.getcwd(), args.size)
+    from agent.compound_store import compound_store
+    from agent.embedding_service import run_ingestion, INGEST_BATCH_SIZE, VECTOR_DB_PATH
+    from agent.retriever_service import (
+        retrieve_documents, search_batch, reload_retriever, RETRIEVER_TOP_K, HYBRID_RETRIEVAL
+    )
+    from agent.vector_store import VECTOR_BACKEND
+    from agent.metrics import get_stage_summary
+
+    compound_store.load()
+    records = compound_store.all()
+
+    start = time.perf_counter()
+    message = run_ingestion()
+    cold_s = time.perf_counter() - start
+    if message.startswith("Error"):
+        raise RuntimeError(message)
+    chunks = int(message.split(" chunks")[0].split()[-1])
+    start = time.perf_counter()
+    noop_message = run_ingestion()
+    noop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reload_retriever()
+    mount_s = time.perf_counter() - start
+
+    queries = _sample_queries(records, args.queries, args.seed)
+    for query in queries[:10]:  # Pemanasan (model, cache halaman, indeks leksikal)
+        retrieve_documents(query)
+    retrieval, vector_only, empty = [], [], 0
+    for query in queries:
+        t0 = time.perf_counter()
+        documents = retrieve_documents(query)
+        retrieval.append(time.perf_counter() - t0)
+        empty += not documents
+        t0 = time.perf_counter()
+        search_batch([query], RETRIEVER_TOP_K)
+        vector_only.append(time.perf_counter() - t0)
+
+    return {
+        "compounds": len(records),
+        "chunks": chunks,
+        "config": {"vector_backend": VECTOR_BACKEND, "hybrid_retrieval": HYBRID_RETRIEVAL,
+                   "ingest_batch_size": INGEST_BATCH_SIZE, "top_k": RETRIEVER_TOP_K},
+        "ingestion": {
+            "cold_s": round(cold_s, 3),
+            "chunks_per_s": round(chunks / cold_s, 1) if cold_s else None,
+            "noop_s": round(noop_s, 3),
+            "message": noop_message,
+        },
+        "vector_db_mb": round(_dir_size(VECTOR_DB_PATH) / 2**20, 2),
+        "mount_ms": round(mount_s * 1000, 2),
+        "retrieve_documents": {**_percentiles(retrieval), "empty_results": empty},
+        "vector_search_only": _percentiles(vector_only),
+        "stages": get_stage_summary(),
+    }
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+# --- Worker: aplikasi (load & save) ---
+
+def _start_app(args):
+    """Import main, jalankan startup event, pastikan index sudah ada untuk korpus ini."""
+    from agent.embedding_service import VECTOR_DB_PATH, run_ingestion
+    if not os.path.exists(VECTOR_DB_PATH):
+        _prepare_workdir(os.getcwd(), args.size)
+        message = run_ingestion()
+        if message.startswith("Error"):
+            raise RuntimeError(message)
+    import main
+    main.startup_event()
+    from agent.retriever_service import get_retriever, get_query_batcher
+    get_retriever()
+    get_query_batcher().embed("warm-up")
+    return main
+
+
+def _load_payloads(records: list[dict], endpoint: str, count: int, rng: random.Random) -> list[dict]:
+    payloads = []
+    for _ in range(count):
+        record = rng.choice(records)
+        if endpoint == "ask":
+            payloads.append({"query": rng.choice([
+                f"berapa titik didih {record.get('nama_senyawa')}?",  # Fast path
+                f"apa kegunaan {str(record.get('sinonim') or record.get('nama_senyawa')).split(',')[0]}?",
+                f"jelaskan bahaya {record.get('nama_senyawa')} dalam produk {record.get('kategori_aplikasi')}",
+            ])})
+        elif endpoint == "combine":
+            other = rng.choice(records)
+            payloads.append({"compound_a": record.get("nama_senyawa"), "compound_b": other.get("nama_senyawa")})
+        else:
+            payloads.append({
+                "jenisProduk": str(record.get("kategori_aplikasi") or "pelarut").split(",")[0],
+                "tujuan": f"alternatif {record.get('nama_senyawa')}",
+                "propertiTarget": {"titik_didih_celsius": f"< {rng.choice([50, 100, 200, 300])}"},
+            })
+    return payloads
+
+
+async def _open_loop(client, path: str, payloads: list[dict], rps: float) -> dict:
+    """Mengirim payload sesuai jadwal i / rps (open-loop), tanpa menunggu respons sebelumnya."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    latencies, ok_latencies, lags, statuses = [], [], [], {}
+
+    async def one(index: int, payload: dict):
+        scheduled = start + index / rps
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        lags.append(max(0.0, loop.time() - scheduled))
+        t0 = time.perf_counter()
+        try:
+            response = await client.post(path, json=payload)
+            status = str(response.status_code)
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - t0
+        latencies.append(elapsed)
+        if status.startswith("2"):
+            ok_latencies.append(elapsed)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    await asyncio.gather(*(one(i, payload) for i, payload in enumerate(payloads)))
+    wall_s = loop.time() - start
+    return {
+        "sent": len(payloads),
+        "wall_s": round(wall_s, 3),
+        "achieved_rps": round(len(payloads) / wall_s, 2) if wall_s else None,
+        "status": dict(sorted(statuses.items())),
+        "latency": _percentiles(latencies),
+        "latency_2xx": _percentiles(ok_latencies),
+        "send_lag": _percentiles(lags),
+    }
+
+
+def _fake_gemini_stats(client) -> dict:
+    url = os.getenv("GEMINI_BASE_URL")
+    if not url:
+        return {}
+    try:
+        return client.get(f"{url}/stats", timeout=5).json()
+    except Exception:
+        return {}
+
+
+async def _run_load(args, main) -> dict:
+    import httpx
+    from agent.compound_store import compound_store
+    from agent.response_cache import response_cache
+
+    records = compound_store.all()
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=main.app)
+    results = {"rps": args.rps, "duration_s": args.duration, "endpoints": {}}
+    with httpx.Client() as stats_client:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for endpoint in args.endpoints:
+                response_cache.clear()  # Setiap endpoint mulai dari cache kosong
+                payloads = _load_payloads(records, endpoint, max(1, int(args.rps * args.duration)), rng)
+                before = _fake_gemini_stats(stats_client)
+                print(f"Bench: load /{endpoint} {len(payloads)} request @ {args.rps} rps ...")
+                phase = await _open_loop(client, f"/{endpoint}", payloads, args.rps)
+                after = _fake_gemini_stats(stats_client)
+                phase["upstream"] = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+                results["endpoints"][endpoint] = phase
+    return results
+
+
+async def _run_save(args, main) -> dict:
+    import httpx
+    from agent.compound_store import compound_store
+    from agent.ingestion_jobs import INGEST_DEBOUNCE_SECONDS
+
+    template = dict(compound_store.all()[0])
+    transport = httpx.ASGITransport(app=main.app)
+    runs = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for i in range(args.saves):
+            record = {**template, "nama_senyawa": f"BENCH-SAVE-{int(time.time())}-{i}"}
+            start = time.perf_counter()
+            response = await client.post("/save_compound", json=record)
+            api_s = time.perf_counter() - start
+            job_id = response.json().get("job_id")
+            visible = compound_store.get(record["nama_senyawa"]) is not None
+            status, job = None, {}
+            while job_id and time.perf_counter() - start < args.save_timeout:
+                job = (await client.get(f"/ingest/{job_id}")).json()
+                status = job.get("status")
+                if status in ("success", "error"):
+                    break
+                await asyncio.sleep(0.05)
+            runs.append({
+                "http_status": response.status_code,
+                "api_ms": round(api_s * 1000, 2),
+                "store_visible": visible,
+                "job_status": status,
+                "indexed_ms": round((time.perf_counter() - start) * 1000, 2) if status == "success" else None,
+                "job_message": job.get("message"),
+            })
+    indexed = [run["indexed_ms"] / 1000 for run in runs if run["indexed_ms"] is not None]
+    return {
+        "debounce_s": INGEST_DEBOUNCE_SECONDS,
+        "api": _percentiles([run["api_ms"] / 1000 for run in runs]),
+        "end_to_end": _percentiles(indexed),
+        "runs": runs,
+    }
+
+
+def run_app(args) -> dict:
+    main = _start_app(args)
+    from agent.metrics import get_stage_summary
+    from agent.llm import get_llm_scheduler_stats
+    from agent.output_parser import get_output_parser_stats
+
+    if args.worker == "load":
+        result = asyncio.run(_run_load(args, main))
+        scheduler = get_llm_scheduler_stats()
+        result["llm_scheduler"] = {key: scheduler[key] for key in ("requests", "fallbacks", "upstream_429")}
+        result["output_parser"] = get_output_parser_stats()
+    else:
+        result = asyncio.run(_run_save(args, main))
+    result["stages"] = get_stage_summary()
+    return result
+
+
+# --- Orkestrasi ---
+
+def _start_fake_gemini(args):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "FAKE_GEMINI_LATENCY_MS": str(args.gemini_latency_ms),
+        "FAKE_GEMINI_429_RATE": str(args.gemini_429_rate),
+        "FAKE_GEMINI_MALFORMED_RATE": str(args.gemini_malformed_rate),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "tools.fake_gemini:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BECKEND_DIR, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("fake_gemini tidak siap dalam 30 detik")
+
+
+def _run_worker(worker: str, workdir: str, args, env: dict, **extra) -> dict:
+    os.makedirs(workdir, exist_ok=True)
+    result_path = os.path.join(workdir, f"result-{worker}.json")
+    command = [sys.executable, "-m", "tools.bench_suite", "--worker", worker, "--result", result_path,
+               "--queries", str(args.queries), "--seed", str(args.seed), "--embeddings", args.embeddings,
+               "--rps", str(args.rps), "--duration", str(args.duration), "--saves", str(args.saves),
+               "--endpoints", ",".join(args.endpoints)]
+    for key, value in extra.items():
+        command += [f"--{key.replace('_', '-')}", str(value)]
+    print(f"Bench: {worker} {extra or ''} di {workdir}")
+    completed = subprocess.run(command, cwd=workdir, env=env)
+    if completed.returncode != 0:
+        return {"error": f"worker {worker} keluar dengan kode {completed.returncode}"}
+    with open(result_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_suite(args) -> dict:
+    git = _git_info()
+    report = {
+        "meta": {
+            **git,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "args": {key: value for key, value in vars(args).items()
+                 if key not in ("worker", "result", "compare", "against", "output", "size")},
+    }
+    root = args.workdir or tempfile.mkdtemp(prefix="bench_suite_")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [BECKEND_DIR, os.getenv("PYTHONPATH")]))}
+    fake = None
+    try:
+        if {"load", "save"} & set(args.scenarios):
+            if args.gemini_url:
+                env["GEMINI_BASE_URL"] = args.gemini_url
+            else:
+                fake, env["GEMINI_BASE_URL"] = _start_fake_gemini(args)
+                env.setdefault("GEMINI_API_KEY", "bench")
+                report["fake_gemini"] = {"latency_ms": args.gemini_latency_ms, "rate_429": args.gemini_429_rate,
+                                         "malformed_rate": args.gemini_malformed_rate}
+        if "corpus" in args.scenarios:
+            report["corpus"] = [
+                {"size": size, **_run_worker("corpus", os.path.join(root, f"corpus-{size}"), args, env, size=size)}
+                for size in args.sizes
+            ]
+        # Load & save memakai korpus terkecil (index sudah dibangun oleh skenario corpus jika dijalankan)
+        base = os.path.join(root, f"corpus-{args.sizes[0]}")
+        if "load" in args.scenarios:
+            report["load"] = _run_worker("load", base, args, env, size=args.sizes[0])
+        if "save" in args.scenarios:
+            report["save"] = _run_worker("save", base, args, env, size=args.sizes[0])
+    finally:
+        if fake is not None:
+            fake.terminate()
+            fake.wait(timeout=10)
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+    return report
+
+
+# --- Perbandingan antar commit ---
+
+def _flatten(node, prefix: str = "") -> dict:
+    flat = {}
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in ("stages", "args", "meta", "runs"):
+                continue
+            flat.update(_flatten(value, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(node, list):
+        for item in node:
+            label = item.get("size", "?") if isinstance(item, dict) else "?"
+            flat.update(_flatten(item, f"{prefix}[{label}]"))
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        flat[prefix] = node
+    return flat
+
+
+def compare_reports(old: dict, new: dict) -> list[dict]:
+    """Selisih metrik latensi/throughput yang ada di kedua laporan."""
+    old_flat, new_flat = _flatten(old), _flatten(new)
+    rows = []
+    for key, new_value in new_flat.items():
+        if not key.endswith(_COMPARE_SUFFIXES) or key not in old_flat:
+            continue
+        old_value = old_flat[key]
+        change = (new_value - old_value) / old_value if old_value else None
+        rows.append({"metric": key, "old": old_value, "new": new_value,
+                     "change": round(change, 4) if change is not None else None})
+    return rows
+
+
+def _print_comparison(old: dict, new: dict):
+    print(f"Perbandingan {old.get('meta', {}).get('commit')} -> {new.get('meta', {}).get('commit')}:")
+    for row in compare_reports(old, new):
+        change = f"{row['change'] * 100:+.1f}%" if row["change"] is not None else "n/a"
+        print(f"  {row['metric']:<70} {row['old']:>12} -> {row['new']:<12} {change}")
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Skenario dipisah koma: corpus,load,save")
+    parser.add_argument("--sizes", default="0,10000,100000", help="Ukuran korpus (0 = dataset asli)")
+    parser.add_argument("--queries", type=int, default=200, help="Query retrieval per ukuran korpus")
+    parser.add_argument("--rps", type=float, default=5.0, help="Laju request load test per endpoint")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durasi load test per endpoint (detik)")
+    parser.add_argument("--endpoints", default=",".join(LOAD_ENDPOINTS), help="Endpoint load test")
+    parser.add_argument("--saves", type=int, default=3, help="Jumlah /save_compound berurutan")
+    parser.add_argument("--save-timeout", type=float, default=300.0)
+    parser.add_argument("--embeddings", choices=("model", "fake"), default="model",
+                        help="model = MiniLM asli, fake = vektor deterministik (tanpa biaya model)")
+    parser.add_argument("--gemini-url", default=None, help="Pakai server Gemini(-kompatibel) ini, bukan fake_gemini")
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--gemini-429-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", default=None, help="Folder kerja (default: folder sementara, dihapus)")
+    parser.add_argument("--output", default=None, help="File hasil JSON")
+    parser.add_argument("--compare", default=None, help="File hasil lama untuk dibandingkan")
+    parser.add_argument("--against", default=None, help="Bersama --compare: bandingkan dua file tanpa menjalankan")
+    # Internal: dipakai subprocess worker
+    parser.add_argument("--worker", choices=("corpus", "load", "save"), default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--result", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.scenarios = [name for name in args.scenarios.split(",") if name]
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+    args.endpoints = [name.strip("/") for name in args.endpoints.split(",") if name]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"skenario tidak dikenal: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+
+    if args.worker:
+        if args.embeddings == "fake":
+            _use_fake_embeddings()
+        result = run_corpus(args) if args.worker == "corpus" else run_app(args)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        return
+
+    if args.compare and args.against:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.against, "r", encoding="utf-8") as f:
+            new = json.load(f)
+        _print_comparison(old, new)
+        return
+
+    report = run_suite(args)
+    output = args.output or os.path.join(
+        BECKEND_DIR, "bench_results", f"bench-{report['meta']['commit'] or 'nocommit'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Bench: hasil ditulis ke {output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            _print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# tools/fake_gemini.py
+"""
+Stub HTTP Gemini lokal untuk pengujian dan benchmark tanpa kuota API.
+
+Menjalankan:
+    uvicorn tools.fake_gemini:app --port 8099
+    GEMINI_BASE_URL=http://127.0.0.1:8099 GEMINI_API_KEY=dummy uvicorn main:app
+
+Perilaku diatur lewat environment variables:
+    FAKE_GEMINI_LATENCY_MS   - latensi buatan per request (default 50)
+    FAKE_GEMINI_429_RATE     - peluang 0..1 untuk membalas 429 RESOURCE_EXHAUSTED (default 0)
+    FAKE_GEMINI_RETRY_AFTER  - nilai Retry-After (detik) pada balasan 429 (default 1)
+    FAKE_GEMINI_STREAM_CHUNKS / FAKE_GEMINI_STREAM_DELAY_MS - bentuk respons streaming
+    FAKE_GEMINI_MALFORMED_RATE - peluang 0..1 jawaban JSON dirusak (pagar ```json, komentar,
+                                 ekor terpotong) untuk menguji agent/output_parser.py
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fake Gemini API")
+
+LATENCY_MS = float(os.getenv("FAKE_GEMINI_LATENCY_MS", "50"))
+RATE_429 = float(os.getenv("FAKE_GEMINI_429_RATE", "0"))
+RETRY_AFTER = os.getenv("FAKE_GEMINI_RETRY_AFTER", "1")
+STREAM_CHUNKS = int(os.getenv("FAKE_GEMINI_STREAM_CHUNKS", "8"))
+STREAM_DELAY_MS = float(os.getenv("FAKE_GEMINI_STREAM_DELAY_MS", "20"))
+MALFORMED_RATE = float(os.getenv("FAKE_GEMINI_MALFORMED_RATE", "0"))
+
+# Penghitung sederhana, dibaca lewat GET /stats
+stats = {"requests": 0, "rate_limited": 0, "malformed": 0, "cached_contents": 0, "cached_requests": 0}
+# cachedContents/<id> -> contents (context cache eksplisit, lihat agent/llm.py)
+cached_contents = {}
+
+FAKE_COMPOUND = {
+    "nama_senyawa": "CID-753", "rumus_molekul": "C3H8O3", "berat_molekul": 92.09,
+    "sinonim": "glycerol", "deskripsi": "Jawaban stub.",
+    "titik_didih_celsius": 290.0, "titik_leleh_celsius": 18.0, "densitas_gcm3": 1.26,
+    "pernyataan_bahaya_ghs": "-", "kategori_aplikasi": "pelarut",
+    "sifat_fungsional": "kutub", "tingkat_risiko_keselamatan": "Rendah",
+    "bahaya_keselamatan": "-", "ketersediaan_bahan_baku": "Tersedia",
+    "data_unsur_penyusun": [{"nomor_atom": 6, "nama_unsur": "Carbon", "simbol": "C"}],
+    "skor_kecocokan": 90, "justifikasi_ringkas": "Jawaban stub.",
+}
+
+FAKE_REACTION = {
+    "reaktan_a": "A", "reaktan_b": "B", "jenis_reaksi": "Tidak Reaktif",
+    "produk_utama": "-", "persamaan_stoikiometri": "-",
+    "catatan_risiko": "-", "deskripsi_ringkas": "Jawaban stub.",
+}
+
+
+def _prompt_text(body: dict) -> str:
+    parts = []
+    cached = cached_contents.get(body.get("cachedContent") or "", [])
+    for content in cached + body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+
+def _answer_text(body: dict) -> str:
+    prompt = _prompt_text(body)
+    config = body.get("generationConfig") or {}
+    if config.get("responseMimeType") == "application/json":
+        if '"hasil"' in prompt:
+            # Prompt gabungan /combine_batch: satu reaksi per id pasangan
+            ids = [int(i) for i in re.findall(r'"id":\s*(\d+)', prompt)]
+            return json.dumps({"hasil": [{"id": i, **FAKE_REACTION} for i in ids]}, ensure_ascii=False)
+        payload = FAKE_REACTION if "reaktan_a" in prompt else FAKE_COMPOUND
+        text = json.dumps(payload, ensure_ascii=False, indent=1)
+        if MALFORMED_RATE and random.random() < MALFORMED_RATE:
+            stats["malformed"] += 1
+            return "```json\n// hasil analisis\n" + text[:int(len(text) * 0.8)]
+        return text
+    return f"Jawaban stub untuk: {prompt[-200:]}"
+
+
+def _rate_limited_response() -> JSONResponse:
+    stats["rate_limited"] += 1
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": RETRY_AFTER},
+        content={"error": {
+            "code": 429,
+            "message": "Resource has been exhausted (fake).",
+            "status": "RESOURCE_EXHAUSTED",
+            "details": [{
+                "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                "retryDelay": f"{RETRY_AFTER}s",
+            }],
+        }},
+    )
+
+
+def _candidate(text: str, finish: bool = True) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finish:
+        candidate["finishReason"] = "STOP"
+    return candidate
+
+
+async def _stream_chunks(text: str, model: str):
+    """Membagi jawaban menjadi beberapa event SSE seperti streamGenerateContent?alt=sse."""
+    size = max(len(text) // STREAM_CHUNKS, 1)
+    pieces = [text[i:i + size] for i in range(0, len(text), size)]
+    for index, piece in enumerate(pieces):
+        last = index == len(pieces) - 1
+        chunk = {"candidates": [_candidate(piece, finish=last)], "modelVersion": model}
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\r\n\r\n"
+        await asyncio.sleep(STREAM_DELAY_MS / 1000)
+
+
+@app.post("/{api_version}/models/{model_action}")
+async def generate(api_version: str, model_action: str, request: Request):
+    """Meniru models/{model}:generateContent dan :streamGenerateContent."""
+    stats["requests"] += 1
+    await asyncio.sleep(LATENCY_MS / 1000)
+    if RATE_429 and random.random() < RATE_429:
+        return _rate_limited_response()
+
+    body = await request.json()
+    text = _answer_text(body)
+    model, _, action = model_action.partition(":")
+    if action == "streamGenerateContent":
+        return StreamingResponse(_stream_chunks(text, model), media_type="text/event-stream")
+    usage = {
+        "promptTokenCount": len(_prompt_text(body)) // 4,
+        "candidatesTokenCount": len(text) // 4,
+        "totalTokenCount": (len(_prompt_text(body)) + len(text)) // 4,
+    }
+    if body.get("cachedContent") in cached_contents:
+        stats["cached_requests"] += 1
+        cached = {"contents": cached_contents[body["cachedContent"]]}
+        usage["cachedContentTokenCount"] = len(_prompt_text(cached)) // 4
+    return {"candidates": [_candidate(text)], "usageMetadata": usage, "modelVersion": model}
+
+
+@app.post("/{api_version}/cachedContents")
+async def create_cached_content(api_version: str, request: Request):
+    """Meniru cachedContents.create: menyimpan contents, dipakai lewat field cachedContent."""
+    body = await request.json()
+    name = f"cachedContents/fake-{len(cached_contents) + 1}"
+    cached_contents[name] = body.get("contents", [])
+    stats["cached_contents"] += 1
+    return {"name": name, "model": body.get("model"), "ttl": body.get("ttl"),
+            "usageMetadata": {"totalTokenCount": len(_prompt_text({"contents": cached_contents[name]})) // 4}}
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
@@ -0,0 +1,64 @@
+# tools/loader_memory.py
+"""
+Mengukur puncak memori (tracemalloc) pemuatan dataset: json.load vs loader streaming.
+
+Menjalankan (dari folder beckend):
+    python -m tools.loader_memory --count 100000
+
+Skenario yang diukur pada file sintetis:
+    json.load            - seluruh array dimuat sekaligus (cara lama)
+    stream .json         - parser array inkremental (agent.data_source)
+    stream .jsonl        - JSON Lines baris per baris
+    stream + chunking    - iter_chunks (jalur ingestion tanpa embedding)
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from agent.data_source import iter_compounds_from
+from agent.embedding_service import iter_chunks
+from tools.synthetic_data import write_synthetic_dataset
+
+
+def _measure(label: str, func) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {"skenario": label, "items": count, "peak_mb": round(peak / 2**20, 2), "detik": round(elapsed, 2)}
+    print(f"{label:<20} items={count:<8} peak={result['peak_mb']:>9.2f} MB  waktu={result['detik']:.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100_000, help="Jumlah senyawa sintetis")
+    parser.add_argument("--workdir", default=None, help="Folder file sintetis (default: folder sementara)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="loader_memory_")
+    json_path = write_synthetic_dataset(os.path.join(workdir, "sintetis.json"), args.count)
+    jsonl_path = write_synthetic_dataset(os.path.join(workdir, "sintetis.jsonl"), args.count)
+    print(f"File sintetis: {json_path} ({os.path.getsize(json_path) / 2**20:.1f} MB)")
+
+    def full_load():
+        with open(json_path, "r", encoding="utf-8") as f:
+            return len(json.load(f))
+
+    results = [
+        _measure("json.load", full_load),
+        _measure("stream .json", lambda: sum(1 for _ in iter_compounds_from(json_path))),
+        _measure("stream .jsonl", lambda: sum(1 for _ in iter_compounds_from(jsonl_path))),
+        _measure("stream + chunking", lambda: sum(1 for _ in iter_chunks(iter_compounds_from(json_path)))),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
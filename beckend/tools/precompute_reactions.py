@@ -0,0 +1,182 @@
+# tools/precompute_reactions.py
+"""
+Job offline: mengisi reaction store (agent/reaction_store.py) untuk pasangan populer
+atau yang di-shortlist, dalam batas anggaran rate limit.
+
+Menjalankan (dari folder beckend, dengan GEMINI_API_KEY yang sama dengan server):
+    python -m tools.precompute_reactions --popular 200
+    python -m tools.precompute_reactions --pairs shortlist.txt --rpm 2 --max-calls 30
+    python -m tools.precompute_reactions --category pelarut --max-pairs 300 --dry-run
+
+Sumber pasangan (boleh digabung, urutan prioritas sesuai urutan di bawah):
+    --popular N     - N pasangan paling sering diminta lewat /combine yang belum punya hasil
+    --pairs FILE    - shortlist, satu pasangan per baris: "A,B" atau JSON {"compound_a", "compound_b"}
+    --category KAT  - semua pasangan antar senyawa dengan kategori_aplikasi KAT (bisa diulang)
+
+Pasangan yang sudah tersimpan atau terjawab pre-classifier aturan (agent/reaction_rules.py)
+dilewati tanpa panggilan LLM. Sisanya dipaket COMBINE_PACK_SIZE per prompt seperti
+/combine_batch. Anggaran:
+    --rpm        request per menit job ini (scheduler LLM proses ini diset ke nilai tersebut
+                 untuk semua model). Scheduler worker server TIDAK mengetahui job ini, padahal
+                 kuota Gemini dipakai bersama: pilih --rpm sehingga --rpm + LLM_RPM/LLM_PRO_RPM
+                 server tetap di bawah kuota, atau jalankan di luar jam sibuk.
+    --max-calls  batas keras panggilan upstream per eksekusi, termasuk retry setelah 429.
+                 Setiap prompt dikirim dengan satu percobaan upstream (tanpa retry internal
+                 aget_llm_response); retry 429 dilakukan job ini dan ikut dihitung.
+Balasan 429 ditunggu sesuai Retry-After (selama anggaran --max-calls masih ada).
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+
+# Retry 429 per paket sebelum paket dilewati (masing-masing satu panggilan upstream)
+PACK_RETRIES = 3
+
+
+def _display_name(record: dict) -> str:
+    """Nama untuk prompt: nama_senyawa + sinonim pertama (ID CID saja tidak dikenali LLM)."""
+    name = str(record.get("nama_senyawa") or "")
+    synonym = next((s.strip() for s in str(record.get("sinonim") or "").split("|") if s.strip()), "")
+    return f"{name} ({synonym})" if synonym and synonym.lower() != name.lower() else name
+
+
+def _read_shortlist(path: str) -> list[tuple[str, str]]:
+    pairs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+                pairs.append((item["compound_a"], item["compound_b"]))
+            elif "," in line:
+                a, b = line.split(",", 1)
+                pairs.append((a.strip(), b.strip()))
+    return pairs
+
+
+def collect_pairs(args) -> list[tuple[str, str]]:
+    from agent.compound_store import compound_store
+    from agent.reaction_store import reaction_store
+
+    pairs = [(a, b) for a, b, _ in reaction_store.popular_pending(args.popular)] if args.popular else []
+    if args.pairs:
+        pairs += _read_shortlist(args.pairs)
+    for category in args.category or []:
+        names = [_display_name(record) for record in compound_store.find_by_category(category)]
+        pairs += list(itertools.islice(itertools.combinations(names, 2), args.max_pairs))
+    return pairs
+
+
+def plan_pairs(pairs: list[tuple[str, str]], max_pairs: int) -> tuple[list[dict], dict]:
+    """Dedupe, lewati yang tersimpan / terjawab aturan. Mengembalikan (todo, hitungan)."""
+    from agent.reaction_rules import classify_pair
+    from agent.reaction_store import reaction_store, resolve_reactant, reactant_identity
+
+    counts = {"candidates": len(pairs), "duplicate": 0, "already_stored": 0, "rule": 0}
+    seen, todo = set(), []
+    for compound_a, compound_b in pairs:
+        record_a, record_b = resolve_reactant(compound_a), resolve_reactant(compound_b)
+        identity_a, identity_b = reactant_identity(compound_a, record_a), reactant_identity(compound_b, record_b)
+        key = reaction_store.pair_key(identity_a, identity_b)
+        if key in seen:
+            counts["duplicate"] += 1
+            continue
+        seen.add(key)
+        if reaction_store.has_result(identity_a, identity_b):
+            counts["already_stored"] += 1
+            continue
+        if record_a is not None and record_b is not None and classify_pair(record_a, record_b, compound_a, compound_b):
+            counts["rule"] += 1
+            continue
+        todo.append({"compound_a": compound_a, "compound_b": compound_b,
+                     "identity_a": identity_a, "identity_b": identity_b})
+        if len(todo) >= max_pairs:
+            break
+    return todo, counts
+
+
+async def run_packs(todo: list[dict], max_calls: int) -> dict:
+    from agent.batching import chunked, COMBINE_PACK_SIZE
+    from agent.llm import aget_llm_response, get_request_signature, llm_priority, rate_limit_headers, PRIORITY_BULK
+    from agent.reaction_store import reaction_store
+    from agent.combine_prompts import CombineRequest, create_combine_pack_prompt, parse_packed_reactions
+
+    model, _ = get_request_signature(force_json=True)
+    counts = {"llm_calls": 0, "stored": 0, "unanswered": 0, "skipped_budget": 0, "rate_limited": 0}
+    for pack in chunked(todo, COMBINE_PACK_SIZE):
+        prompt = create_combine_pack_prompt(
+            [CombineRequest(compound_a=item["compound_a"], compound_b=item["compound_b"]) for item in pack]
+        )
+        result_json_str = None
+        for _ in range(PACK_RETRIES + 1):
+            # Anggaran dicek sebelum SETIAP panggilan upstream, termasuk retry
+            if counts["llm_calls"] >= max_calls:
+                break
+            counts["llm_calls"] += 1
+            with llm_priority(PRIORITY_BULK):
+                # max_attempts=1: satu panggilan upstream per hitungan llm_calls
+                result_json_str = await aget_llm_response(prompt, force_json=True, max_attempts=1)
+            if not result_json_str.startswith("API_ERROR_429:"):
+                break
+            counts["rate_limited"] += 1
+            if counts["llm_calls"] >= max_calls:
+                break
+            retry_after = int(rate_limit_headers(result_json_str)["Retry-After"])
+            print(f"Precompute: kuota penuh, menunggu {retry_after} detik...")
+            await asyncio.sleep(retry_after)
+        if result_json_str is None or (result_json_str.startswith("API_ERROR_429:") and counts["llm_calls"] >= max_calls):
+            # Anggaran habis: paket ini (dan sisanya) dilewati, dicoba lagi di eksekusi berikutnya
+            counts["skipped_budget"] += len(pack)
+            continue
+        packed = parse_packed_reactions(result_json_str, len(pack))
+        for position, item in enumerate(pack):
+            if position not in packed:
+                counts["unanswered"] += 1
+                continue
+            reaction_store.put(item["compound_a"], item["compound_b"], packed[position], "precompute", model,
+                               identity_a=item["identity_a"], identity_b=item["identity_b"])
+            counts["stored"] += 1
+        print(f"Precompute: {counts['stored']} pasangan tersimpan, {counts['llm_calls']} panggilan LLM.")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--popular", type=int, default=0, help="Jumlah pasangan populer dari reaction store")
+    parser.add_argument("--pairs", default=None, help="File shortlist pasangan")
+    parser.add_argument("--category", action="append", help="kategori_aplikasi (bisa diulang)")
+    parser.add_argument("--max-pairs", type=int, default=500, help="Batas pasangan yang dianalisis LLM")
+    parser.add_argument("--rpm", type=float, default=2, help="Anggaran request per menit untuk job ini")
+    parser.add_argument("--max-calls", type=int, default=50, help="Batas prompt LLM per eksekusi")
+    parser.add_argument("--dry-run", action="store_true", help="Hanya tampilkan rencana, tanpa panggilan LLM")
+    args = parser.parse_args()
+    if not (args.popular or args.pairs or args.category):
+        parser.error("pilih minimal satu sumber pasangan: --popular, --pairs atau --category")
+
+    # Anggaran dibaca scheduler saat agent.llm di-import: set SEBELUM import modul agent.
+    # Batas tunggu bulk dinaikkan agar job menunggu giliran alih-alih ditolak (load shedding).
+    os.environ["LLM_RPM"] = os.environ["LLM_PRO_RPM"] = str(args.rpm)
+    os.environ.setdefault("LLM_MAX_WAIT_BULK", "600")
+
+    from agent.compound_store import compound_store
+    compound_store.load()
+    start = time.perf_counter()
+    todo, summary = plan_pairs(collect_pairs(args), args.max_pairs)
+    summary["todo"] = len(todo)
+    if args.dry_run:
+        for item in todo:
+            print(f"  {item['compound_a']} + {item['compound_b']}")
+    elif todo:
+        summary.update(asyncio.run(run_packs(todo, args.max_calls)))
+    summary["detik"] = round(time.perf_counter() - start, 2)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
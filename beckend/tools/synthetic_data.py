@@ -0,0 +1,42 @@
+# tools/synthetic_data.py
+"""
+Pembuat dataset senyawa sintetis (mis. 100k record) untuk uji memori dan benchmark.
+
+Record dibuat dengan mereplikasi senyawa asli dari data_kimia_final_indo.json
+dengan nama unik, lalu ditulis secara streaming (tanpa menampung semuanya di memori).
+"""
+
+import json
+from agent.data_source import iter_compounds_from
+from agent.embedding_service import DATA_FILE_PATH
+
+
+def iter_synthetic_compounds(count: int, source_path: str = DATA_FILE_PATH):
+    templates = list(iter_compounds_from(source_path))
+    for i in range(count):
+        record = dict(templates[i % len(templates)])
+        record["nama_senyawa"] = f"{record.get('nama_senyawa', 'senyawa')}-sintetis-{i}"
+        record["deskripsi"] = f"[varian {i}] {record.get('deskripsi') or ''}"
+        yield record
+
+
+def write_synthetic_dataset(path: str, count: int, source_path: str = DATA_FILE_PATH) -> str:
+    """Menulis `count` senyawa sintetis ke path (.jsonl = JSON Lines, selain itu array JSON)."""
+    return write_records(path, iter_synthetic_compounds(count, source_path))
+
+
+def write_records(path: str, records) -> str:
+    """Menulis record (iterable, di-stream) ke path (.jsonl = JSON Lines, selain itu array JSON)."""
+    json_lines = path.endswith((".jsonl", ".ndjson"))
+    with open(path, "w", encoding="utf-8") as f:
+        if not json_lines:
+            f.write("[\n")
+        for i, record in enumerate(records):
+            line = json.dumps(record, ensure_ascii=False)
+            if json_lines:
+                f.write(line + "\n")
+            else:
+                f.write(("  " if i == 0 else ",\n  ") + line)
+        if not json_lines:
+            f.write("\n]\n")
+    return path
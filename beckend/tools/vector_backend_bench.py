@@ -0,0 +1,143 @@
+# tools/vector_backend_bench.py
+"""
+Benchmark backend vektor: Chroma (HNSW) vs indeks flat NumPy (eksak).
+
+Menjalankan (dari folder beckend):
+    python -m tools.vector_backend_bench                    # pakai chroma_db yang ada
+    python -m tools.vector_backend_bench --chunks 50000     # korpus sintetis (tanpa model)
+
+Query dibuat dari vektor yang tersimpan + noise, sehingga tidak butuh model embedding.
+Ground truth = top-k eksak dalam metrik masing-masing backend (Chroma: L2 pada vektor
+mentah, flat: cosine; keduanya identik untuk embedding ter-normalisasi seperti MiniLM).
+Yang diukur per backend:
+    recall@k, latensi pencarian mentah (ID saja) dan latensi similarity_search_by_vector
+    (sampai menjadi Document, jalur yang dipakai retriever_service), p50/p95 dalam ms.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+from agent.embedding_service import open_vectorstore
+from agent.vector_store import FlatIndex, export_flat_index
+
+
+def _percentiles(samples: list[float]) -> dict:
+    values = np.asarray(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(values, 50)), 3), "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "mean_ms": round(float(values.mean()), 3)}
+
+
+def _synthetic_chroma(path: str, chunks: int, dim: int, rng: np.random.Generator):
+    """Koleksi Chroma sintetis: vektor berkelompok (mirip embedding teks) yang dinormalisasi."""
+    from langchain_community.vectorstores import Chroma
+
+    vectorstore = Chroma(persist_directory=path)
+    centers = rng.standard_normal((max(1, chunks // 50), dim)).astype(np.float32)
+    batch = 5000  # Di bawah batas batch chromadb
+    for start in range(0, chunks, batch):
+        size = min(batch, chunks - start)
+        vectors = centers[rng.integers(0, len(centers), size)] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [f"chunk-{start + i}" for i in range(size)]
+        vectorstore._collection.add(ids=ids, embeddings=vectors.tolist(), documents=[f"dokumen {i}" for i in ids],
+                                    metadatas=[{"nama_senyawa": i} for i in ids])
+    return vectorstore
+
+
+def _raw_embeddings(vectorstore, ids: list[str]) -> np.ndarray:
+    """Embedding mentah (belum dinormalisasi) dari Chroma, urut sesuai ids."""
+    by_id, offset = {}, 0
+    while True:
+        page = vectorstore._collection.get(include=["embeddings"], limit=5000, offset=offset)
+        if not len(page["ids"]):
+            break
+        by_id.update(zip(page["ids"], page["embeddings"]))
+        offset += 5000
+    return np.asarray([by_id[i] for i in ids], dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=0, help="Jumlah chunk sintetis (0 = pakai chroma_db yang ada)")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Simpan hasil JSON ke file ini")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    workdir = tempfile.mkdtemp(prefix="vector_bench_")
+    try:
+        start = time.perf_counter()
+        if args.chunks:
+            vectorstore = _synthetic_chroma(os.path.join(workdir, "chroma"), args.chunks, args.dim, rng)
+        else:
+            vectorstore = open_vectorstore()
+        setup_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        export_flat_index(vectorstore, path=os.path.join(workdir, "flat"))
+        export_s = time.perf_counter() - start
+        start = time.perf_counter()
+        flat = FlatIndex(os.path.join(workdir, "flat"))
+        flat_open_s = time.perf_counter() - start
+        if not len(flat):
+            raise SystemExit("Index kosong: jalankan ingestion dulu atau pakai --chunks.")
+        flat_ids = [json.loads(line)["id"] for line in open(os.path.join(workdir, "flat", "docs.jsonl"), encoding="utf-8")]
+
+        # Query = vektor tersimpan + noise
+        picks = rng.integers(0, len(flat), args.queries)
+        queries = np.asarray(flat.vectors[picks]) + 0.3 * rng.standard_normal((args.queries, flat.dim)).astype(np.float32) / np.sqrt(flat.dim)
+        matrix = np.asarray(flat.vectors)
+        raw = _raw_embeddings(vectorstore, flat_ids)
+        truth = {"flat": [], "chroma": []}
+        for query in queries:
+            cosine = matrix @ (query / np.linalg.norm(query))
+            truth["flat"].append({flat_ids[i] for i in np.argsort(-cosine)[:args.k]})
+            l2 = ((raw - query) ** 2).sum(axis=1)
+            truth["chroma"].append({flat_ids[i] for i in np.argsort(l2)[:args.k]})
+
+        results = {}
+        for name in ("chroma", "flat"):
+            raw_times, doc_times, hits = [], [], 0
+            for query, expected in zip(queries, truth[name]):
+                query_list = query.tolist()
+                t0 = time.perf_counter()
+                if name == "chroma":
+                    ids = vectorstore._collection.query(query_embeddings=[query_list], n_results=args.k, include=[])["ids"][0]
+                else:
+                    positions, _ = flat.search(query, args.k)
+                    ids = [flat_ids[i] for i in positions]
+                raw_times.append(time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                backend = vectorstore if name == "chroma" else flat
+                backend.similarity_search_by_vector(query_list, k=args.k)
+                doc_times.append(time.perf_counter() - t0)
+                hits += len(expected & set(ids))
+            results[name] = {
+                f"recall@{args.k}": round(hits / (args.k * len(queries)), 4),
+                "search": _percentiles(raw_times),
+                "similarity_search_by_vector": _percentiles(doc_times),
+            }
+
+        report = {
+            "chunks": len(flat), "dim": flat.dim, "queries": args.queries, "k": args.k,
+            "setup_s": round(setup_s, 2), "flat_export_s": round(export_s, 2), "flat_open_ms": round(flat_open_s * 1000, 2),
+            "backends": results,
+        }
+        print(json.dumps(report, indent=2))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()